@@ -1,9 +1,57 @@
+from typing import List
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "Momentum"
     DATABASE_URL: str = "postgresql://postgres:password@db:5432/momentum"
     REDIS_URL: str = "redis://redis:6379/0"
+    # Response cache: compress entries from this size; stale entries are served this long
+    # while one worker recomputes under a lock held at most CACHE_LOCK_TIMEOUT seconds
+    CACHE_COMPRESS_MIN_BYTES: int = 1024
+    CACHE_STALE_TTL: int = 300
+    CACHE_LOCK_TIMEOUT: float = 30
+    CACHE_LOCK_WAIT: float = 5
+    # Browsers may reuse ETag-validated responses this many seconds without asking
+    HTTP_CACHE_MAX_AGE: int = 0
+    # In-process indicator cache budget, optionally backed by Redis
+    INDICATOR_CACHE_MB: int = 128
+    INDICATOR_CACHE_REDIS: bool = False
+    INDICATOR_CACHE_TTL: int = 86400
+    # Days after its period end before a financial report counts as published in history
+    # screens; A-share annual reports are due four months after the year end
+    FINANCIAL_REPORT_LAG_DAYS: int = 120
+    # Parameter sweeps: 0 workers means one per CPU
+    SWEEP_WORKERS: int = 0
+    SWEEP_MAX_COMBINATIONS: int = 10000
+    # Process pool for CPU-bound request work: workers, queued + running task limit and
+    # per-task seconds from submission
+    COMPUTE_WORKERS: int = 2
+    COMPUTE_QUEUE_SIZE: int = 16
+    COMPUTE_TIMEOUT: float = 120
+    # Background backtest job worker processes; running jobs whose heartbeat is older than
+    # BACKTEST_JOB_STALE seconds are taken as lost when an API process starts
+    BACKTEST_WORKERS: int = 2
+    BACKTEST_JOB_STALE: float = 300
+    # Cached /backtest/run results per symbol; 0 disables
+    BACKTEST_CACHE_TTL: int = 86400
+    ROBUSTNESS_MAX_SIMULATIONS: int = 20000
+    # Pattern success statistics: forward horizons, the one shown in scans, and the
+    # occurrences a symbol needs before its own rate replaces the market-wide one
+    PATTERN_STAT_HORIZONS: List[int] = [5, 10, 20]
+    PATTERN_SUCCESS_HORIZON: int = 20
+    PATTERN_STAT_MIN_OCCURRENCES: int = 10
+    # Market-wide pattern scans: 0 workers means one per CPU
+    PATTERN_SCAN_WORKERS: int = 0
+    # Rescan symbols with new bars after each daily sync, starting from this many bars
+    PATTERN_AUTO_SCAN: bool = True
+    PATTERN_TAIL_BARS: int = 120
+    # Shape similarity search: 0 workers means one per CPU
+    SIMILARITY_WORKERS: int = 0
+    SIMILARITY_MAX_QUERY: int = 500
+    SIMILARITY_MAX_TOP_K: int = 200
+    # Scheduled jobs (daily sync); a running job renews its heartbeat this often, in seconds
+    SCHEDULER_ENABLED: bool = True
+    SCHEDULER_HEARTBEAT: float = 30
 
     class Config:
         case_sensitive = True
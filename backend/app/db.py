@@ -1,7 +1,9 @@
 from sqlmodel import SQLModel, create_engine, Session
 from app.core.config import settings
+from app.services.metrics import instrument_engine
 
 engine = create_engine(settings.DATABASE_URL, echo=False, pool_pre_ping=True)
+instrument_engine(engine)
 
 def init_db() -> None:
     SQLModel.metadata.create_all(engine)
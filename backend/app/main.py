@@ -3,6 +3,7 @@ import time
 from datetime import date
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
+from fastapi.responses import PlainTextResponse
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.core.config import settings
 from app.db import init_db, get_session
@@ -15,7 +16,10 @@ from sqlmodel import select
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s %(message)s")
 logger = logging.getLogger("momentum")
 
-from app.services.scheduler import init_scheduler
+from app.services.scheduler import init_scheduler, shutdown_scheduler
+from app.services.backtest_jobs import recover_jobs, shutdown_executor
+from app.services.executor import compute_executor
+from app.services.metrics import REGISTRY, HTTP_IN_FLIGHT, HTTP_LATENCY, HTTP_REQUESTS
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -23,8 +27,12 @@ async def lifespan(app: FastAPI):
     init_db()
     session = get_session()
     seed_basic_data(session)
+    recover_jobs(session)
     init_scheduler()
     yield
+    shutdown_scheduler()
+    shutdown_executor()
+    compute_executor.shutdown()
     logger.info("Backend shutting down")
 
 app = FastAPI(
@@ -38,12 +46,27 @@ app.include_router(router)
 
 @app.middleware("http")
 async def request_timing(request: Request, call_next):
-    start = time.time()
-    response = await call_next(request)
-    duration = (time.time() - start) * 1000
-    logger.info("request completed", extra={"path": request.url.path, "status_code": response.status_code, "duration_ms": round(duration, 2)})
+    start = time.perf_counter()
+    HTTP_IN_FLIGHT.inc()
+    status_code = 500
+    try:
+        response = await call_next(request)
+        status_code = response.status_code
+    finally:
+        HTTP_IN_FLIGHT.dec()
+        duration = time.perf_counter() - start
+        # Route templates, not raw paths, so ids do not explode the label set
+        route = request.scope.get("route")
+        template = route.path if route is not None else "unmatched"
+        HTTP_REQUESTS.inc(method=request.method, route=template, status=str(status_code))
+        HTTP_LATENCY.observe(duration, method=request.method, route=template)
+        logger.info("request completed %s %s %s %.2fms", request.method, request.url.path, status_code, duration * 1000)
     return response
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     return {"message": "欢迎使用 Momentum API", "docs": "/docs"}
@@ -1,5 +1,6 @@
 from datetime import date, datetime
 from typing import Optional, List
+from sqlalchemy import Column, LargeBinary, UniqueConstraint
 from sqlmodel import SQLModel, Field, Relationship
 
 class Stock(SQLModel, table=True):
@@ -46,6 +47,17 @@ class FactorValue(SQLModel, table=True):
     liquidity: Optional[float] = None
     stock: Optional[Stock] = Relationship(back_populates="factors")
 
+class IndicatorSnapshot(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    stock_id: int = Field(foreign_key="stock.id", index=True, unique=True)
+    last_date: Optional[date] = None
+    state_json: str = "{}"
+    values_json: str = "{}"
+    # State as of an older bar, replayed from when a sync rewrites bars the state already has
+    checkpoint_date: Optional[date] = None
+    checkpoint_json: Optional[str] = None
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 class StrategyDefinition(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(index=True)
@@ -53,8 +65,23 @@ class StrategyDefinition(SQLModel, table=True):
     parameters_json: str
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class BacktestJob(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    status: str = Field(default="queued", index=True) # queued, running, cancelling, cancelled, finished, failed
+    strategy_name: str
+    payload_json: str
+    username: Optional[str] = None
+    progress: int = 0
+    total: int = 0
+    message: Optional[str] = None
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None # renewed after each symbol while running
+    finished_at: Optional[datetime] = None
+
 class BacktestResult(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
+    job_id: Optional[int] = Field(default=None, foreign_key="backtestjob.id", index=True)
     strategy_name: str = Field(index=True)
     symbol: str = Field(index=True)
     start_date: date
@@ -66,7 +93,21 @@ class BacktestResult(SQLModel, table=True):
     profit_factor: float
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
+class BacktestDateIndex(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    fingerprint: str = Field(index=True, unique=True)
+    points: int
+    dates_blob: bytes = Field(sa_column=Column(LargeBinary, nullable=False)) # int32 date ordinals
+
+class BacktestCurve(SQLModel, table=True):
+    id: Optional[int] = Field(default=None, primary_key=True)
+    result_id: int = Field(foreign_key="backtestresult.id", index=True, unique=True)
+    date_index_id: int = Field(foreign_key="backtestdateindex.id")
+    equity_blob: bytes = Field(sa_column=Column(LargeBinary, nullable=False)) # float32
+    returns_blob: bytes = Field(sa_column=Column(LargeBinary, nullable=False)) # float32
+
 class PatternResult(SQLModel, table=True):
+    __table_args__ = (UniqueConstraint("symbol", "pattern_name", "detected_date"),)
     id: Optional[int] = Field(default=None, primary_key=True)
     symbol: str = Field(index=True)
     pattern_name: str = Field(index=True)
@@ -74,6 +115,29 @@ class PatternResult(SQLModel, table=True):
     success_rate: Optional[float] = None
     score: Optional[float] = None
 
+class PatternStat(SQLModel, table=True):
+    """Forward-return outcomes of historical pattern occurrences; symbol "*" is market-wide."""
+    __table_args__ = (UniqueConstraint("symbol", "pattern_name", "horizon"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    symbol: str = Field(index=True)
+    pattern_name: str = Field(index=True)
+    horizon: int # trading days after the confirmation bar
+    occurrences: int = 0
+    hits: int = 0
+    return_sum: float = 0.0
+    return_sq_sum: float = 0.0
+    last_end_date: Optional[date] = None # occurrences ending on or before this date are counted
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+class PatternScanState(SQLModel, table=True):
+    """Last bar each symbol was pattern-scanned up to, per scan configuration."""
+    __table_args__ = (UniqueConstraint("symbol", "params_key"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    symbol: str = Field(index=True)
+    params_key: str # canonical JSON of patterns + params
+    last_bar_date: date
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
 class ScreeningPreset(SQLModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str = Field(unique=True)
@@ -96,3 +160,18 @@ class User(SQLModel, table=True):
     password_hash: str
     role: str = Field(default="analyst")
     created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class JobRun(SQLModel, table=True):
+    """One firing of a scheduled job; the unique key makes exactly one worker run it."""
+    __table_args__ = (UniqueConstraint("job_name", "scheduled_for"),)
+    id: Optional[int] = Field(default=None, primary_key=True)
+    job_name: str = Field(index=True)
+    scheduled_for: datetime # UTC
+    status: str = Field(default="running", index=True) # running, finished, failed, skipped
+    host: Optional[str] = None
+    pid: Optional[int] = None
+    message: Optional[str] = None
+    started_at: datetime = Field(default_factory=datetime.utcnow)
+    heartbeat_at: datetime = Field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+    duration_s: Optional[float] = None
@@ -1,20 +1,34 @@
-import io
+import asyncio
+import itertools
 import json
-import inspect
 from datetime import date, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Header
+from fastapi import APIRouter, Depends, HTTPException, Header, Request, Response
 from fastapi.responses import StreamingResponse
 import pandas as pd
 from sqlmodel import select
 from app.db import get_session
-from app.models import Stock, DailyPrice, ScreeningPreset, PatternResult, BacktestResult, StrategyDefinition, User, DataSyncLog
-from app.schemas import DateRangeRequest, DailyDataRequest, PriceRangeRequest, ScreeningRequest, ScreeningExportRequest, ScreeningResponse, PatternScanRequest, BacktestRequest, ExportRequest, PresetRequest, LoginRequest, AuthResponse, LogDeleteRequest
+from app.models import Stock, DailyPrice, ScreeningPreset, BacktestResult, BacktestJob, StrategyDefinition, User, DataSyncLog, JobRun
+from app.schemas import DateRangeRequest, DailyDataRequest, PriceRangeRequest, ScreeningRequest, ScreeningHistoryRequest, ScreeningExportRequest, ScreeningResponse, PatternScanRequest, SimilarityRequest, BacktestRequest, PortfolioBacktestRequest, SweepRequest, WalkForwardRequest, RobustnessRequest, ExportRequest, PresetRequest, LoginRequest, AuthResponse, LogDeleteRequest
 from app.services.data_sync import sync_stock_list, sync_daily, validate_integrity
-from app.services.screening import screen_stocks
-from app.services.patterns import detect_patterns, PATTERN_NAMES
+from app.services.screening import screen_stocks, screen_stocks_history
+from app.services.patterns import PATTERN_NAMES
+from app.services.pattern_stats import pattern_library
+from app.services.pattern_scan import market_pattern_occurrences, scan_batches, scan_symbols, scan_universe
+from app.services.similarity import find_similar
 from app.services.strategies import get_strategy_map
-from app.services.backtest import run_backtest
-from app.services.cache import cache_get, cache_set
+from app.services.sweep import run_sweep_request, expand_grid, METRIC_KEYS
+from app.services.walk_forward import run_walk_forward_request
+from app.services.robustness import result_robustness, METHODS as ROBUSTNESS_METHODS
+from app.services.curves import load_curve, downsample, DOWNSAMPLE_METHODS, MIN_POINTS
+from app.services.strategy_dsl import compile_strategy
+from app.services.backtest_jobs import run_backtest_request, run_portfolio_request, submit_backtest_job, cancel_backtest_job, job_summary
+from app.core.config import settings
+from app.services.cache import cache_get_or_compute
+from app.services.http_cache import check_not_modified
+from app.services.executor import compute_executor, ComputeBusy, ComputeTimeout
+from app.services.exports import export_prices, export_screening, MEDIA_TYPES as EXPORT_MEDIA_TYPES
+from app.services.formats import ARROW, arrow_available, format_frame, json_response, negotiate_format
+from app.services.backtest_cache import symbol_range_version
 from app.services.auth import verify_password, issue_token, get_token_payload
 
 router = APIRouter(prefix="/api/v1")
@@ -43,6 +57,23 @@ def admin_dep(user=Depends(auth_dep)):
         raise HTTPException(status_code=403, detail="无权限")
     return user
 
+async def _compute(func, *args):
+    """Run `func(session, *args)` in the compute process pool."""
+    try:
+        return await compute_executor.run_with_session(func, *args)
+    except ComputeBusy:
+        raise HTTPException(status_code=503, detail="计算任务繁忙，请稍后重试", headers={"Retry-After": "5"})
+    except ComputeTimeout:
+        raise HTTPException(status_code=504, detail="计算超时")
+
+def _compute_blocking(func, *args):
+    try:
+        return compute_executor.call(func, *args, with_session=True)
+    except ComputeBusy:
+        raise HTTPException(status_code=503, detail="计算任务繁忙，请稍后重试", headers={"Retry-After": "5"})
+    except ComputeTimeout:
+        raise HTTPException(status_code=504, detail="计算超时")
+
 @router.post("/auth/login", response_model=AuthResponse)
 def login(payload: LoginRequest, session=Depends(session_dep)):
     user = session.exec(select(User).where(User.username == payload.username)).first()
@@ -51,10 +82,29 @@ def login(payload: LoginRequest, session=Depends(session_dep)):
     token = issue_token(user.username, user.role)
     return {"token": token, "role": user.role}
 
+def format_dep(request: Request, format: str | None = None) -> str:
+    """Response format from ?format= or the Accept header (see services.formats)."""
+    try:
+        fmt = negotiate_format(format, request.headers.get("accept"))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="不支持的数据格式")
+    if fmt == ARROW and not arrow_available():
+        raise HTTPException(status_code=406, detail="服务器未安装 pyarrow，无法输出 Arrow 格式")
+    return fmt
+
+def _table_frame(session, model, *conditions, order_by=None) -> pd.DataFrame:
+    columns = list(model.__table__.columns)
+    query = select(*columns).where(*conditions)
+    if order_by is not None:
+        query = query.order_by(order_by)
+    return pd.DataFrame(session.exec(query).all(), columns=[c.name for c in columns])
+
 @router.get("/stocks")
-def list_stocks(session=Depends(session_dep)):
-    stocks = session.exec(select(Stock)).all()
-    return [s.dict() for s in stocks]
+def list_stocks(request: Request, response: Response, session=Depends(session_dep), fmt: str = Depends(format_dep)):
+    not_modified = check_not_modified(request, response, ["stocks"], "stocks", fmt)
+    if not_modified:
+        return not_modified
+    return format_frame(_table_frame(session, Stock), fmt, response.headers)
 
 @router.get("/stocks/query")
 def search_stocks(keyword: str = "", limit: int = 20, offset: int = 0, session=Depends(session_dep)):
@@ -130,31 +180,35 @@ def sync_daily_data(payload: DateRangeRequest, background_tasks: BackgroundTasks
     return {"status": "started", "count": len(symbols)}
 
 @router.post("/data/daily")
-def get_daily_data(payload: DailyDataRequest, session=Depends(session_dep)):
-    symbols = payload.symbols or [s.symbol for s in session.exec(select(Stock)).all()]
-    if not symbols:
-        return []
-    stocks = session.exec(select(Stock).where(Stock.symbol.in_(symbols))).all()
-    ids = [s.id for s in stocks]
-    prices = session.exec(select(DailyPrice).where(DailyPrice.stock_id.in_(ids), DailyPrice.trade_date == payload.trade_date)).all()
-    return [p.dict() for p in prices]
+def get_daily_data(payload: DailyDataRequest, session=Depends(session_dep), fmt: str = Depends(format_dep)):
+    conditions = [DailyPrice.trade_date == payload.trade_date]
+    if payload.symbols:
+        conditions.append(DailyPrice.stock_id.in_(select(Stock.id).where(Stock.symbol.in_(payload.symbols))))
+    return format_frame(_table_frame(session, DailyPrice, *conditions), fmt)
+
+@router.get("/data/price_range")
+def get_price_range_cached(request: Request, response: Response, payload: PriceRangeRequest = Depends(), session=Depends(session_dep), fmt: str = Depends(format_dep)):
+    """GET form of price_range, revalidated by ETag so repeat chart loads return 304."""
+    version = symbol_range_version(payload.symbol, payload.start_date, payload.end_date)
+    if version is not None:
+        not_modified = check_not_modified(request, response, [], "price_range", payload.symbol, payload.start_date, payload.end_date, payload.frequency, fmt, version)
+        if not_modified:
+            return not_modified
+    return format_frame(_price_range_frame(session, payload), fmt, response.headers)
 
 @router.post("/data/price_range")
-def get_price_range(payload: PriceRangeRequest, session=Depends(session_dep)):
+def get_price_range(payload: PriceRangeRequest, session=Depends(session_dep), fmt: str = Depends(format_dep)):
+    return format_frame(_price_range_frame(session, payload), fmt)
+
+def _price_range_frame(session, payload: PriceRangeRequest) -> pd.DataFrame:
     stock = session.exec(select(Stock).where(Stock.symbol == payload.symbol)).first()
     if not stock:
         raise HTTPException(status_code=404, detail="股票不存在")
-    prices = session.exec(select(DailyPrice).where(DailyPrice.stock_id == stock.id, DailyPrice.trade_date >= payload.start_date, DailyPrice.trade_date <= payload.end_date).order_by(DailyPrice.trade_date)).all()
-    
-    
-    if not prices:
-        return []
-
-    if payload.frequency == "D":
-        return [p.dict() for p in prices]
+    df = _table_frame(session, DailyPrice, DailyPrice.stock_id == stock.id, DailyPrice.trade_date >= payload.start_date, DailyPrice.trade_date <= payload.end_date, order_by=DailyPrice.trade_date)
+    if df.empty or payload.frequency == "D":
+        return df
 
     # Resampling for Weekly/Monthly
-    df = pd.DataFrame([p.dict() for p in prices])
     df['trade_date'] = pd.to_datetime(df['trade_date'])
     df.set_index('trade_date', inplace=True)
     
@@ -166,19 +220,7 @@ def get_price_range(payload: PriceRangeRequest, session=Depends(session_dep)):
         'close': 'last',
         'volume': 'sum'
     }).dropna()
-    
-    # Format back to list of dicts with date string
-    results = []
-    for date, row in resampled.iterrows():
-        results.append({
-            "trade_date": date.strftime('%Y-%m-%d'),
-            "open": row['open'],
-            "high": row['high'],
-            "low": row['low'],
-            "close": row['close'],
-            "volume": row['volume']
-        })
-    return results
+    return resampled.reset_index()
 
 @router.post("/data/integrity")
 def check_integrity(payload: DateRangeRequest, session=Depends(session_dep)):
@@ -186,29 +228,27 @@ def check_integrity(payload: DateRangeRequest, session=Depends(session_dep)):
     return [validate_integrity(session, symbol, payload.start_date, payload.end_date) for symbol in symbols]
 
 @router.post("/screening/run", response_model=ScreeningResponse)
-def run_screening(payload: ScreeningRequest, session=Depends(session_dep)):
-    cache_key = f"screen:{json.dumps(payload.dict(), ensure_ascii=False)}"
-    cached = cache_get(cache_key)
-    if cached:
-        return cached
-    items = screen_stocks(session, payload.dict())
-    response = {"total": len(items), "items": items}
-    cache_set(cache_key, response, ttl=120)
-    return response
+def run_screening(payload: ScreeningRequest):
+    cache_key = f"screen:{json.dumps(payload.dict(), ensure_ascii=False, default=str)}"
+
+    def compute():
+        # This thread only waits; the screening itself runs in the compute pool
+        items = _compute_blocking(screen_stocks, payload.dict())
+        return {"total": len(items), "items": items}
+    return cache_get_or_compute(cache_key, compute, ttl=120)
+
+@router.post("/screening/history")
+async def run_screening_history(payload: ScreeningHistoryRequest):
+    if payload.start_date > payload.end_date:
+        raise HTTPException(status_code=400, detail="开始日期不能晚于结束日期")
+    criteria = payload.dict(exclude={"start_date", "end_date", "as_of"})
+    return await _compute(screen_stocks_history, criteria, payload.start_date, payload.end_date)
 
 @router.post("/screening/export")
-def export_screening(payload: ScreeningExportRequest, session=Depends(session_dep), user=Depends(auth_dep)):
-    items = screen_stocks(session, payload.dict())
-    df = pd.DataFrame(items)
-    if payload.file_type == "xlsx":
-        buffer = io.BytesIO()
-        df.to_excel(buffer, index=False)
-        buffer.seek(0)
-        return StreamingResponse(buffer, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": "attachment; filename=screening.xlsx"})
-    buffer = io.StringIO()
-    df.to_csv(buffer, index=False)
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=screening.csv"})
+async def export_screening_results(payload: ScreeningExportRequest, user=Depends(auth_dep)):
+    file_type = "xlsx" if payload.file_type == "xlsx" else "csv"
+    body = await _compute(export_screening, payload.dict(), file_type)
+    return Response(body, media_type=EXPORT_MEDIA_TYPES[file_type], headers={"Content-Disposition": f"attachment; filename=screening.{file_type}"})
 
 @router.post("/screening/preset")
 def save_preset(payload: PresetRequest, session=Depends(session_dep), user=Depends(auth_dep)):
@@ -235,32 +275,74 @@ def delete_preset(name: str, session=Depends(session_dep), user=Depends(auth_dep
     session.commit()
     return {"status": "ok"}
 
+async def _scan_batches(payload: PatternScanRequest, symbols: list[str]):
+    """Scan `symbols` as compute-pool tasks, at most one per worker at a time, yielding each
+    batch's matches as soon as it finishes."""
+    batches = iter(scan_batches(symbols, compute_executor.workers))
+
+    def start(batch):
+        return asyncio.ensure_future(_compute(scan_symbols, payload.patterns, payload.start_date, payload.end_date, payload.params, batch))
+
+    pending = {start(batch) for batch in itertools.islice(batches, compute_executor.workers)}
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                following = next(batches, None)
+                if following is not None:
+                    pending.add(start(following))
+                yield task.result()
+    finally:
+        for task in pending:
+            task.cancel()
+
 @router.post("/patterns/scan")
-def scan_patterns(payload: PatternScanRequest, session=Depends(session_dep), user=Depends(auth_dep)):
-    symbols = payload.symbols or [s.symbol for s in session.exec(select(Stock)).all()]
-    results = []
-    for symbol in symbols:
-        stock = session.exec(select(Stock).where(Stock.symbol == symbol)).first()
-        if not stock:
-            continue
-        prices = session.exec(select(DailyPrice).where(DailyPrice.stock_id == stock.id, DailyPrice.trade_date >= payload.start_date, DailyPrice.trade_date <= payload.end_date)).all()
-        if not prices:
-            continue
-        df = pd.DataFrame([p.dict() for p in prices])
-        if df.empty:
-            continue
-        patterns = detect_patterns(df.sort_values("trade_date"), payload.patterns, payload.params)
-        if not patterns:
-            continue
-        for item in patterns:
-            session.add(PatternResult(symbol=symbol, pattern_name=item["pattern_name"], detected_date=item["detected_date"], success_rate=item["success_rate"], score=item["score"]))
-        results.append({"symbol": symbol, "name": stock.name, "patterns": patterns})
-    session.commit()
-    return results
+async def scan_patterns(payload: PatternScanRequest, user=Depends(auth_dep)):
+    symbols = await _compute(scan_universe, payload.symbols)
+    results = [item async for batch in _scan_batches(payload, symbols) for item in batch]
+    return sorted(results, key=lambda item: item["symbol"])
+
+@router.post("/patterns/scan/stream")
+async def stream_scan_patterns(payload: PatternScanRequest, user=Depends(auth_dep)):
+    """NDJSON: one line per matching symbol as soon as its batch finishes, then a summary line."""
+    symbols = await _compute(scan_universe, payload.symbols)
+
+    async def generate():
+        matched = 0
+        async for batch in _scan_batches(payload, symbols):
+            for item in batch:
+                matched += 1
+                yield json.dumps(item, ensure_ascii=False, default=str) + "\n"
+        yield json.dumps({"done": True, "matched": matched}) + "\n"
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.post("/patterns/occurrences")
+async def list_pattern_occurrences(payload: PatternScanRequest, user=Depends(auth_dep)):
+    """Every historical occurrence of the requested patterns in the date range."""
+    unknown = set(payload.patterns) - set(PATTERN_NAMES)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"未知形态: {', '.join(sorted(unknown))}")
+    return await _compute(market_pattern_occurrences, payload.patterns, payload.start_date, payload.end_date, payload.params, payload.symbols)
+
+@router.post("/patterns/similar")
+async def find_similar_shapes(payload: SimilarityRequest, user=Depends(auth_dep)):
+    """Historical windows across the market most similar in shape to the query."""
+    if not 1 <= payload.top_k <= settings.SIMILARITY_MAX_TOP_K:
+        raise HTTPException(status_code=400, detail=f"top_k 需在 1 到 {settings.SIMILARITY_MAX_TOP_K} 之间")
+    if payload.values is None and not (payload.symbol and payload.start_date and payload.end_date):
+        raise HTTPException(status_code=400, detail="需提供 values 或 symbol 与起止日期")
+    try:
+        return await _compute(find_similar, payload.values, payload.symbol, payload.start_date, payload.end_date, payload.top_k, payload.symbols)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 @router.get("/patterns/library")
-def list_patterns():
-    return PATTERN_NAMES
+def list_patterns(request: Request, response: Response, session=Depends(session_dep)):
+    """Pattern names with market-wide forward-return statistics per horizon."""
+    not_modified = check_not_modified(request, response, ["patterns"], "patterns_library", PATTERN_NAMES)
+    if not_modified:
+        return not_modified
+    return pattern_library(session)
 
 @router.get("/dashboard/stats")
 def get_dashboard_stats(session=Depends(session_dep)):
@@ -308,74 +390,130 @@ def get_market_cap_distribution(session=Depends(session_dep)):
     return data
 
 @router.get("/strategies")
-def list_strategies(session=Depends(session_dep)):
+def list_strategies(request: Request, response: Response, session=Depends(session_dep)):
+    not_modified = check_not_modified(request, response, ["strategies"], "strategies", sorted(get_strategy_map()))
+    if not_modified:
+        return not_modified
     strategies = session.exec(select(StrategyDefinition)).all()
     if not strategies:
         return [{"name": name, "description": f"{name}策略"} for name in get_strategy_map().keys()]
     return [s.dict() for s in strategies]
 
+def _check_strategy(payload: BacktestRequest) -> None:
+    if payload.composition:
+        try:
+            compile_strategy(payload.composition)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"策略组合不合法: {exc}")
+    elif payload.strategy_name not in get_strategy_map():
+        raise HTTPException(status_code=400, detail="策略不存在")
+
 @router.post("/backtest/run")
-def run_strategy_backtest(payload: BacktestRequest, session=Depends(session_dep), user=Depends(auth_dep)):
-    strategy_map = get_strategy_map()
-    if payload.strategy_name not in strategy_map:
+async def run_strategy_backtest(payload: BacktestRequest, user=Depends(auth_dep)):
+    _check_strategy(payload)
+    if payload.downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail="不支持的降采样方式")
+    return await _compute(run_backtest_request, payload.dict())
+
+@router.post("/backtest/jobs")
+def submit_backtest(payload: BacktestRequest, session=Depends(session_dep), user=Depends(auth_dep)):
+    _check_strategy(payload)
+    job = submit_backtest_job(session, payload.dict(), user.username)
+    return {"job_id": job.id, "status": job.status}
+
+def _get_job(session, job_id: int, user: User) -> BacktestJob:
+    job = session.get(BacktestJob, job_id)
+    # Other users' jobs are reported as missing rather than forbidden
+    if not job or (job.username != user.username and user.role != "admin"):
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+@router.get("/backtest/jobs/{job_id}")
+def get_backtest_job(job_id: int, session=Depends(session_dep), user=Depends(auth_dep)):
+    return job_summary(session, _get_job(session, job_id, user))
+
+@router.delete("/backtest/jobs/{job_id}")
+def cancel_backtest(job_id: int, session=Depends(session_dep), user=Depends(auth_dep)):
+    job = cancel_backtest_job(session, _get_job(session, job_id, user))
+    return {"job_id": job.id, "status": job.status}
+
+@router.get("/backtest/results/{result_id}/curve")
+def get_backtest_curve(result_id: int, max_points: int = 0, method: str = "lttb", session=Depends(session_dep), user=Depends(auth_dep), fmt: str = Depends(format_dep)):
+    """Full-resolution curve by default; pass max_points to downsample."""
+    if method not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail="不支持的降采样方式")
+    if max_points and max_points < MIN_POINTS:
+        raise HTTPException(status_code=400, detail=f"max_points 至少为 {MIN_POINTS}")
+    curve = load_curve(session, result_id)
+    if not curve:
+        raise HTTPException(status_code=404, detail="回测曲线不存在")
+    if max_points:
+        reduced = downsample(curve["dates"], curve["equity_curve"], max_points, method)
+        columns = {"dates": reduced["dates"], "equity_curve": reduced["values"]}
+    else:
+        columns = {"dates": curve["dates"], "equity_curve": curve["equity_curve"], "returns": curve["returns"]}
+    if fmt == ARROW:
+        return format_frame(pd.DataFrame({**columns, "dates": pd.to_datetime(columns["dates"]).date}), fmt)
+    # The curve is columnar already; both JSON formats share this shape
+    return json_response({"result_id": result_id, "points": len(curve["dates"]), **columns})
+
+@router.post("/backtest/results/{result_id}/robustness")
+async def run_backtest_robustness(result_id: int, payload: RobustnessRequest, user=Depends(auth_dep)):
+    if payload.method not in ROBUSTNESS_METHODS:
+        raise HTTPException(status_code=400, detail="不支持的重采样方式")
+    if not 0 < payload.simulations <= settings.ROBUSTNESS_MAX_SIMULATIONS:
+        raise HTTPException(status_code=400, detail=f"模拟次数需在 1 到 {settings.ROBUSTNESS_MAX_SIMULATIONS} 之间")
+    if not 0 < payload.confidence < 1 or payload.block_size < 1:
+        raise HTTPException(status_code=400, detail="参数不合法")
+    try:
+        report = await _compute(result_robustness, result_id, payload.simulations, payload.method, payload.block_size, payload.confidence, payload.seed)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="收益序列过短")
+    if report is None:
+        raise HTTPException(status_code=404, detail="回测曲线不存在")
+    return report
+
+@router.post("/backtest/portfolio")
+async def run_portfolio_strategy_backtest(payload: PortfolioBacktestRequest, user=Depends(auth_dep)):
+    _check_strategy(payload)
+    if payload.weighting not in ("equal", "signal"):
+        raise HTTPException(status_code=400, detail="不支持的权重方式")
+    if payload.downsample not in DOWNSAMPLE_METHODS:
+        raise HTTPException(status_code=400, detail="不支持的降采样方式")
+    result = await _compute(run_portfolio_request, payload.dict())
+    if result is None:
+        raise HTTPException(status_code=404, detail="无行情数据")
+    return result
+
+def _check_grid(payload) -> None:
+    if payload.strategy_name not in get_strategy_map():
         raise HTTPException(status_code=400, detail="策略不存在")
-    results = []
-    for symbol in payload.symbols:
-        stock = session.exec(select(Stock).where(Stock.symbol == symbol)).first()
-        if not stock:
-            continue
-        prices = session.exec(select(DailyPrice).where(DailyPrice.stock_id == stock.id, DailyPrice.trade_date >= payload.start_date, DailyPrice.trade_date <= payload.end_date)).all()
-        if not prices:
-            continue
-        df = pd.DataFrame([p.dict() for p in prices])
-        if df.empty:
-            continue
-        df = df.sort_values("trade_date")
-        strategy_func = strategy_map[payload.strategy_name]
-        allowed_params = {k: v for k, v in payload.parameters.items() if k in inspect.signature(strategy_func).parameters}
-        signal = strategy_func(df, **allowed_params)
-        result = run_backtest(df, signal)
-        metrics = result["metrics"]
-        session.add(BacktestResult(
-            strategy_name=payload.strategy_name,
-            symbol=symbol,
-            start_date=payload.start_date,
-            end_date=payload.end_date,
-            annual_return=metrics["annual_return"],
-            max_drawdown=metrics["max_drawdown"],
-            sharpe=metrics["sharpe"],
-            win_rate=metrics["win_rate"],
-            profit_factor=metrics["profit_factor"],
-        ))
-        results.append({"symbol": symbol, **metrics, "equity_curve": result["equity_curve"], "dates": result["dates"]})
-    session.commit()
-    return results
+    if payload.rank_by not in METRIC_KEYS:
+        raise HTTPException(status_code=400, detail="不支持的排序指标")
+    if len(expand_grid(payload.grid)) > settings.SWEEP_MAX_COMBINATIONS:
+        raise HTTPException(status_code=400, detail=f"参数组合数超过上限 {settings.SWEEP_MAX_COMBINATIONS}")
+
+@router.post("/backtest/sweep")
+async def run_strategy_sweep(payload: SweepRequest, user=Depends(auth_dep)):
+    _check_grid(payload)
+    return await _compute(run_sweep_request, payload.dict())
+
+@router.post("/backtest/walk_forward")
+async def run_strategy_walk_forward(payload: WalkForwardRequest, user=Depends(auth_dep)):
+    _check_grid(payload)
+    try:
+        return await _compute(run_walk_forward_request, payload.dict())
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
 
 @router.post("/export")
-def export_data(payload: ExportRequest, session=Depends(session_dep), user=Depends(auth_dep)):
-    symbols = payload.symbols or [s.symbol for s in session.exec(select(Stock)).all()]
-    stocks = session.exec(select(Stock).where(Stock.symbol.in_(symbols))).all()
+async def export_data(payload: ExportRequest, user=Depends(auth_dep)):
     # Optimization: If no date range provided, default to last 30 days to avoid full DB dump
     if not payload.start_date and not payload.end_date:
         payload.start_date = date.today() - timedelta(days=30)
-    
-    ids = [s.id for s in stocks]
-    query = select(DailyPrice).where(DailyPrice.stock_id.in_(ids))
-    if payload.start_date:
-        query = query.where(DailyPrice.trade_date >= payload.start_date)
-    if payload.end_date:
-        query = query.where(DailyPrice.trade_date <= payload.end_date)
-    prices = session.exec(query).all()
-    df = pd.DataFrame([p.dict() for p in prices]) if prices else pd.DataFrame()
-    if payload.file_type == "xlsx":
-        buffer = io.BytesIO()
-        df.to_excel(buffer, index=False)
-        buffer.seek(0)
-        return StreamingResponse(buffer, media_type="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", headers={"Content-Disposition": "attachment; filename=export.xlsx"})
-    buffer = io.StringIO()
-    df.to_csv(buffer, index=False)
-    buffer.seek(0)
-    return StreamingResponse(buffer, media_type="text/csv", headers={"Content-Disposition": "attachment; filename=export.csv"})
+    file_type = "xlsx" if payload.file_type == "xlsx" else "csv"
+    body = await _compute(export_prices, payload.symbols, payload.start_date, payload.end_date, file_type)
+    return Response(body, media_type=EXPORT_MEDIA_TYPES[file_type], headers={"Content-Disposition": f"attachment; filename=export.{file_type}"})
 
 @router.get("/system/logs")
 @router.get("/system/logs")
@@ -385,6 +523,13 @@ def get_system_logs(session=Depends(session_dep), limit: int = 100, offset: int
     logs = session.exec(query.offset(offset).limit(limit)).all()
     return {"total": total, "items": logs}
 
+@router.get("/system/jobs")
+def get_job_runs(session=Depends(session_dep), user=Depends(admin_dep), job_name: str | None = None, limit: int = 50):
+    query = select(JobRun).order_by(JobRun.started_at.desc())
+    if job_name:
+        query = query.where(JobRun.job_name == job_name)
+    return {"items": session.exec(query.limit(limit)).all()}
+
 @router.delete("/system/logs")
 def delete_system_logs(payload: LogDeleteRequest, session=Depends(session_dep), user=Depends(admin_dep)):
     query = select(DataSyncLog)
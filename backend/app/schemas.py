@@ -24,6 +24,11 @@ class ScreeningRequest(BaseModel):
     technical_filters: Dict[str, Any] = Field(default_factory=dict)
     factor_filters: Dict[str, Any] = Field(default_factory=dict)
     custom_filters: List[Dict[str, Any]] = Field(default_factory=list)
+    as_of: Optional[date] = None
+
+class ScreeningHistoryRequest(ScreeningRequest):
+    start_date: date
+    end_date: date
 
 class ScreeningExportRequest(ScreeningRequest):
     file_type: str = Field(default="csv")
@@ -39,12 +44,56 @@ class PatternScanRequest(BaseModel):
     end_date: date
     params: Dict[str, Any] = Field(default_factory=dict)
 
+class SimilarityRequest(BaseModel):
+    # Either a window of a stored symbol or raw closes
+    symbol: Optional[str] = None
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    values: Optional[List[float]] = None
+    symbols: Optional[List[str]] = None # search universe, default all
+    top_k: int = Field(default=20)
+
 class BacktestRequest(BaseModel):
     strategy_name: str
     symbols: List[str]
     start_date: date
     end_date: date
     parameters: Dict[str, Any] = Field(default_factory=dict)
+    max_points: Optional[int] = Field(default=None, ge=4) # None returns full-resolution curves
+    downsample: str = Field(default="lttb") # lttb, minmax
+    # Optional strategy composition (see app.services.strategy_dsl); strategy_name then only labels the result
+    composition: Optional[Dict[str, Any]] = None
+
+class PortfolioBacktestRequest(BacktestRequest):
+    weighting: str = Field(default="equal") # equal, signal
+
+class SweepRequest(BaseModel):
+    strategy_name: str
+    symbols: List[str]
+    start_date: date
+    end_date: date
+    grid: Dict[str, List[Any]]
+    rank_by: str = Field(default="sharpe")
+    limit: int = Field(default=100)
+    include_symbols: bool = False
+
+class WalkForwardRequest(BaseModel):
+    strategy_name: str
+    symbols: List[str]
+    start_date: date
+    end_date: date
+    grid: Dict[str, List[Any]]
+    train_size: int = Field(default=250) # trading days
+    test_size: int = Field(default=60)
+    step: Optional[int] = None
+    rank_by: str = Field(default="sharpe")
+
+class RobustnessRequest(BaseModel):
+    simulations: int = Field(default=2000)
+    method: str = Field(default="block") # block, shuffle
+    block_size: int = Field(default=20) # trading days per bootstrap block
+    confidence: float = Field(default=0.95)
+    seed: Optional[int] = None
 
 class ExportRequest(BaseModel):
     symbols: Optional[List[str]] = None
@@ -19,16 +19,93 @@ def compute_metrics(returns: pd.Series) -> dict:
         "profit_factor": float(profit_factor),
     }
 
+def strategy_returns(close: pd.Series, signal: pd.Series) -> pd.Series:
+    # Trade on the next bar after the signal
+    position = signal.shift(1).fillna(0)
+    return position * close.pct_change().fillna(0)
+
 def run_backtest(df: pd.DataFrame, signal: pd.Series) -> dict:
-    aligned = df.copy()
-    aligned["signal"] = signal.shift(1).fillna(0)
-    aligned["ret"] = aligned["close"].pct_change().fillna(0)
-    aligned["strategy_ret"] = aligned["signal"] * aligned["ret"]
-    metrics = compute_metrics(aligned["strategy_ret"])
-    equity_curve = (1 + aligned["strategy_ret"]).cumprod()
+    strategy_ret = strategy_returns(df["close"], signal)
+    metrics = compute_metrics(strategy_ret)
+    equity_curve = (1 + strategy_ret).cumprod()
     return {
         "metrics": metrics,
         "equity_curve": equity_curve.tolist(),
-        "returns": aligned["strategy_ret"].tolist(),
-        "dates": aligned["trade_date"].astype(str).tolist(),
+        "returns": strategy_ret.tolist(),
+        "dates": df["trade_date"].astype(str).tolist(),
+    }
+
+def compute_metrics_matrix(returns: np.ndarray) -> dict:
+    """Column-wise compute_metrics for a (dates x symbols) matrix of daily returns."""
+    returns = np.asarray(returns, dtype=float)
+    n = len(returns)
+    if n == 0:
+        zeros = np.zeros(returns.shape[1] if returns.ndim == 2 else 0)
+        return {"annual_return": zeros, "max_drawdown": zeros, "sharpe": zeros, "win_rate": zeros, "profit_factor": zeros}
+    cumulative = np.cumprod(1 + returns, axis=0)
+    peak = np.maximum.accumulate(cumulative, axis=0)
+    drawdown = (cumulative - peak) / peak
+    std = returns.std(axis=0, ddof=1) if n > 1 else np.full(returns.shape[1], np.nan)
+    gains = np.where(returns > 0, returns, 0).sum(axis=0)
+    losses = np.where(returns < 0, returns, 0).sum(axis=0)
+    return {
+        "annual_return": cumulative[-1] ** (252 / n) - 1,
+        "max_drawdown": drawdown.min(axis=0),
+        "sharpe": returns.mean(axis=0) / (std + 1e-9) * np.sqrt(252),
+        "win_rate": (returns > 0).mean(axis=0),
+        "profit_factor": gains / (np.abs(losses) + 1e-9),
+    }
+
+def panel_signals(strategy_func, panel: dict, **params) -> np.ndarray:
+    """Run a strategy on a whole price panel at once.
+
+    The strategies only use column-wise pandas operations, so a frame whose columns are
+    (field, symbol) pairs makes `df["close"]` a dates x symbols frame and the strategy
+    returns a signal for every symbol in one call. Suspended days carry the last price.
+    """
+    fields = {f: pd.DataFrame(panel[f]).ffill() for f in ("open", "high", "low", "close", "volume") if f in panel}
+    wide = pd.concat(fields, axis=1)
+    signal = strategy_func(wide, **params)
+    return np.asarray(signal, dtype=float)
+
+def run_portfolio_backtest(close: np.ndarray, signal: np.ndarray, weighting: str = "equal", dates=None, symbols=None) -> dict:
+    """Vectorized multi-symbol backtest on (dates x symbols) close and signal matrices.
+
+    Like run_backtest, positions take effect the day after the signal. `equal` splits the
+    portfolio evenly across held symbols, `signal` weights them by signal strength.
+    """
+    close = np.asarray(close, dtype=float)
+    signal = np.nan_to_num(np.asarray(signal, dtype=float))
+    if close.shape != signal.shape:
+        raise ValueError("close and signal must have the same shape")
+    # A suspended day has no return; the resumption day captures the whole move
+    filled = pd.DataFrame(close).ffill()
+    ret = np.nan_to_num(filled.pct_change(fill_method=None).to_numpy())
+
+    position = np.zeros_like(signal)
+    position[1:] = signal[:-1]
+    if weighting == "signal":
+        raw = np.abs(position)
+    elif weighting == "equal":
+        raw = (position != 0).astype(float)
+    else:
+        raise ValueError(f"Unknown weighting: {weighting}")
+    total = raw.sum(axis=1, keepdims=True)
+    weights = np.divide(raw * np.sign(position), total, out=np.zeros_like(raw), where=total > 0)
+
+    symbol_ret = position * ret
+    portfolio_ret = (weights * ret).sum(axis=1)
+    turnover = np.abs(np.diff(weights, axis=0, prepend=0)).sum(axis=1)
+
+    metrics = {k: float(v) for k, v in compute_metrics(pd.Series(portfolio_ret)).items()}
+    metrics["avg_turnover"] = float(turnover.mean()) if len(turnover) else 0.0
+    per_symbol = compute_metrics_matrix(symbol_ret)
+    symbols = list(symbols) if symbols is not None else list(range(close.shape[1]))
+    return {
+        "metrics": metrics,
+        "equity_curve": np.cumprod(1 + portfolio_ret).tolist(),
+        "returns": portfolio_ret.tolist(),
+        "turnover": turnover.tolist(),
+        "dates": [str(d) for d in dates] if dates is not None else list(range(len(close))),
+        "symbols": [{"symbol": s, **{k: float(v[i]) for k, v in per_symbol.items()}} for i, s in enumerate(symbols)],
     }
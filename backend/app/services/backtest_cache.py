@@ -0,0 +1,136 @@
+"""
+Per-symbol backtest result cache for /backtest/run.
+
+Keys combine strategy, normalized parameters, symbol, date range and a price data version.
+Every sync_daily run records the range it rewrote for a symbol, tagged with a global
+sequence number, in a Redis sorted set scored by the range's end date; the version of a
+cached range is the highest sequence among the recorded ranges that overlap it, found
+with one ZRANGEBYSCORE from the range's start. Syncing recent bars therefore leaves
+cached runs over older ranges valid. Past MAX_TOUCHES entries the oldest are merged into
+one covering range with their highest sequence, which can only raise versions, i.e.
+invalidate some old ranges early but never serve stale ones. Redis is optional: without
+it nothing is cached.
+"""
+
+import hashlib
+import json
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, Optional
+from app.core.config import settings
+from app.services.cache import redis_client, cache_get, cache_set
+
+logger = logging.getLogger(__name__)
+
+_SEQUENCE_KEY = "prices:touch_seq"
+# symbol -> sequence of its latest sync, for caches keyed on whole-symbol history
+_SYMBOL_SEQUENCE_KEY = "prices:symbol_seq"
+
+# Touches kept per symbol before the oldest are merged
+MAX_TOUCHES = 64
+MERGE_TOUCHES = 32
+
+def _touched_key(symbol: str) -> str:
+    return f"prices:touches:{symbol}"
+
+def _touch(start: str, end: str, seq: int) -> str:
+    return f"{start}:{end}:{seq}"
+
+def normalize_params(value: Any) -> Any:
+    """Canonical form so e.g. {"window": 20} and {"window": "20.0"} share a key."""
+    if isinstance(value, dict):
+        return {str(k): normalize_params(v) for k, v in sorted(value.items())}
+    if isinstance(value, (list, tuple)):
+        return [normalize_params(v) for v in value]
+    if isinstance(value, bool) or value is None:
+        return value
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return value
+    return str(value)
+
+def range_version(touches: Iterable[str], start: date, end: date) -> int:
+    """Highest sequence among `start:end:seq` members overlapping [start, end]."""
+    version = 0
+    lo, hi = start.isoformat(), end.isoformat()
+    for member in touches:
+        touched_start, touched_end, seq = member.split(":")
+        if touched_start <= hi and touched_end >= lo:
+            version = max(version, int(seq))
+    return version
+
+def symbol_range_version(symbol: str, start: date, end: date) -> Optional[int]:
+    """Version of `symbol` prices in [start, end]; None when Redis is unreachable."""
+    try:
+        # Only touches ending on or after `start` can overlap
+        touches = redis_client.zrangebyscore(_touched_key(symbol), start.toordinal(), "+inf")
+    except Exception:
+        return None
+    return range_version(touches, start, end)
+
+def _merge_oldest(key: str) -> None:
+    oldest = redis_client.zrange(key, 0, MERGE_TOUCHES - 1)
+    if len(oldest) < 2:
+        return
+    parts = [member.split(":") for member in oldest]
+    start, end = min(p[0] for p in parts), max(p[1] for p in parts)
+    # Add the merged range before removing its parts so a version never goes backwards
+    redis_client.zadd(key, {_touch(start, end, max(int(p[2]) for p in parts)): date.fromisoformat(end).toordinal()})
+    redis_client.zrem(key, *oldest)
+
+def record_price_sync(symbol: str, start: date, end: date) -> None:
+    """Called by sync_daily after rewriting `symbol` prices in [start, end]."""
+    key = _touched_key(symbol)
+    try:
+        seq = redis_client.incr(_SEQUENCE_KEY)
+        redis_client.zadd(key, {_touch(start.isoformat(), end.isoformat(), seq): end.toordinal()})
+        redis_client.hset(_SYMBOL_SEQUENCE_KEY, symbol, seq)
+        if redis_client.zcard(key) > MAX_TOUCHES:
+            _merge_oldest(key)
+    except Exception:
+        logger.warning("Could not record price sync for %s; cached backtests may be stale", symbol)
+
+def price_sequence() -> Optional[int]:
+    """Global sequence, moved by every price sync; None when Redis is unreachable."""
+    try:
+        return int(redis_client.get(_SEQUENCE_KEY) or 0)
+    except Exception:
+        return None
+
+def symbol_price_versions() -> Optional[Dict[str, int]]:
+    """Sequence of each symbol's latest price sync (symbols never synced are absent)."""
+    try:
+        return {symbol: int(seq) for symbol, seq in redis_client.hgetall(_SYMBOL_SEQUENCE_KEY).items()}
+    except Exception:
+        return None
+
+def backtest_cache_key(strategy_name: str, params: Dict[str, Any], symbol: str, start: date, end: date) -> Optional[str]:
+    """None when caching is disabled or Redis is unreachable."""
+    if settings.BACKTEST_CACHE_TTL <= 0:
+        return None
+    version = symbol_range_version(symbol, start, end)
+    if version is None:
+        return None
+    # "r": versions from the end-date-scored touch sets, so keys from the old layout never match
+    param_hash = hashlib.sha1(json.dumps(normalize_params(params), sort_keys=True).encode()).hexdigest()[:16]
+    return f"bt:{strategy_name}:{param_hash}:{symbol}:{start.isoformat()}:{end.isoformat()}:r{version}"
+
+def get_cached_result(key: Optional[str]) -> Optional[Dict[str, Any]]:
+    if key is None:
+        return None
+    try:
+        return cache_get(key)
+    except Exception:
+        return None
+
+def set_cached_result(key: Optional[str], payload: Dict[str, Any]) -> None:
+    if key is None:
+        return
+    try:
+        cache_set(key, payload, ttl=settings.BACKTEST_CACHE_TTL)
+    except Exception:
+        pass
@@ -0,0 +1,258 @@
+"""
+Backtest execution shared by the synchronous endpoint and the background job queue.
+
+Jobs are rows in BacktestJob. They run in a small process pool (BACKTEST_WORKERS) so heavy
+research runs never occupy the API's request threads; each finished symbol is stored as a
+BacktestResult with its curve in BacktestCurve.
+"""
+
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+import pandas as pd
+from sqlalchemy import or_, update
+from sqlmodel import select
+from app.core.config import settings
+from app.db import engine, get_session
+from app.models import Stock, DailyPrice, BacktestJob, BacktestResult
+from app.services.backtest import panel_signals, run_backtest, run_portfolio_backtest
+from app.services.curves import store_curve, downsample
+from app.services.price_panel import load_price_panel
+from app.services.backtest_cache import backtest_cache_key, get_cached_result, set_cached_result
+from app.services.strategies import get_strategy_map
+from app.services.strategy_dsl import compile_strategy
+
+logger = logging.getLogger(__name__)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_futures: Dict[int, Any] = {}
+
+def _load_prices(session, symbol: str, start, end) -> Optional[pd.DataFrame]:
+    stock = session.exec(select(Stock).where(Stock.symbol == symbol)).first()
+    if not stock:
+        return None
+    prices = session.exec(select(DailyPrice).where(DailyPrice.stock_id == stock.id, DailyPrice.trade_date >= start, DailyPrice.trade_date <= end)).all()
+    if not prices:
+        return None
+    df = pd.DataFrame([p.dict() for p in prices]).sort_values("trade_date")
+    # Lets strategies reuse cached indicators for this symbol
+    df.attrs["symbol"] = symbol
+    return df
+
+def run_backtest_request(session, payload: Dict[str, Any], job_id: Optional[int] = None, on_progress: Optional[Callable[[int, int], bool]] = None) -> List[Dict[str, Any]]:
+    """Backtest every symbol in `payload` and persist results with their curves.
+
+    `on_progress(done, total)` is called after each symbol; returning False stops the run.
+    Curves are stored at full resolution and returned reduced to `max_points`. Interactive
+    runs (no job) reuse cached results for unchanged prices; job runs always persist rows.
+    """
+    symbols = payload["symbols"]
+    signal_func = signal_function(payload)
+    params = payload.get("parameters", {})
+    if payload.get("composition"):
+        params = {"parameters": params, "composition": payload["composition"]}
+    results = []
+    for i, symbol in enumerate(symbols):
+        key = backtest_cache_key(payload["strategy_name"], params, symbol, payload["start_date"], payload["end_date"]) if job_id is None else None
+        item = get_cached_result(key)
+        if item is None:
+            item = _backtest_symbol(session, payload, symbol, job_id, signal_func)
+            if item is not None:
+                set_cached_result(key, item)
+        if item is not None:
+            curve = downsample(item["dates"], item["equity_curve"], payload.get("max_points"), payload.get("downsample", "lttb"))
+            results.append({**item, "equity_curve": curve["values"], "dates": curve["dates"], "points": len(item["dates"])})
+        if on_progress and on_progress(i + 1, len(symbols)) is False:
+            break
+    return results
+
+def run_portfolio_request(session, payload: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Portfolio backtest of `payload` over its symbols; None when there are no prices."""
+    panel = load_price_panel(session, payload["start_date"], payload["end_date"], payload["symbols"])
+    if not panel["symbols"]:
+        return None
+    signal_func = signal_function(payload)
+    signal = panel_signals(lambda df: signal_func(df), panel)
+    result = run_portfolio_backtest(panel["close"], signal, payload["weighting"], panel["dates"], panel["symbols"])
+    max_points = payload.get("max_points")
+    if max_points and len(result["dates"]) > max_points:
+        # Daily returns and turnover are only sent at full resolution
+        curve = downsample(result["dates"], result["equity_curve"], max_points, payload.get("downsample", "lttb"))
+        result.update({"equity_curve": curve["values"], "dates": curve["dates"], "points": len(result.pop("returns"))})
+        result.pop("turnover")
+    return result
+
+def signal_function(payload: Dict[str, Any]) -> Callable[[pd.DataFrame], pd.Series]:
+    """A composition when the payload has one, otherwise the named strategy with its parameters."""
+    if payload.get("composition"):
+        return compile_strategy(payload["composition"]).run
+    strategy_func = get_strategy_map()[payload["strategy_name"]]
+    # Strategies read what they need from their params and ignore the rest
+    return lambda df: strategy_func(df, **payload.get("parameters", {}))
+
+def _backtest_symbol(session, payload: Dict[str, Any], symbol: str, job_id: Optional[int], signal_func) -> Optional[Dict[str, Any]]:
+    df = _load_prices(session, symbol, payload["start_date"], payload["end_date"])
+    if df is None:
+        return None
+    signal = signal_func(df)
+    result = run_backtest(df, signal)
+    metrics = result["metrics"]
+    record = BacktestResult(
+        job_id=job_id,
+        strategy_name=payload["strategy_name"],
+        symbol=symbol,
+        start_date=payload["start_date"],
+        end_date=payload["end_date"],
+        annual_return=metrics["annual_return"],
+        max_drawdown=metrics["max_drawdown"],
+        sharpe=metrics["sharpe"],
+        win_rate=metrics["win_rate"],
+        profit_factor=metrics["profit_factor"],
+    )
+    session.add(record)
+    session.flush()
+    store_curve(session, record.id, result["dates"], result["equity_curve"], result["returns"])
+    session.commit()
+    return {"symbol": symbol, "result_id": record.id, **metrics, "equity_curve": result["equity_curve"], "dates": result["dates"]}
+
+def _init_worker():
+    # Never reuse connections inherited from the parent process
+    engine.dispose(close=False)
+
+def _execute_job(job_id: int) -> str:
+    with get_session() as session:
+        # Claim atomically so a job re-dispatched by several API workers runs once
+        claimed = session.execute(
+            update(BacktestJob)
+            .where(BacktestJob.id == job_id, BacktestJob.status == "queued")
+            .values(status="running", started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow())
+        )
+        session.commit()
+        job = session.get(BacktestJob, job_id)
+        if claimed.rowcount == 0:
+            return job.status if job else "missing"
+        payload = json.loads(job.payload_json)
+        payload["start_date"] = date.fromisoformat(payload["start_date"])
+        payload["end_date"] = date.fromisoformat(payload["end_date"])
+
+        def on_progress(done: int, total: int) -> bool:
+            session.refresh(job)
+            job.progress, job.total = done, total
+            job.heartbeat_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+            return job.status != "cancelling"
+
+        try:
+            run_backtest_request(session, payload, job_id=job_id, on_progress=on_progress)
+            session.refresh(job)
+            job.status = "cancelled" if job.status == "cancelling" else "finished"
+        except Exception as exc:
+            logger.exception("Backtest job %s failed", job_id)
+            session.rollback()
+            session.refresh(job)
+            job.status = "failed"
+            job.message = str(exc)
+        job.finished_at = datetime.utcnow()
+        session.add(job)
+        session.commit()
+        return job.status
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=max(1, settings.BACKTEST_WORKERS), initializer=_init_worker)
+    return _executor
+
+def _finish_lost(job_id: int, message: str) -> None:
+    """Close a job whose worker died, so pollers see it end."""
+    now = datetime.utcnow()
+    with get_session() as session:
+        session.execute(
+            update(BacktestJob)
+            .where(BacktestJob.id == job_id, BacktestJob.status == "cancelling")
+            .values(status="cancelled", finished_at=now)
+        )
+        session.execute(
+            update(BacktestJob)
+            .where(BacktestJob.id == job_id, BacktestJob.status.in_(["queued", "running"]))
+            .values(status="failed", message=message, finished_at=now)
+        )
+        session.commit()
+
+def _on_done(job_id: int, future) -> None:
+    global _executor
+    _futures.pop(job_id, None)
+    if future.cancelled():
+        return
+    exc = future.exception()
+    if isinstance(exc, BrokenProcessPool):
+        # A broken pool rejects every later submit; the next dispatch starts a fresh one
+        _executor = None
+    if exc is not None:
+        # The worker process died (BrokenProcessPool) or the job raised outside its own handler
+        logger.error("Backtest job %s ended abnormally: %r", job_id, exc)
+        _finish_lost(job_id, f"worker lost: {exc!r}")
+
+def _dispatch(job_id: int) -> None:
+    future = _get_executor().submit(_execute_job, job_id)
+    _futures[job_id] = future
+    future.add_done_callback(lambda f: _on_done(job_id, f))
+
+def submit_backtest_job(session, payload: Dict[str, Any], username: Optional[str] = None) -> BacktestJob:
+    job = BacktestJob(strategy_name=payload["strategy_name"], payload_json=json.dumps(payload, ensure_ascii=False, default=str), username=username, total=len(payload["symbols"]))
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    _dispatch(job.id)
+    return job
+
+def cancel_backtest_job(session, job: BacktestJob) -> BacktestJob:
+    if job.status == "queued":
+        future = _futures.get(job.id)
+        if future is not None:
+            future.cancel()
+        # A worker that still picks it up sees the status and skips it
+        job.status = "cancelled"
+        job.finished_at = datetime.utcnow()
+    elif job.status == "running":
+        job.status = "cancelling"
+    session.add(job)
+    session.commit()
+    session.refresh(job)
+    return job
+
+def job_summary(session, job: BacktestJob) -> Dict[str, Any]:
+    results = session.exec(select(BacktestResult).where(BacktestResult.job_id == job.id)).all()
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "strategy_name": job.strategy_name,
+        "progress": job.progress,
+        "total": job.total,
+        "message": job.message,
+        "created_at": job.created_at,
+        "started_at": job.started_at,
+        "finished_at": job.finished_at,
+        "results": [{"result_id": r.id, "symbol": r.symbol, "annual_return": r.annual_return, "max_drawdown": r.max_drawdown, "sharpe": r.sharpe, "win_rate": r.win_rate, "profit_factor": r.profit_factor} for r in results],
+    }
+
+def recover_jobs(session) -> None:
+    """On startup: close jobs whose worker stopped renewing the heartbeat, and re-dispatch
+    jobs still queued from a previous process (claiming makes this safe)."""
+    now = datetime.utcnow()
+    stale = or_(BacktestJob.heartbeat_at.is_(None), BacktestJob.heartbeat_at < now - timedelta(seconds=settings.BACKTEST_JOB_STALE))
+    session.execute(update(BacktestJob).where(BacktestJob.status == "cancelling", stale).values(status="cancelled", finished_at=now))
+    session.execute(update(BacktestJob).where(BacktestJob.status == "running", stale).values(status="failed", message="worker lost", finished_at=now))
+    session.commit()
+    for job in session.exec(select(BacktestJob).where(BacktestJob.status == "queued")).all():
+        _dispatch(job.id)
+
+def shutdown_executor() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -1,23 +1,151 @@
-import json
+"""
+Redis response cache.
+
+Values are serialized with orjson and zlib-compressed above CACHE_COMPRESS_MIN_BYTES.
+Each entry carries the time it stops being fresh; Redis keeps it for `stale_ttl` longer so
+cache_get_or_compute can serve the stale value while a single worker recomputes it. A
+missing key is recomputed under a SET NX lock: concurrent requests for it wait briefly for
+the lock holder's result instead of all hitting the database. Redis errors are treated as
+misses, so the cache never takes an endpoint down.
+"""
+
+import logging
+import struct
+import time
+import uuid
+import zlib
+from typing import Any, Callable, Optional, Tuple
+import orjson
 import redis
-from datetime import date, datetime
 from app.core.config import settings
+from app.services.metrics import CACHE_REQUESTS
 
+logger = logging.getLogger(__name__)
+
+# String client for callers that keep their own bookkeeping in Redis (see backtest_cache)
 redis_client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
 
-class DateEncoder(json.JSONEncoder):
-    """Custom JSON encoder that handles date and datetime objects"""
-    def default(self, obj):
-        if isinstance(obj, (date, datetime)):
-            return obj.isoformat()
-        return super().default(obj)
+_HEADER = struct.Struct("<2sBd")
+_MAGIC = b"C1"
+_COMPRESSED = 1
+_JSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+# Deletes the lock only if this worker still owns it
+_RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) end return 0"
+
+def _cache_name(key: str) -> str:
+    # Key prefix ("screen", "bt", ...) keeps the metric's label set small
+    return key.split(":", 1)[0]
+
+def _default(obj):
+    # pandas Timestamps and other date-likes
+    if hasattr(obj, "isoformat"):
+        return obj.isoformat()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def encode_value(payload: Any, fresh_until: float) -> bytes:
+    body = orjson.dumps(payload, default=_default, option=_JSON_OPTIONS)
+    flags = 0
+    if len(body) >= settings.CACHE_COMPRESS_MIN_BYTES:
+        body = zlib.compress(body, 1)
+        flags |= _COMPRESSED
+    return _HEADER.pack(_MAGIC, flags, fresh_until) + body
+
+def decode_value(raw: bytes) -> Tuple[Any, float]:
+    """(payload, fresh_until); raises ValueError for entries this codec did not write."""
+    if len(raw) < _HEADER.size or raw[:2] != _MAGIC:
+        raise ValueError("Unknown cache payload")
+    _, flags, fresh_until = _HEADER.unpack_from(raw)
+    body = raw[_HEADER.size:]
+    if flags & _COMPRESSED:
+        body = zlib.decompress(body)
+    return orjson.loads(body), fresh_until
+
+class ResponseCache:
+    def __init__(self, client):
+        self.client = client
+
+    def _read(self, key: str) -> Optional[Tuple[Any, float]]:
+        try:
+            raw = self.client.get(key)
+        except Exception:
+            logger.warning("Cache read failed for %s", key)
+            return None
+        if raw is None:
+            return None
+        try:
+            return decode_value(raw)
+        except Exception:
+            return None
+
+    def get(self, key: str):
+        entry = self._read(key)
+        if entry is None or entry[1] < time.time():
+            CACHE_REQUESTS.inc(cache=_cache_name(key), result="miss")
+            return None
+        CACHE_REQUESTS.inc(cache=_cache_name(key), result="hit")
+        return entry[0]
+
+    def set(self, key: str, payload, ttl: int = 300, stale_ttl: int = 0) -> None:
+        try:
+            self.client.set(key, encode_value(payload, time.time() + ttl), ex=ttl + stale_ttl)
+        except Exception:
+            logger.warning("Cache write failed for %s", key)
+
+    def _lock(self, key: str) -> Optional[str]:
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(f"lock:{key}", token, nx=True, px=int(settings.CACHE_LOCK_TIMEOUT * 1000))
+        except Exception:
+            # Without Redis every worker computes for itself
+            return token
+        return token if acquired else None
+
+    def _unlock(self, key: str, token: str) -> None:
+        try:
+            self.client.eval(_RELEASE, 1, f"lock:{key}", token)
+        except Exception:
+            pass
+
+    def get_or_compute(self, key: str, compute: Callable[[], Any], ttl: int = 300, stale_ttl: Optional[int] = None):
+        """Cached value of `compute()`, recomputed by one worker at a time.
+
+        Within `stale_ttl` after expiry the old value is returned to everyone except the
+        worker that takes the lock, which recomputes synchronously (compute may depend on
+        the request's database session, so it never runs after the request ends).
+        """
+        stale_ttl = settings.CACHE_STALE_TTL if stale_ttl is None else stale_ttl
+        entry = self._read(key)
+        if entry is not None and entry[1] >= time.time():
+            CACHE_REQUESTS.inc(cache=_cache_name(key), result="hit")
+            return entry[0]
+        CACHE_REQUESTS.inc(cache=_cache_name(key), result="stale" if entry is not None else "miss")
+        token = self._lock(key)
+        if token is None:
+            if entry is not None:
+                return entry[0]
+            # Someone else is computing: wait for their result rather than piling on
+            deadline = time.monotonic() + settings.CACHE_LOCK_WAIT
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = self._read(key)
+                if entry is not None:
+                    return entry[0]
+            token = self._lock(key)
+        try:
+            payload = compute()
+            self.set(key, payload, ttl, stale_ttl)
+            return payload
+        finally:
+            if token is not None:
+                self._unlock(key, token)
+
+response_cache = ResponseCache(redis.Redis.from_url(settings.REDIS_URL))
 
 def cache_get(key: str):
-    value = redis_client.get(key)
-    if value is None:
-        return None
-    return json.loads(value)
+    return response_cache.get(key)
 
-def cache_set(key: str, payload, ttl: int = 300):
-    redis_client.setex(key, ttl, json.dumps(payload, ensure_ascii=False, cls=DateEncoder))
+def cache_set(key: str, payload, ttl: int = 300, stale_ttl: int = 0):
+    response_cache.set(key, payload, ttl, stale_ttl)
 
+def cache_get_or_compute(key: str, compute: Callable[[], Any], ttl: int = 300, stale_ttl: Optional[int] = None):
+    return response_cache.get_or_compute(key, compute, ttl, stale_ttl)
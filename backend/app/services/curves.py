@@ -0,0 +1,121 @@
+"""
+Compact storage and downsampling of backtest curves.
+
+Curves are stored as float32 blobs; dates as int32 ordinals in a BacktestDateIndex row
+that every curve over the same calendar shares. Responses can be reduced to a target
+point count with LTTB (shape preserving) or min-max (keeps every extreme) bucketing.
+"""
+
+import hashlib
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence
+import numpy as np
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select
+from app.models import BacktestCurve, BacktestDateIndex
+
+DOWNSAMPLE_METHODS = ("lttb", "minmax")
+# Both end points plus one bucket's min and max
+MIN_POINTS = 4
+
+def encode_floats(values: Sequence[float]) -> bytes:
+    return np.asarray(values, dtype="<f4").tobytes()
+
+def decode_floats(payload: bytes) -> np.ndarray:
+    return np.frombuffer(payload, dtype="<f4").astype(float)
+
+def encode_dates(dates: Sequence[Any]) -> bytes:
+    ordinals = [(d if isinstance(d, date) else date.fromisoformat(str(d)[:10])).toordinal() for d in dates]
+    return np.asarray(ordinals, dtype="<i4").tobytes()
+
+def decode_dates(payload: bytes) -> List[str]:
+    return [date.fromordinal(int(o)).isoformat() for o in np.frombuffer(payload, dtype="<i4")]
+
+def lttb_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Largest-Triangle-Three-Buckets over an evenly spaced series; returns kept indices."""
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(int)
+    kept = [0]
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        # Average of the next bucket is the third triangle vertex
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        next_x = (end + next_end - 1) / 2
+        next_y = y[end:next_end].mean() if next_end > end else y[-1]
+        prev = kept[-1]
+        xs = np.arange(start, end)
+        areas = np.abs((prev - next_x) * (y[start:end] - y[prev]) - (prev - xs) * (next_y - y[prev]))
+        kept.append(start + int(areas.argmax()))
+    kept.append(n - 1)
+    return np.asarray(kept)
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """Min and max of each of n_out / 2 buckets, plus both end points."""
+    n = len(y)
+    buckets = max(1, (n_out - 2) // 2)
+    if n_out >= n or n <= 2:
+        return np.arange(n)
+    edges = np.linspace(0, n, buckets + 1).astype(int)
+    kept = {0, n - 1}
+    for start, end in zip(edges[:-1], edges[1:]):
+        if end > start:
+            kept.add(start + int(y[start:end].argmin()))
+            kept.add(start + int(y[start:end].argmax()))
+    return np.asarray(sorted(kept))
+
+def downsample(dates: Sequence[str], values: Sequence[float], max_points: Optional[int], method: str = "lttb") -> Dict[str, List]:
+    if max_points and max_points < MIN_POINTS:
+        raise ValueError(f"max_points must be at least {MIN_POINTS}")
+    y = np.asarray(values, dtype=float)
+    if not max_points or len(y) <= max_points:
+        return {"dates": list(dates), "values": y.tolist()}
+    if method not in DOWNSAMPLE_METHODS:
+        raise ValueError(f"Unknown downsample method: {method}")
+    idx = lttb_indices(y, max_points) if method == "lttb" else minmax_indices(y, max_points)
+    return {"dates": [dates[i] for i in idx], "values": y[idx].tolist()}
+
+def _date_index_id(session, dates: Sequence[Any]) -> int:
+    blob = encode_dates(dates)
+    fingerprint = hashlib.sha1(blob).hexdigest()
+    query = select(BacktestDateIndex.id).where(BacktestDateIndex.fingerprint == fingerprint)
+    index_id = session.exec(query).first()
+    if index_id is not None:
+        return index_id
+    # Job and compute workers store the same calendar concurrently; whoever loses the race
+    # reads the winner's row instead of failing on the unique fingerprint
+    row = {"fingerprint": fingerprint, "points": len(dates), "dates_blob": blob}
+    dialect = session.get_bind().dialect.name
+    if dialect in ("postgresql", "sqlite"):
+        insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+        session.execute(insert(BacktestDateIndex).values(row).on_conflict_do_nothing(index_elements=["fingerprint"]))
+    else:
+        try:
+            with session.begin_nested():
+                session.add(BacktestDateIndex(**row))
+        except IntegrityError:
+            pass
+    return session.exec(query).one()
+
+def store_curve(session, result_id: int, dates: Sequence[Any], equity: Sequence[float], returns: Sequence[float]) -> BacktestCurve:
+    curve = BacktestCurve(
+        result_id=result_id,
+        date_index_id=_date_index_id(session, dates),
+        equity_blob=encode_floats(equity),
+        returns_blob=encode_floats(returns),
+    )
+    session.add(curve)
+    return curve
+
+def load_curve(session, result_id: int) -> Optional[Dict[str, Any]]:
+    curve = session.exec(select(BacktestCurve).where(BacktestCurve.result_id == result_id)).first()
+    if curve is None:
+        return None
+    index = session.get(BacktestDateIndex, curve.date_index_id)
+    return {
+        "dates": decode_dates(index.dates_blob),
+        "equity_curve": decode_floats(curve.equity_blob),
+        "returns": decode_floats(curve.returns_blob),
+    }
@@ -10,18 +10,36 @@
 4. Tencent 腾讯财经 - 备用数据源
 """
 
+import importlib
 import random
 import time
 from datetime import date
 from typing import List, Dict, Any, Optional, Callable
 import requests
 import pandas as pd
-import akshare as ak
+from app.services.metrics import timed_fetch
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 import warnings
 warnings.filterwarnings('ignore')
 
+class LazyModule:
+    """Imports the module on first attribute access.
+
+    akshare pulls in a very large dependency tree; deferring it keeps API workers and tests
+    that never fetch from AkShare from paying for it at startup.
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+ak = LazyModule("akshare")
+
 # ==================== 防反爬配置 ====================
 
 # 多User-Agent轮换池
@@ -614,7 +632,7 @@ def fetch_with_fallback(data_type: str, *args, **kwargs) -> pd.DataFrame:
             continue
         
         try:
-            result = fetcher(*args, **kwargs)
+            result = timed_fetch(source_name, data_type, lambda: fetcher(*args, **kwargs))
             if result is not None and not (isinstance(result, pd.DataFrame) and result.empty):
                 print(f"[数据源] 使用 {source_config['name']} 获取 {data_type} 成功")
                 return result
@@ -1,8 +1,20 @@
+import time
 from datetime import date
 import pandas as pd
 from sqlmodel import select
 from app.models import Stock, DailyPrice, FactorValue, DataSyncLog
-from app.services.data_sources import get_data_sources
+from app.services.indicator_state import advance_indicator_state
+from app.services.backtest_cache import record_price_sync
+from app.services.http_cache import bump_data_version
+from app.services.pattern_stats import update_symbol_pattern_stats, refresh_market_pattern_stats
+from app.services.pattern_scan import incremental_pattern_scan
+from app.core.config import settings
+from app.services.metrics import SYNC_DURATION, SYNC_ROWS, SYNC_SYMBOLS, timed_fetch
+
+def get_data_sources():
+    # The fetcher stack (requests sessions, AkShare) loads on the first sync, not at startup
+    from app.services import data_sources
+    return data_sources.get_data_sources()
 
 def _log_sync(session, source: str, sync_type: str, start: date | None, end: date | None, status: str, message: str | None):
     session.add(DataSyncLog(data_source=source, sync_type=sync_type, start_date=start, end_date=end, status=status, message=message))
@@ -10,6 +22,7 @@ def _log_sync(session, source: str, sync_type: str, start: date | None, end: dat
 
 def sync_stock_list(session, progress_callback=None):
     sources = get_data_sources()
+    started = time.perf_counter()
     all_df = []
     
     # 按优先级排序数据源
@@ -25,7 +38,7 @@ def sync_stock_list(session, progress_callback=None):
         if fetcher is None:
             continue
         try:
-            df = fetcher()
+            df = timed_fetch(name, "stock_list", fetcher)
             count = len(df) if not df.empty else 0
             if not df.empty:
                 all_df.append(df)
@@ -69,6 +82,9 @@ def sync_stock_list(session, progress_callback=None):
             session.add(stock)
         count += 1
     session.commit()
+    bump_data_version("stocks")
+    SYNC_ROWS.inc(count, kind="stock_list")
+    SYNC_DURATION.observe(time.perf_counter() - started, kind="stock_list")
     return count
 
 def _delete_existing_prices(session, stock_id: int, start: date, end: date):
@@ -88,6 +104,7 @@ def sync_daily(session, symbols: list[str], start: date, end: date, sync_type: s
     sorted_sources = sorted(sources.items(), key=lambda x: x[1].get("priority", 99))
     count = 0
     total = len(symbols)
+    started = time.perf_counter()
     
     for i, symbol in enumerate(symbols):
         if progress_callback:
@@ -102,7 +119,7 @@ def sync_daily(session, symbols: list[str], start: date, end: date, sync_type: s
             if fetcher is None:
                 continue
             try:
-                data = fetcher(symbol, start, end)
+                data = timed_fetch(source_name, "daily", fetcher, symbol, start, end)
                 if data is not None and not data.empty:
                     used_source = config.get("name", source_name)
                     _log_sync(session, source_name, sync_type, start, end, "success", f"{symbol}: {len(data)} 条")
@@ -113,6 +130,7 @@ def sync_daily(session, symbols: list[str], start: date, end: date, sync_type: s
                 print(f"[同步] {symbol}: {config.get('name', source_name)} 失败 - {exc}")
                 
         if data is None or data.empty:
+            SYNC_SYMBOLS.inc(kind="daily", outcome="empty")
             continue
         stock = session.exec(select(Stock).where(Stock.symbol == symbol)).first()
         if not stock:
@@ -151,6 +169,11 @@ def sync_daily(session, symbols: list[str], start: date, end: date, sync_type: s
                 amount=float(row.get("amount", 0) or 0),
             ))
         session.commit()
+        # Roll the persisted indicator state forward, replaying the rewritten range
+        advance_indicator_state(session, stock.id, since=start)
+        # Invalidates cached backtests whose range overlaps the rewritten bars
+        record_price_sync(symbol, start, end)
+        update_symbol_pattern_stats(session, symbol, since=start)
         
         # Calculate derived metrics
         df = data.copy()
@@ -163,9 +186,19 @@ def sync_daily(session, symbols: list[str], start: date, end: date, sync_type: s
         df["liquidity"] = df["volume"].rolling(20).mean()
         _upsert_factors(session, stock.id, df.fillna(0))
         count += len(data)
+        SYNC_SYMBOLS.inc(kind="daily", outcome="synced")
+        SYNC_ROWS.inc(len(data), kind="daily")
     
+    if count:
+        # Daily rows also refresh market cap and valuation on the stock list
+        bump_data_version("stocks")
+        refresh_market_pattern_stats(session)
+        if settings.PATTERN_AUTO_SCAN:
+            # Only symbols that gained bars are rescanned, over their recent history
+            incremental_pattern_scan(session, symbols=symbols, max_workers=settings.PATTERN_SCAN_WORKERS or None)
     if progress_callback:
         progress_callback(total, total, "Finished")
+    SYNC_DURATION.observe(time.perf_counter() - started, kind="daily")
     return count
 
 def sync_financials(session, symbols: list[str]):
@@ -0,0 +1,144 @@
+"""
+Process pool for CPU-bound request work.
+
+Pandas-heavy calls (screening, backtests, pattern detection, exports) hold the GIL, so run
+in the API's threadpool they stall every other request, /health included. Routes hand them
+to ComputeExecutor instead:
+
+    rows = await compute_executor.run_with_session(screen_stocks, criteria)
+
+Tasks are top-level functions; `run_with_session` opens a database session in the worker
+and passes it first. At most COMPUTE_QUEUE_SIZE tasks are queued or running, beyond which
+ComputeBusy is raised rather than letting latency grow without bound. Each task has
+COMPUTE_TIMEOUT seconds from submission: the worker stops it with SIGALRM (effective
+between bytecodes, i.e. once the current NumPy call returns) and the caller stops waiting
+shortly after in any case.
+
+Code that fans out to its own process pool (pattern scans, sweeps, similarity search)
+checks `in_compute_worker()` and runs its chunks serially there, so a request never
+starts more processes than COMPUTE_WORKERS.
+"""
+
+import asyncio
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Optional
+from app.core.config import settings
+from app.db import engine, get_session
+from app.services.metrics import gauge
+
+logger = logging.getLogger(__name__)
+
+# How long the caller waits past the deadline for the worker to report the timeout itself
+_GRACE = 5.0
+
+class ComputeBusy(Exception):
+    """The queue is full."""
+
+class ComputeTimeout(Exception):
+    """The task ran past its deadline."""
+
+_in_worker = False
+
+def _init_worker():
+    global _in_worker
+    _in_worker = True
+    # Never reuse connections inherited from the parent process
+    engine.dispose(close=False)
+
+def in_compute_worker() -> bool:
+    """True inside a ComputeExecutor process, where work must not start another pool."""
+    return _in_worker
+
+def _on_alarm(signum, frame):
+    raise ComputeTimeout()
+
+def _call(func: Callable, args, kwargs, deadline: Optional[float], with_session: bool):
+    remaining = deadline - time.time() if deadline else None
+    if remaining is not None:
+        if remaining <= 0:
+            # Spent the whole budget queued; the caller has given up
+            raise ComputeTimeout()
+        signal.signal(signal.SIGALRM, _on_alarm)
+        signal.setitimer(signal.ITIMER_REAL, remaining)
+    try:
+        if with_session:
+            with get_session() as session:
+                return func(session, *args, **kwargs)
+        return func(*args, **kwargs)
+    finally:
+        if remaining is not None:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+class ComputeExecutor:
+    def __init__(self, workers: int, max_pending: int, timeout: float):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, initializer=_init_worker)
+        return self._pool
+
+    def _release(self, _future=None) -> None:
+        with self._lock:
+            self._pending -= 1
+
+    def submit(self, func: Callable, *args, with_session: bool = False, timeout: Optional[float] = None, **kwargs) -> Future:
+        """Queue a task; raises ComputeBusy when COMPUTE_QUEUE_SIZE tasks are outstanding."""
+        timeout = self.timeout if timeout is None else timeout
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise ComputeBusy()
+            self._pending += 1
+        try:
+            future = self._get_pool().submit(_call, func, args, kwargs, time.time() + timeout if timeout else None, with_session)
+        except Exception:
+            self._release()
+            raise
+        # The slot stays taken until the worker is really done, even if the caller gave up
+        future.add_done_callback(self._release)
+        return future
+
+    def _wait_timeout(self, timeout: Optional[float]) -> Optional[float]:
+        timeout = self.timeout if timeout is None else timeout
+        return timeout + _GRACE if timeout else None
+
+    async def run(self, func: Callable, *args, with_session: bool = False, timeout: Optional[float] = None, **kwargs) -> Any:
+        future = self.submit(func, *args, with_session=with_session, timeout=timeout, **kwargs)
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self._wait_timeout(timeout))
+        except asyncio.TimeoutError:
+            logger.warning("Compute task %s did not report back in time", getattr(func, "__name__", func))
+            raise ComputeTimeout()
+
+    async def run_with_session(self, func: Callable, *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        return await self.run(func, *args, with_session=True, timeout=timeout, **kwargs)
+
+    def call(self, func: Callable, *args, with_session: bool = False, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Blocking form for sync code paths; the calling thread waits without holding the GIL."""
+        future = self.submit(func, *args, with_session=with_session, timeout=timeout, **kwargs)
+        try:
+            return future.result(self._wait_timeout(timeout))
+        except TimeoutError:
+            future.cancel()
+            raise ComputeTimeout()
+
+    def shutdown(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+compute_executor = ComputeExecutor(settings.COMPUTE_WORKERS, settings.COMPUTE_QUEUE_SIZE, settings.COMPUTE_TIMEOUT)
+gauge("compute_tasks_pending", "Compute pool tasks queued or running.", callback=lambda: compute_executor.pending)
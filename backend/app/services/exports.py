@@ -0,0 +1,38 @@
+"""File exports, rendered in the compute executor (see executor.py)."""
+
+import io
+from datetime import date
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from sqlmodel import select
+from app.models import DailyPrice, Stock
+from app.services.screening import screen_stocks
+
+MEDIA_TYPES = {
+    "csv": "text/csv",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+def render_table(df: pd.DataFrame, file_type: str) -> bytes:
+    if file_type == "xlsx":
+        buffer = io.BytesIO()
+        df.to_excel(buffer, index=False)
+        return buffer.getvalue()
+    return df.to_csv(index=False).encode("utf-8")
+
+def render_rows(rows: List[Dict[str, Any]], file_type: str) -> bytes:
+    return render_table(pd.DataFrame(rows), file_type)
+
+def export_screening(session, criteria: Dict[str, Any], file_type: str) -> bytes:
+    return render_rows(screen_stocks(session, criteria), file_type)
+
+def export_prices(session, symbols: Optional[List[str]], start: Optional[date], end: Optional[date], file_type: str) -> bytes:
+    columns = list(DailyPrice.__table__.columns)
+    query = select(*columns)
+    if symbols:
+        query = query.where(DailyPrice.stock_id.in_(select(Stock.id).where(Stock.symbol.in_(symbols))))
+    if start:
+        query = query.where(DailyPrice.trade_date >= start)
+    if end:
+        query = query.where(DailyPrice.trade_date <= end)
+    return render_table(pd.DataFrame(session.exec(query).all(), columns=[c.name for c in columns]), file_type)
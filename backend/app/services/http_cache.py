@@ -0,0 +1,67 @@
+"""
+HTTP validation for read endpoints whose data only changes when it is synced.
+
+ETags are hashes of the request's key plus data-version stamps kept in Redis: a counter
+per scope, bumped by whatever rewrites that data, and an epoch chosen the first time Redis
+is used so a flushed Redis can never re-issue an old tag for new data. Checking a tag
+therefore costs one or two Redis reads and no database work. Without Redis no ETag is sent
+and responses are simply not cacheable.
+"""
+
+import hashlib
+import logging
+import time
+from typing import Iterable, Optional
+from fastapi import Request, Response
+from app.core.config import settings
+from app.services.cache import redis_client
+
+logger = logging.getLogger(__name__)
+
+_EPOCH_KEY = "data:epoch"
+
+def _version_key(scope: str) -> str:
+    return f"data:version:{scope}"
+
+def bump_data_version(*scopes: str) -> None:
+    """Invalidate ETags issued for the given scopes (called after the data changes)."""
+    try:
+        for scope in scopes:
+            redis_client.incr(_version_key(scope))
+    except Exception:
+        logger.warning("Could not bump data version for %s; clients may revalidate stale data", ", ".join(scopes))
+
+def data_versions(scopes: Iterable[str]) -> Optional[str]:
+    scopes = list(scopes)
+    try:
+        epoch = redis_client.get(_EPOCH_KEY)
+        if epoch is None:
+            redis_client.set(_EPOCH_KEY, str(time.time_ns()), nx=True)
+            epoch = redis_client.get(_EPOCH_KEY)
+        versions = redis_client.mget([_version_key(s) for s in scopes]) if scopes else []
+    except Exception:
+        return None
+    return ":".join([epoch or "", *(v or "0" for v in versions)])
+
+def make_etag(*parts) -> str:
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:24] + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    tags = [t.strip() for t in if_none_match.split(",")]
+    # Weak comparison, as RFC 9110 requires for If-None-Match
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+def check_not_modified(request: Request, response: Response, scopes: Iterable[str], *key) -> Optional[Response]:
+    """Tag `response` with an ETag for (key, scope versions); return a 304 to send instead
+    when the client already holds it. Call before any database work."""
+    versions = data_versions(scopes)
+    if versions is None:
+        return None
+    etag = make_etag(*key, versions)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={settings.HTTP_CACHE_MAX_AGE}, must-revalidate"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
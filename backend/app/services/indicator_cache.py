@@ -0,0 +1,166 @@
+"""
+Memoized indicator results shared by strategies, screening and backtests.
+
+Entries are keyed by (symbol, indicator, params, data version) so a key can never
+serve stale values: new or revised bars produce a new version. Values live in an
+in-process LRU bounded by INDICATOR_CACHE_MB and, when INDICATOR_CACHE_REDIS is on,
+in Redis as raw float64 buffers so other workers can reuse them.
+"""
+
+import struct
+import threading
+import zlib
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.metrics import CACHE_REQUESTS
+
+_HEADER = struct.Struct("<4sI")
+_MAGIC = b"IND1"
+
+def encode_arrays(arrays: List[np.ndarray]) -> bytes:
+    parts = [_HEADER.pack(_MAGIC, len(arrays))]
+    for arr in arrays:
+        arr = np.ascontiguousarray(arr, dtype="<f8")
+        parts.append(struct.pack(f"<I{arr.ndim}I", arr.ndim, *arr.shape))
+        parts.append(arr.tobytes())
+    return b"".join(parts)
+
+def decode_arrays(payload: bytes) -> List[np.ndarray]:
+    magic, count = _HEADER.unpack_from(payload, 0)
+    if magic != _MAGIC:
+        raise ValueError("Unknown indicator cache payload")
+    offset = _HEADER.size
+    arrays = []
+    for _ in range(count):
+        (ndim,) = struct.unpack_from("<I", payload, offset)
+        shape = struct.unpack_from(f"<{ndim}I", payload, offset + 4)
+        offset += 4 + 4 * ndim
+        size = int(np.prod(shape)) * 8
+        arrays.append(np.frombuffer(payload, dtype="<f8", count=size // 8, offset=offset).reshape(shape).copy())
+        offset += size
+    return arrays
+
+class IndicatorCache:
+    def __init__(self, max_bytes: int, redis_client=None, ttl: int = 86400):
+        self.max_bytes = max_bytes
+        self.redis_client = redis_client
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, List[np.ndarray]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[List[np.ndarray]]:
+        with self._lock:
+            arrays = self._entries.get(key)
+            if arrays is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache="indicator", result="hit")
+                return arrays
+        if self.redis_client is not None:
+            try:
+                payload = self.redis_client.get(key)
+            except Exception:
+                payload = None
+            if payload is not None:
+                arrays = decode_arrays(payload)
+                self._store(key, arrays)
+                self.hits += 1
+                CACHE_REQUESTS.inc(cache="indicator", result="hit")
+                return arrays
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache="indicator", result="miss")
+        return None
+
+    def set(self, key: str, arrays: List[np.ndarray]) -> None:
+        self._store(key, arrays)
+        if self.redis_client is not None:
+            try:
+                self.redis_client.setex(key, self.ttl, encode_arrays(arrays))
+            except Exception:
+                # Redis is an optimisation here, never a hard dependency
+                pass
+
+    def _store(self, key: str, arrays: List[np.ndarray]) -> None:
+        # Entries are handed out to many callers, so freeze them
+        for arr in arrays:
+            arr.flags.writeable = False
+        size = sum(a.nbytes for a in arrays)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._bytes -= sum(a.nbytes for a in self._entries.pop(key))
+            self._entries[key] = arrays
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= sum(a.nbytes for a in evicted)
+
+    def get_or_compute(self, key: str, compute: Callable[[], List[np.ndarray]]) -> List[np.ndarray]:
+        """The cached arrays themselves: shared and read-only, so copy before writing."""
+        arrays = self.get(key)
+        if arrays is None:
+            arrays = [np.asarray(a, dtype=float) for a in compute()]
+            self.set(key, arrays)
+        return arrays
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+def _redis_client():
+    if not settings.INDICATOR_CACHE_REDIS:
+        return None
+    import redis
+    return redis.Redis.from_url(settings.REDIS_URL)
+
+indicator_cache = IndicatorCache(settings.INDICATOR_CACHE_MB * 1024 * 1024, _redis_client(), settings.INDICATOR_CACHE_TTL)
+
+def data_version(*arrays) -> str:
+    """Cheap fingerprint of the input bars: length plus a CRC of the raw values."""
+    crc = 0
+    length = 0
+    for arr in arrays:
+        values = np.ascontiguousarray(np.asarray(arr, dtype=float))
+        crc = zlib.crc32(values.tobytes(), crc)
+        length = len(values)
+    return f"{length}:{crc:08x}"
+
+def indicator_key(symbol: str, indicator: str, params: Dict[str, Any], version: str) -> str:
+    param_str = ",".join(f"{k}={params[k]}" for k in sorted(params))
+    return f"ind:{symbol}:{indicator}:{param_str}:{version}"
+
+def frame_symbol(df: pd.DataFrame) -> Optional[str]:
+    symbol = df.attrs.get("symbol")
+    if symbol is None and "stock_id" in df.columns and len(df):
+        symbol = f"id{int(df['stock_id'].iloc[0])}"
+    return symbol
+
+def cached_indicator(df: pd.DataFrame, func: Callable, column: Optional[str] = None, **params):
+    """Call an indicators.py function on `df[column]` (or `df`), reusing a cached result.
+
+    Frames that cannot be tied to a symbol are computed directly. Results are copies the
+    caller may modify; the cached arrays stay read-only.
+    """
+    source = df[column] if column else df
+    symbol = frame_symbol(df)
+    if symbol is None:
+        return func(source, **params)
+    last_date = str(df["trade_date"].iloc[-1]) if "trade_date" in df.columns and len(df) else ""
+    inputs = [df[column]] if column else [df[c] for c in ("high", "low", "close") if c in df.columns]
+    key = indicator_key(symbol, f"{func.__name__}:{column or ''}", params, f"{last_date}:{data_version(*inputs)}")
+
+    def compute():
+        result = func(source, **params)
+        return [result] if isinstance(result, pd.Series) else list(result)
+
+    arrays = indicator_cache.get_or_compute(key, compute)
+    series = [pd.Series(a.copy(), index=df.index) for a in arrays]
+    return series[0] if len(series) == 1 else tuple(series)
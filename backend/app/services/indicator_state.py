@@ -0,0 +1,264 @@
+"""
+Incremental indicator engine.
+
+Keeps a small, JSON-serializable state per stock so that a new daily bar advances
+MA / RSI / MACD / KDJ in O(1) instead of recomputing the full history.
+Results match the batch functions in app.services.indicators.
+"""
+
+import json
+import math
+from collections import deque
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, Optional
+import numpy as np
+import pandas as pd
+from sqlmodel import select
+from app.models import DailyPrice, IndicatorSnapshot
+
+NAN = float("nan")
+
+def _is_nan(value: float) -> bool:
+    return value != value
+
+def _divide(num: float, den: float) -> float:
+    # Follow float64 semantics (x/0 -> inf, 0/0 -> nan) like the pandas batch path
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return float(np.float64(num) / np.float64(den))
+
+class EmaState:
+    """pandas `ewm(alpha=..., adjust=False).mean()` one value at a time."""
+
+    def __init__(self, alpha: float, weighted: float = NAN, old_wt: float = 1.0, nobs: int = 0):
+        self.alpha = alpha
+        self.weighted = weighted
+        self.old_wt = old_wt
+        self.nobs = nobs
+
+    def update(self, value: float) -> float:
+        is_observation = not _is_nan(value)
+        self.nobs += int(is_observation)
+        if not _is_nan(self.weighted):
+            # Gaps decay the previous weight, same as pandas with ignore_na=False
+            self.old_wt *= 1 - self.alpha
+            if is_observation:
+                if self.weighted != value:
+                    self.weighted = (self.old_wt * self.weighted + self.alpha * value) / (self.old_wt + self.alpha)
+                self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = value
+        return self.weighted if self.nobs else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"alpha": self.alpha, "weighted": self.weighted, "old_wt": self.old_wt, "nobs": self.nobs}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "EmaState":
+        return cls(**data)
+
+class RollingState:
+    """Fixed-size window over the last N values with running sum and monotonic min/max queues."""
+
+    def __init__(self, window: int, values=None, total: float = 0.0, nan_count: int = 0, index: int = 0, max_queue=None, min_queue=None):
+        self.window = window
+        self.values = deque(values or [], maxlen=window)
+        self.total = total
+        self.nan_count = nan_count
+        self.index = index
+        # (position, value) pairs, values decreasing / increasing respectively
+        self.max_queue = deque(tuple(item) for item in (max_queue or []))
+        self.min_queue = deque(tuple(item) for item in (min_queue or []))
+
+    def update(self, value: float) -> None:
+        if len(self.values) == self.window:
+            dropped = self.values[0]
+            if _is_nan(dropped):
+                self.nan_count -= 1
+            else:
+                self.total -= dropped
+        self.values.append(value)
+        if _is_nan(value):
+            self.nan_count += 1
+        else:
+            self.total += value
+            while self.max_queue and self.max_queue[-1][1] <= value:
+                self.max_queue.pop()
+            self.max_queue.append((self.index, value))
+            while self.min_queue and self.min_queue[-1][1] >= value:
+                self.min_queue.pop()
+            self.min_queue.append((self.index, value))
+        expired = self.index - self.window
+        while self.max_queue and self.max_queue[0][0] <= expired:
+            self.max_queue.popleft()
+        while self.min_queue and self.min_queue[0][0] <= expired:
+            self.min_queue.popleft()
+        self.index += 1
+
+    @property
+    def full(self) -> bool:
+        return len(self.values) == self.window and self.nan_count == 0
+
+    def mean(self) -> float:
+        return self.total / self.window if self.full else NAN
+
+    def max(self) -> float:
+        return self.max_queue[0][1] if self.full else NAN
+
+    def min(self) -> float:
+        return self.min_queue[0][1] if self.full else NAN
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "window": self.window,
+            "values": list(self.values),
+            "total": self.total,
+            "nan_count": self.nan_count,
+            "index": self.index,
+            "max_queue": [list(item) for item in self.max_queue],
+            "min_queue": [list(item) for item in self.min_queue],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RollingState":
+        return cls(**data)
+
+class IndicatorState:
+    """Per-stock incremental MA / RSI / MACD / KDJ with the same defaults as the batch functions."""
+
+    def __init__(self, ma_windows=(5, 10, 20, 60), rsi_window: int = 14, fast: int = 12, slow: int = 26, signal: int = 9, n: int = 9, k_period: int = 3, d_period: int = 3):
+        self.params = {"ma_windows": list(ma_windows), "rsi_window": rsi_window, "fast": fast, "slow": slow, "signal": signal, "n": n, "k_period": k_period, "d_period": d_period}
+        self.last_date: Optional[date] = None
+        self.prev_close = NAN
+        self.ma = {int(w): RollingState(int(w)) for w in ma_windows}
+        self.gain = RollingState(rsi_window)
+        self.loss = RollingState(rsi_window)
+        self.ema_fast = EmaState(2 / (fast + 1))
+        self.ema_slow = EmaState(2 / (slow + 1))
+        self.ema_signal = EmaState(2 / (signal + 1))
+        self.low = RollingState(n)
+        self.high = RollingState(n)
+        self.k = EmaState(1 / k_period)
+        self.d = EmaState(1 / d_period)
+
+    def update(self, high: float, low: float, close: float, trade_date: Optional[date] = None) -> Dict[str, float]:
+        high, low, close = float(high), float(low), float(close)
+        values = {}
+        for window, state in self.ma.items():
+            state.update(close)
+            values[f"ma_{window}"] = state.mean()
+
+        # diff() of the first bar is NaN, which the batch rsi() turns into a zero gain/loss
+        delta = close - self.prev_close
+        self.prev_close = close
+        self.gain.update(delta if delta > 0 else 0.0)
+        self.loss.update(-delta if delta < 0 else 0.0)
+        loss = self.loss.mean()
+        rs = _divide(self.gain.mean(), NAN if loss == 0 else loss)
+        values["rsi"] = 100 - _divide(100, 1 + rs)
+
+        macd_line = self.ema_fast.update(close) - self.ema_slow.update(close)
+        signal_line = self.ema_signal.update(macd_line)
+        values.update({"macd": macd_line, "macd_signal": signal_line, "macd_hist": macd_line - signal_line})
+
+        self.low.update(low)
+        self.high.update(high)
+        low_min, high_max = self.low.min(), self.high.max()
+        rsv = _divide(close - low_min, high_max - low_min) * 100
+        k = self.k.update(rsv)
+        d = self.d.update(k)
+        values.update({"kdj_k": k, "kdj_d": d, "kdj_j": 3 * k - 2 * d})
+
+        if trade_date is not None:
+            self.last_date = trade_date
+        return values
+
+    def update_frame(self, df: pd.DataFrame) -> pd.DataFrame:
+        rows = []
+        dates = df["trade_date"] if "trade_date" in df.columns else [None] * len(df)
+        for high, low, close, trade_date in zip(df["high"], df["low"], df["close"], dates):
+            rows.append(self.update(high, low, close, trade_date))
+        return pd.DataFrame(rows, index=df.index)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "params": self.params,
+            "last_date": self.last_date.isoformat() if self.last_date else None,
+            "prev_close": self.prev_close,
+            "ma": {str(w): s.to_dict() for w, s in self.ma.items()},
+            "gain": self.gain.to_dict(),
+            "loss": self.loss.to_dict(),
+            "ema_fast": self.ema_fast.to_dict(),
+            "ema_slow": self.ema_slow.to_dict(),
+            "ema_signal": self.ema_signal.to_dict(),
+            "low": self.low.to_dict(),
+            "high": self.high.to_dict(),
+            "k": self.k.to_dict(),
+            "d": self.d.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "IndicatorState":
+        state = cls(**data["params"])
+        state.last_date = date.fromisoformat(data["last_date"]) if data["last_date"] else None
+        state.prev_close = data["prev_close"]
+        state.ma = {int(w): RollingState.from_dict(s) for w, s in data["ma"].items()}
+        for name in ("gain", "loss", "low", "high"):
+            setattr(state, name, RollingState.from_dict(data[name]))
+        for name in ("ema_fast", "ema_slow", "ema_signal", "k", "d"):
+            setattr(state, name, EmaState.from_dict(data[name]))
+        return state
+
+    def dumps(self) -> str:
+        # NaN is valid in Python's json round trip, which is all the state needs
+        return json.dumps(self.to_dict())
+
+    @classmethod
+    def loads(cls, payload: str) -> "IndicatorState":
+        return cls.from_dict(json.loads(payload))
+
+# The snapshot also keeps the state as of a bar at least this many days before its last bar,
+# so a sync that rewrites recent bars replays from there instead of from the first bar
+CHECKPOINT_DAYS = 10
+
+def advance_indicator_state(session, stock_id: int, since: Optional[date] = None) -> Dict[str, float]:
+    """Feed new bars into the stock's state and persist it.
+
+    `since` is the first date the caller rewrote. If the state already covers it, bars are
+    replayed from the checkpoint (or from the first bar, when the checkpoint is not older)
+    so revised bars reach the state instead of being skipped.
+    """
+    snapshot = session.exec(select(IndicatorSnapshot).where(IndicatorSnapshot.stock_id == stock_id)).first()
+    state = IndicatorState.loads(snapshot.state_json) if snapshot else IndicatorState()
+    checkpoint_date = snapshot.checkpoint_date if snapshot else None
+    checkpoint_json = snapshot.checkpoint_json if snapshot else None
+    replay = since is not None and state.last_date is not None and since <= state.last_date
+    if replay:
+        if checkpoint_date is not None and checkpoint_date < since:
+            state = IndicatorState.loads(checkpoint_json)
+        else:
+            state, checkpoint_date, checkpoint_json = IndicatorState(), None, None
+    query = select(DailyPrice.trade_date, DailyPrice.high, DailyPrice.low, DailyPrice.close).where(DailyPrice.stock_id == stock_id)
+    if state.last_date:
+        query = query.where(DailyPrice.trade_date > state.last_date)
+    bars = session.exec(query.order_by(DailyPrice.trade_date)).all()
+    values = json.loads(snapshot.values_json) if snapshot and not replay else {}
+    if not bars and not replay:
+        return values
+    # Move the checkpoint to the last bar at least CHECKPOINT_DAYS before the newest one
+    cutoff = bars[-1][0] - timedelta(days=CHECKPOINT_DAYS) if bars else None
+    checkpoint_at = max((i for i, bar in enumerate(bars) if bar[0] <= cutoff), default=None)
+    for i, (trade_date, high, low, close) in enumerate(bars):
+        values = state.update(high, low, close, trade_date)
+        if i == checkpoint_at:
+            checkpoint_date, checkpoint_json = trade_date, state.dumps()
+    if snapshot is None:
+        snapshot = IndicatorSnapshot(stock_id=stock_id)
+    snapshot.last_date = state.last_date
+    snapshot.state_json = state.dumps()
+    snapshot.values_json = json.dumps({k: (None if math.isnan(v) else v) for k, v in values.items()})
+    snapshot.checkpoint_date = checkpoint_date
+    snapshot.checkpoint_json = checkpoint_json
+    snapshot.updated_at = datetime.utcnow()
+    session.add(snapshot)
+    session.commit()
+    return values
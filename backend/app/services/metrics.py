@@ -0,0 +1,256 @@
+"""
+In-process metrics in the Prometheus text exposition format (served at /metrics).
+
+Counters, gauges and histograms with labels, thread-safe and dependency-free. Values are
+per process: with several API workers, scrape each one or aggregate in Prometheus. Work
+done inside the compute and backtest pools is visible through the request that awaited
+it, not through the pool processes' own DB or cache counters. Scheduled jobs ship their
+child process's counter and histogram increments back with Registry.delta / merge.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def state(self) -> Dict[Tuple[str, ...], float]:
+        with self._lock:
+            return dict(self._values)
+
+    def diff(self, before: Dict[Tuple[str, ...], float]) -> Dict[Tuple[str, ...], float]:
+        return {k: v - before.get(k, 0.0) for k, v in self.state().items() if v != before.get(k, 0.0)}
+
+    def add(self, delta: Dict[Tuple[str, ...], float]) -> None:
+        with self._lock:
+            for key, amount in delta.items():
+                self._values[key] = self._values.get(key, 0.0) + amount
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return self.header() + [f"{self.name}{_labels(self.labelnames, k)} {_number(v)}" for k, v in items]
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, *args, callback: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.callback = callback
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = float(value)
+
+    def collect(self) -> List[str]:
+        if self.callback is not None:
+            self.set(self.callback())
+        return super().collect()
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [bucket counts..., sum, count]
+        self._values: Dict[Tuple[str, ...], List[float]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> float:
+        state = self._values.get(self._key(labels))
+        return state[-1] if state else 0.0
+
+    def state(self) -> Dict[Tuple[str, ...], List[float]]:
+        with self._lock:
+            return {k: list(v) for k, v in self._values.items()}
+
+    def diff(self, before: Dict[Tuple[str, ...], List[float]]) -> Dict[Tuple[str, ...], List[float]]:
+        delta = {}
+        for key, state in self.state().items():
+            prior = before.get(key, [0.0] * len(state))
+            if state[-1] != prior[-1]:
+                delta[key] = [a - b for a, b in zip(state, prior)]
+        return delta
+
+    def add(self, delta: Dict[Tuple[str, ...], List[float]]) -> None:
+        with self._lock:
+            for key, values in delta.items():
+                state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+                for i, value in enumerate(values):
+                    state[i] += value
+
+    def collect(self) -> List[str]:
+        with self._lock:
+            items = [(k, list(v)) for k, v in self._values.items()]
+        lines = self.header()
+        for key, state in items:
+            cumulative = 0.0
+            for bound, count in zip(self.buckets, state):
+                cumulative += count
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_number(cumulative)}")
+            le = 'le="+Inf"'
+            lines.append(f"{self.name}_bucket{_labels(self.labelnames, key, le)} {_number(state[-1])}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, key)} {_number(state[-2])}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, key)} {_number(state[-1])}")
+        return lines
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.setdefault(metric.name, metric)
+        return self._metrics[metric.name]
+
+    def _additive(self) -> Dict[str, _Metric]:
+        # Gauges are point-in-time values of one process; they do not add up across processes
+        return {name: m for name, m in self._metrics.items() if not isinstance(m, Gauge)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: m.state() for name, m in self._additive().items()}
+
+    def delta(self, before: Dict[str, Any]) -> Dict[str, Any]:
+        """Counter and histogram increments since `before`, in a picklable form."""
+        delta = {name: m.diff(before.get(name, {})) for name, m in self._additive().items()}
+        return {name: d for name, d in delta.items() if d}
+
+    def merge(self, delta: Dict[str, Any]) -> None:
+        """Add increments recorded by another process (see delta)."""
+        metrics = self._additive()
+        for name, values in delta.items():
+            if name in metrics:
+                metrics[name].add(values)
+
+    def render(self) -> str:
+        return "\n".join(line for metric in self._metrics.values() for line in metric.collect()) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.register(Counter(name, documentation, labelnames))
+
+def gauge(name: str, documentation: str, labelnames: Sequence[str] = (), callback: Optional[Callable[[], float]] = None) -> Gauge:
+    return REGISTRY.register(Gauge(name, documentation, labelnames, callback=callback))
+
+def histogram(name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+HTTP_REQUESTS = counter("http_requests_total", "HTTP requests by route template and status.", ("method", "route", "status"))
+HTTP_LATENCY = histogram("http_request_duration_seconds", "HTTP request latency by route template.", ("method", "route"))
+HTTP_IN_FLIGHT = gauge("http_requests_in_flight", "HTTP requests being served.")
+DB_QUERIES = counter("db_queries_total", "SQL statements executed, by statement type.", ("operation",))
+DB_LATENCY = histogram("db_query_duration_seconds", "SQL statement latency, by statement type.", ("operation",), buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+DB_ERRORS = counter("db_query_errors_total", "SQL statements that raised.", ("operation",))
+CACHE_REQUESTS = counter("cache_requests_total", "Cache lookups by cache and result (hit, stale, miss).", ("cache", "result"))
+SOURCE_LATENCY = histogram("data_source_fetch_duration_seconds", "Market data source fetch latency.", ("source", "kind"))
+SOURCE_ERRORS = counter("data_source_errors_total", "Market data source fetches that raised.", ("source", "kind"))
+SYNC_ROWS = counter("sync_rows_total", "Rows written by data sync runs.", ("kind",))
+SYNC_SYMBOLS = counter("sync_symbols_total", "Symbols processed by data sync runs, by outcome.", ("kind", "outcome"))
+SYNC_DURATION = histogram("sync_duration_seconds", "Data sync run duration.", ("kind",), buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+JOB_DURATION = histogram("scheduler_job_duration_seconds", "Scheduled job run duration, by job and status.", ("job", "status"), buckets=(1, 5, 15, 30, 60, 120, 300, 600, 1800, 3600))
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else ""
+    return word if word in ("SELECT", "INSERT", "UPDATE", "DELETE") else "OTHER"
+
+def instrument_engine(engine) -> None:
+    """Count and time every statement run through a SQLAlchemy engine."""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _start(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _finish(conn, cursor, statement, parameters, context, executemany):
+        operation = _operation(statement)
+        DB_QUERIES.inc(operation=operation)
+        DB_LATENCY.observe(time.perf_counter() - conn.info["query_start"].pop(), operation=operation)
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        stack = context.connection.info.get("query_start") if context.connection is not None else None
+        if stack:
+            stack.pop()
+        DB_ERRORS.inc(operation=_operation(context.statement or ""))
+
+def timed_fetch(source: str, kind: str, fetcher: Callable, *args):
+    """Call a data source fetcher, recording its latency and failures."""
+    start = time.perf_counter()
+    try:
+        return fetcher(*args)
+    except Exception:
+        SOURCE_ERRORS.inc(source=source, kind=kind)
+        raise
+    finally:
+        SOURCE_LATENCY.observe(time.perf_counter() - start, source=source, kind=kind)
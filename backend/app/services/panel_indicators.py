@@ -0,0 +1,179 @@
+"""
+Panel (dates x symbols) versions of the indicators in app.services.indicators.
+
+All inputs are 2-D arrays aligned on one trading calendar, NaN where a symbol did not
+trade. Each column is compacted so indicators run over the symbol's own trading bars
+(a suspension does not break a moving window), then scattered back with NaN on the
+suspended days. Intermediates such as EMAs, cumulative sums and rolling extremes are
+computed once and shared between indicators in the same call.
+"""
+
+from typing import Dict, Any, Optional
+import numpy as np
+import pandas as pd
+
+DEFAULT_SPEC = {
+    "ma": [5, 10, 20, 60],
+    "rsi": [14],
+    "macd": [(12, 26, 9)],
+    "kdj": [(9, 3, 3)],
+    "atr": [14],
+    "boll": [(20, 2.0)],
+    "obv": True,
+    "highest": [20],
+    "lowest": [20],
+}
+
+class _PanelContext:
+    def __init__(self, close: np.ndarray, high: Optional[np.ndarray], low: Optional[np.ndarray], volume: Optional[np.ndarray]):
+        close = np.asarray(close, dtype=float)
+        self.missing = np.isnan(close)
+        # Trailing NaN are harmless; only columns with a gap before their last
+        # trading bar (late listing, suspension) need compacting
+        valid = ~self.missing
+        last = len(close) - 1 - valid[::-1].argmax(axis=0)
+        self.gap_cols = np.flatnonzero(valid.any(axis=0) & (valid.sum(axis=0) < last + 1))
+        # Stable sort keeps each column's trading bars in order and pushes gaps to the end
+        self.order = np.argsort(self.missing[:, self.gap_cols], axis=0, kind="stable")
+        self.fields = {"close": close, "high": high, "low": low, "volume": volume}
+        self.memo: Dict[Any, np.ndarray] = {}
+
+    def field(self, name: str) -> np.ndarray:
+        key = ("field", name)
+        if key not in self.memo:
+            raw = self.fields[name]
+            if raw is None:
+                raise ValueError(f"{name} panel is required for this indicator")
+            values = np.array(raw, dtype=float)
+            values[self.missing] = np.nan
+            if len(self.gap_cols):
+                values[:, self.gap_cols] = np.take_along_axis(values[:, self.gap_cols], self.order, axis=0)
+            self.memo[key] = values
+        return self.memo[key]
+
+    def expand(self, values: np.ndarray) -> np.ndarray:
+        # In place: results are fresh arrays that are not read again once expanded
+        if len(self.gap_cols):
+            scattered = np.empty((len(values), len(self.gap_cols)))
+            np.put_along_axis(scattered, self.order, values[:, self.gap_cols], axis=0)
+            values[:, self.gap_cols] = scattered
+        values[self.missing] = np.nan
+        return values
+
+    def cached(self, key, compute):
+        if key not in self.memo:
+            self.memo[key] = compute()
+        return self.memo[key]
+
+    def cumsum(self, name: str, values_fn=None) -> np.ndarray:
+        # Leading zero row so window sums are cs[t + 1] - cs[t + 1 - window]
+        def compute():
+            values = values_fn() if values_fn else self.field(name)
+            return np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+        return self.cached(("cumsum", name), compute)
+
+    def rolling_mean(self, name: str, window: int, values_fn=None) -> np.ndarray:
+        def compute():
+            cs = self.cumsum(name, values_fn)
+            out = np.full((cs.shape[0] - 1, cs.shape[1]), np.nan)
+            if window <= out.shape[0]:
+                out[window - 1:] = (cs[window:] - cs[:-window]) / window
+            return out
+        return self.cached(("mean", name, window), compute)
+
+    def ema(self, key, values: np.ndarray, **kwargs) -> np.ndarray:
+        return self.cached(("ema", key, tuple(sorted(kwargs.items()))), lambda: pd.DataFrame(values).ewm(adjust=False, **kwargs).mean().to_numpy())
+
+    def rolling(self, name: str, window: int, how: str) -> np.ndarray:
+        return self.cached(("rolling", name, window, how), lambda: getattr(pd.DataFrame(self.field(name)).rolling(window), how)().to_numpy())
+
+    def gains_losses(self):
+        def compute():
+            delta = np.diff(self.field("close"), axis=0, prepend=np.nan)
+            # Same convention as indicators.rsi: the undefined first delta counts as zero
+            gain = np.where(delta > 0, delta, 0.0)
+            loss = np.where(delta < 0, -delta, 0.0)
+            gain[np.isnan(self.field("close"))] = np.nan
+            loss[np.isnan(self.field("close"))] = np.nan
+            return gain, loss
+        return self.cached(("gains_losses",), compute)
+
+def compute_panel_indicators(close, high=None, low=None, volume=None, spec: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+    """Compute every indicator in `spec` for all symbols in one pass.
+
+    Returns arrays shaped like `close`, keyed e.g. `ma_20`, `rsi_14`, `macd_12_26_9`,
+    `kdj_k_9_3_3`, `atr_14`, `boll_upper_20_2`, `obv`, `highest_20`.
+    """
+    spec = DEFAULT_SPEC if spec is None else spec
+    ctx = _PanelContext(close, high, low, volume)
+    out = {}
+
+    for window in spec.get("ma", []):
+        out[f"ma_{window}"] = ctx.rolling_mean("close", int(window))
+
+    for window in spec.get("rsi", []):
+        gain = ctx.rolling_mean("gain", int(window), lambda: ctx.gains_losses()[0])
+        loss = ctx.rolling_mean("loss", int(window), lambda: ctx.gains_losses()[1])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rs = gain / np.where(loss == 0, np.nan, loss)
+            out[f"rsi_{window}"] = 100 - 100 / (1 + rs)
+
+    for fast, slow, signal in spec.get("macd", []):
+        closes = ctx.field("close")
+        macd_line = ctx.ema(("close",), closes, span=fast) - ctx.ema(("close",), closes, span=slow)
+        signal_line = ctx.ema(("macd", fast, slow), macd_line, span=signal)
+        suffix = f"{fast}_{slow}_{signal}"
+        out[f"macd_{suffix}"] = macd_line
+        out[f"macd_signal_{suffix}"] = signal_line
+        out[f"macd_hist_{suffix}"] = macd_line - signal_line
+
+    for n, k_period, d_period in spec.get("kdj", []):
+        low_min = ctx.rolling("low", n, "min")
+        high_max = ctx.rolling("high", n, "max")
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rsv = (ctx.field("close") - low_min) / (high_max - low_min) * 100
+        k = ctx.ema(("rsv", n), rsv, alpha=1 / k_period)
+        d = ctx.ema(("k", n, k_period), k, alpha=1 / d_period)
+        suffix = f"{n}_{k_period}_{d_period}"
+        out[f"kdj_k_{suffix}"] = k
+        out[f"kdj_d_{suffix}"] = d
+        out[f"kdj_j_{suffix}"] = 3 * k - 2 * d
+
+    if spec.get("atr"):
+        def true_range():
+            h, l, c = ctx.field("high"), ctx.field("low"), ctx.field("close")
+            prev_close = np.vstack([np.full((1, c.shape[1]), np.nan), c[:-1]])
+            return np.fmax(h - l, np.fmax(np.abs(h - prev_close), np.abs(l - prev_close)))
+        for window in spec["atr"]:
+            out[f"atr_{window}"] = ctx.rolling_mean("tr", int(window), true_range)
+
+    for window, width in spec.get("boll", []):
+        mid = ctx.rolling_mean("close", int(window))
+        std = ctx.rolling("close", int(window), "std")
+        suffix = f"{window}_{width:g}"
+        out[f"boll_mid_{suffix}"] = mid
+        out[f"boll_upper_{suffix}"] = mid + width * std
+        out[f"boll_lower_{suffix}"] = mid - width * std
+
+    if spec.get("obv"):
+        c = ctx.field("close")
+        direction = np.sign(np.diff(c, axis=0, prepend=np.nan))
+        flow = np.nan_to_num(direction) * ctx.field("volume")
+        out["obv"] = np.cumsum(np.where(np.isnan(c), np.nan, flow), axis=0)
+
+    for window in spec.get("highest", []):
+        out[f"highest_{window}"] = ctx.rolling("high", int(window), "max")
+    for window in spec.get("lowest", []):
+        out[f"lowest_{window}"] = ctx.rolling("low", int(window), "min")
+
+    # Shared intermediates (e.g. ma_20 and boll_mid_20_2) must only be expanded once
+    expanded = {}
+    for name, values in out.items():
+        if id(values) not in expanded:
+            expanded[id(values)] = ctx.expand(values)
+        out[name] = expanded[id(values)]
+    return out
+
+def compute_market_indicators(panel: Dict[str, Any], spec: Optional[Dict[str, Any]] = None) -> Dict[str, np.ndarray]:
+    """Refresh indicators for a whole price panel (see app.services.price_panel) in one call."""
+    return compute_panel_indicators(panel["close"], panel.get("high"), panel.get("low"), panel.get("volume"), spec)
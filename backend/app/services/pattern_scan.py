@@ -0,0 +1,180 @@
+"""
+Market-wide pattern scanning.
+
+Prices for every requested symbol are loaded in one query and split into chunks that a
+process pool runs detect_patterns on. The API instead sends batches of symbols to the
+compute pool (scan_symbols), each scanned serially there. Each finished chunk is upserted into PatternResult
+(unique on symbol, pattern_name, detected_date, so rescans update rather than duplicate)
+and yielded straight away, which lets the API stream partial results.
+
+incremental_pattern_scan is the post-sync variant: it tracks the last scanned bar per
+symbol and scan configuration in PatternScanState and only revisits symbols that gained
+bars, reading just their recent history.
+"""
+
+import json
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import delete, func, tuple_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import select
+from app.core.config import settings
+from app.models import DailyPrice, PatternResult, PatternScanState, Stock
+from app.services.executor import in_compute_worker
+from app.services.pattern_stats import MARKET, success_rate_table
+from app.services.patterns import PATTERN_NAMES, detect_patterns, find_pattern_occurrences, tail_is_sufficient
+from app.services.price_panel import load_price_frame
+
+UPSERT_BATCH = 1000
+
+def _scan_chunk(chunk: List[Tuple[str, np.ndarray, np.ndarray]], patterns: List[str], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    results = []
+    for symbol, dates, close in chunk:
+        found = detect_patterns(pd.DataFrame({"trade_date": dates, "close": close}), patterns, params)
+        if found:
+            results.append({"symbol": symbol, "patterns": found})
+    return results
+
+def upsert_pattern_results(session, rows: List[Dict[str, Any]]) -> None:
+    """Insert or update rows keyed on (symbol, pattern_name, detected_date)."""
+    dialect = session.get_bind().dialect.name
+    for i in range(0, len(rows), UPSERT_BATCH):
+        batch = rows[i:i + UPSERT_BATCH]
+        if dialect in ("postgresql", "sqlite"):
+            insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+            stmt = insert(PatternResult).values(batch)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["symbol", "pattern_name", "detected_date"],
+                set_={"success_rate": stmt.excluded.success_rate, "score": stmt.excluded.score},
+            )
+            session.execute(stmt)
+        else:
+            keys = [(r["symbol"], r["pattern_name"], r["detected_date"]) for r in batch]
+            session.execute(delete(PatternResult).where(tuple_(PatternResult.symbol, PatternResult.pattern_name, PatternResult.detected_date).in_(keys)))
+            session.bulk_insert_mappings(PatternResult, batch)
+    session.commit()
+
+def _chunks(items: List[Any], workers: int) -> List[List[Any]]:
+    # A few chunks per worker keeps the pool busy when symbols differ in history length
+    size = max(1, math.ceil(len(items) / (workers * 4)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def _groups(prices: pd.DataFrame) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    prices = prices.sort_values(["symbol", "trade_date"])
+    return [(symbol, df["trade_date"].to_numpy(), df["close"].to_numpy(dtype=float)) for symbol, df in prices.groupby("symbol", sort=False)]
+
+def _scan_groups(session, groups, patterns: List[str], params: Dict[str, Any], max_workers: Optional[int]) -> Iterator[List[Dict[str, Any]]]:
+    if not groups:
+        return
+    names = dict(session.exec(select(Stock.symbol, Stock.name)).all())
+    rates = success_rate_table(session)
+    workers = 1 if in_compute_worker() else max_workers or os.cpu_count() or 1
+    chunks = _chunks(groups, workers)
+
+    def finish(matches: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        rows = []
+        for match in matches:
+            symbol_rates = {**rates[MARKET], **rates.get(match["symbol"], {})}
+            for item in match["patterns"]:
+                # The symbol's own hit rate, else the market's, else unknown
+                item["success_rate"] = symbol_rates.get(item["pattern_name"])
+                rows.append({"symbol": match["symbol"], "pattern_name": item["pattern_name"], "detected_date": date.fromisoformat(item["detected_date"]), "success_rate": item["success_rate"], "score": item["score"]})
+            match["name"] = names.get(match["symbol"])
+        if rows:
+            upsert_pattern_results(session, rows)
+        return matches
+
+    if workers <= 1 or len(chunks) == 1:
+        for chunk in chunks:
+            yield finish(_scan_chunk(chunk, patterns, params))
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        futures = [pool.submit(_scan_chunk, chunk, patterns, params) for chunk in chunks]
+        for future in as_completed(futures):
+            yield finish(future.result())
+
+def iter_pattern_scan(session, patterns: List[str], start: date, end: date, params: Optional[Dict[str, Any]] = None, symbols: Optional[List[str]] = None, max_workers: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Scan and persist, yielding each chunk's matches as {"symbol", "name", "patterns"}."""
+    prices = load_price_frame(session, start, end, symbols, ("close",))
+    yield from _scan_groups(session, _groups(prices), patterns, params or {}, max_workers)
+
+def scan_universe(session, symbols: Optional[List[str]] = None) -> List[str]:
+    """Symbols a market scan covers, split by the API into compute-pool tasks."""
+    query = select(Stock.symbol).order_by(Stock.symbol)
+    if symbols:
+        query = query.where(Stock.symbol.in_(symbols))
+    return list(session.exec(query).all())
+
+def scan_batches(symbols: List[str], workers: int) -> List[List[str]]:
+    return _chunks(symbols, workers)
+
+def scan_symbols(session, patterns: List[str], start: date, end: date, params: Optional[Dict[str, Any]], symbols: List[str]) -> List[Dict[str, Any]]:
+    """One compute task of a market scan: scan and persist `symbols`, return their matches."""
+    return [item for batch in iter_pattern_scan(session, patterns, start, end, params, symbols) for item in batch]
+
+def scan_params_key(patterns: List[str], params: Dict[str, Any]) -> str:
+    return json.dumps({"patterns": sorted(patterns), "params": params}, sort_keys=True, ensure_ascii=False, default=str)
+
+def _tail_groups(session, latest: Dict[str, date], params: Dict[str, Any]) -> List[Tuple[str, np.ndarray, np.ndarray]]:
+    """Trailing bars of each symbol, widened to the full history where the tail is too short.
+
+    The tail is measured back from each symbol's own latest bar; symbols sharing that date
+    (normally nearly all of them) are loaded in one query.
+    """
+    # Calendar days that comfortably cover PATTERN_TAIL_BARS trading days
+    span = timedelta(days=settings.PATTERN_TAIL_BARS * 7 // 5 + 14)
+    by_date: Dict[date, List[str]] = {}
+    for symbol, last in latest.items():
+        by_date.setdefault(last, []).append(symbol)
+    groups = []
+    for last, symbols in sorted(by_date.items()):
+        groups += _groups(load_price_frame(session, last - span, None, symbols, ("close",)))
+    short = [symbol for symbol, _, close in groups if not tail_is_sufficient(close, params)]
+    if short:
+        groups = [g for g in groups if g[0] not in set(short)] + _groups(load_price_frame(session, None, None, short, ("close",)))
+    return groups
+
+def incremental_pattern_scan(session, patterns: Optional[List[str]] = None, params: Optional[Dict[str, Any]] = None, symbols: Optional[List[str]] = None, max_workers: Optional[int] = None) -> Dict[str, int]:
+    """Re-scan only symbols with bars newer than their last scan for this configuration.
+
+    Work scales with the number of symbols that advanced, and each one reads only the tail
+    detect_patterns depends on.
+    """
+    patterns = patterns or PATTERN_NAMES
+    params = params or {}
+    key = scan_params_key(patterns, params)
+    query = select(Stock.symbol, func.max(DailyPrice.trade_date)).join(Stock, Stock.id == DailyPrice.stock_id).group_by(Stock.symbol)
+    if symbols:
+        query = query.where(Stock.symbol.in_(symbols))
+    latest = {symbol: last for symbol, last in session.exec(query).all() if last is not None}
+    states = {s.symbol: s for s in session.exec(select(PatternScanState).where(PatternScanState.params_key == key, PatternScanState.symbol.in_(list(latest)))).all()}
+    advanced = {symbol: last for symbol, last in latest.items() if symbol not in states or states[symbol].last_bar_date < last}
+    if not advanced:
+        return {"scanned": 0, "matched": 0}
+
+    matched = 0
+    for batch in _scan_groups(session, _tail_groups(session, advanced, params), patterns, params, max_workers):
+        matched += len(batch)
+    for symbol, last in advanced.items():
+        state = states.get(symbol) or PatternScanState(symbol=symbol, params_key=key, last_bar_date=last)
+        state.last_bar_date = last
+        state.updated_at = datetime.utcnow()
+        session.add(state)
+    session.commit()
+    return {"scanned": len(advanced), "matched": matched}
+
+def market_pattern_occurrences(session, patterns: List[str], start: date, end: date, params: Optional[Dict[str, Any]] = None, symbols: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Every occurrence of `patterns` per symbol in [start, end], as {"symbol", "name", "occurrences"}."""
+    prices = load_price_frame(session, start, end, symbols, ("close",))
+    names = dict(session.exec(select(Stock.symbol, Stock.name)).all())
+    results = []
+    for symbol, df in prices.groupby("symbol", sort=False):
+        occurrences = find_pattern_occurrences(df.sort_values("trade_date"), patterns, params or {})
+        if occurrences:
+            results.append({"symbol": symbol, "name": names.get(symbol), "occurrences": occurrences})
+    return results
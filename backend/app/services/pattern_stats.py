@@ -0,0 +1,177 @@
+"""
+Empirical success rates of chart patterns.
+
+For every historical occurrence (see patterns.pattern_occurrence_indices) the return from
+the confirmation bar's close to the close N trading days later is taken straight from the
+close array at the occurrence indices. An occurrence is a hit when that return goes the
+pattern's way. Sums per (symbol, pattern, horizon) live in PatternStat and grow
+incrementally: occurrences are stable once confirmed, so each refresh only adds those
+confirmed after `last_end_date` (the last end date whose forward window had completed)
+and reads only the bars from TAIL_BARS before it. A sync that rewrites bars up to
+`last_end_date` rebuilds the symbol instead. Market-wide rows (symbol "*") are
+re-aggregated from the per-symbol rows.
+"""
+
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlmodel import select
+from app.core.config import settings
+from app.models import DailyPrice, PatternStat, Stock
+from app.services.patterns import PATTERN_NAMES, pattern_occurrence_indices
+from app.services.price_panel import load_price_frame
+from app.services.http_cache import bump_data_version
+
+MARKET = "*"
+STATS_WINDOW = 5
+# Bars read before `last_end_date` on an incremental refresh: covers the longest forward
+# horizon plus the span of the patterns, so occurrences ending later are seen whole
+TAIL_BARS = 250
+# Expected direction after the pattern; 0 means continuation of the move into it
+PATTERN_DIRECTIONS = {
+    "头肩顶": -1,
+    "头肩底": 1,
+    "双重顶": -1,
+    "双重底": 1,
+    "三角形整理": 1,
+    "旗形整理": 0,
+    "楔形整理": 1,
+    "杯柄形态": 1,
+}
+
+def occurrence_outcomes(close: np.ndarray, dates: np.ndarray, horizons: List[int], since: Optional[Dict[Any, Optional[date]]] = None) -> Dict[Any, Dict[str, Any]]:
+    """Newly countable outcomes keyed by (pattern, horizon).
+
+    `since[(pattern, horizon)]` is the last end date already counted.
+    """
+    since = since or {}
+    close = np.asarray(close, dtype=float)
+    n = len(close)
+    found = pattern_occurrence_indices(close, PATTERN_NAMES, STATS_WINDOW)
+    out = {}
+    for name, (start, end) in found.items():
+        direction = np.full(len(end), PATTERN_DIRECTIONS[name], dtype=float)
+        if PATTERN_DIRECTIONS[name] == 0:
+            direction = np.sign(close[end] - close[start])
+        for horizon in horizons:
+            last = since.get((name, horizon))
+            mask = end + horizon <= n - 1
+            if last is not None:
+                mask &= dates[end] > np.datetime64(last)
+            ends = end[mask]
+            returns = close[ends + horizon] / close[ends] - 1
+            # Everything ending up to the last bar with a complete forward window is counted
+            counted = pd.Timestamp(dates[n - 1 - horizon]).date() if n > horizon else None
+            if counted is None or (last is not None and counted < last):
+                counted = last
+            out[(name, horizon)] = {
+                "occurrences": int(len(ends)),
+                "hits": int((returns * direction[mask] > 0).sum()),
+                "return_sum": float(returns.sum()),
+                "return_sq_sum": float((returns ** 2).sum()),
+                "last_end_date": counted,
+            }
+    return out
+
+def _apply(session, symbol: str, close: np.ndarray, dates: np.ndarray, horizons: List[int]) -> None:
+    rows = {(r.pattern_name, r.horizon): r for r in session.exec(select(PatternStat).where(PatternStat.symbol == symbol)).all()}
+    outcomes = occurrence_outcomes(close, dates, horizons, {key: row.last_end_date for key, row in rows.items()})
+    for (name, horizon), outcome in outcomes.items():
+        row = rows.get((name, horizon)) or PatternStat(symbol=symbol, pattern_name=name, horizon=horizon)
+        row.occurrences += outcome["occurrences"]
+        row.hits += outcome["hits"]
+        row.return_sum += outcome["return_sum"]
+        row.return_sq_sum += outcome["return_sq_sum"]
+        row.last_end_date = outcome["last_end_date"]
+        row.updated_at = datetime.utcnow()
+        session.add(row)
+
+def _closes(df: pd.DataFrame):
+    df = df.sort_values("trade_date")
+    return df["close"].to_numpy(dtype=float), pd.to_datetime(df["trade_date"]).to_numpy()
+
+def _tail_start(session, symbol: str, last_end: date) -> Optional[date]:
+    """Date TAIL_BARS bars before `last_end`; None when the history is shorter."""
+    return session.exec(
+        select(DailyPrice.trade_date).join(Stock, Stock.id == DailyPrice.stock_id)
+        .where(Stock.symbol == symbol, DailyPrice.trade_date <= last_end)
+        .order_by(DailyPrice.trade_date.desc()).offset(TAIL_BARS).limit(1)
+    ).first()
+
+def update_symbol_pattern_stats(session, symbol: str, since: Optional[date] = None) -> None:
+    """Add the outcomes that became known for `symbol` since its last refresh.
+
+    Called after a sync with `since`, the first date it rewrote; when that is not after
+    what the stats already counted, the symbol is rebuilt so revised bars are not kept.
+    """
+    rows = session.exec(select(PatternStat).where(PatternStat.symbol == symbol)).all()
+    counted = [r.last_end_date for r in rows if r.last_end_date is not None]
+    if since is not None and counted and since <= max(counted):
+        rebuild_pattern_stats(session, [symbol], refresh_market=False)
+        return
+    start = None
+    if rows and len(counted) == len(rows):
+        start = _tail_start(session, symbol, min(counted))
+    prices = load_price_frame(session, start, symbols=[symbol], fields=("close",))
+    if prices.empty:
+        return
+    _apply(session, symbol, *_closes(prices), settings.PATTERN_STAT_HORIZONS)
+    session.commit()
+
+def refresh_market_pattern_stats(session) -> None:
+    totals = session.exec(
+        select(PatternStat.pattern_name, PatternStat.horizon, func.sum(PatternStat.occurrences), func.sum(PatternStat.hits), func.sum(PatternStat.return_sum), func.sum(PatternStat.return_sq_sum), func.max(PatternStat.last_end_date))
+        .where(PatternStat.symbol != MARKET)
+        .group_by(PatternStat.pattern_name, PatternStat.horizon)
+    ).all()
+    rows = {(r.pattern_name, r.horizon): r for r in session.exec(select(PatternStat).where(PatternStat.symbol == MARKET)).all()}
+    for name, horizon, occurrences, hits, return_sum, return_sq_sum, last_end in totals:
+        row = rows.get((name, horizon)) or PatternStat(symbol=MARKET, pattern_name=name, horizon=horizon)
+        row.occurrences, row.hits = int(occurrences or 0), int(hits or 0)
+        row.return_sum, row.return_sq_sum = float(return_sum or 0), float(return_sq_sum or 0)
+        row.last_end_date = last_end
+        row.updated_at = datetime.utcnow()
+        session.add(row)
+    session.commit()
+    bump_data_version("patterns")
+
+def rebuild_pattern_stats(session, symbols: Optional[List[str]] = None, refresh_market: bool = True) -> None:
+    """Recompute from scratch, e.g. after historical prices were revised."""
+    query = select(PatternStat)
+    if symbols:
+        query = query.where(PatternStat.symbol.in_(symbols))
+    for row in session.exec(query).all():
+        session.delete(row)
+    session.commit()
+    prices = load_price_frame(session, symbols=symbols, fields=("close",))
+    for symbol, df in prices.groupby("symbol", sort=False):
+        _apply(session, symbol, *_closes(df), settings.PATTERN_STAT_HORIZONS)
+    session.commit()
+    if refresh_market:
+        refresh_market_pattern_stats(session)
+
+def summarize(row: PatternStat) -> Dict[str, Any]:
+    n = row.occurrences
+    mean = row.return_sum / n if n else None
+    std = float(np.sqrt(max(row.return_sq_sum / n - mean ** 2, 0.0))) if n else None
+    return {"occurrences": n, "success_rate": row.hits / n if n else None, "avg_return": mean, "return_std": std, "last_end_date": row.last_end_date}
+
+def pattern_library(session) -> List[Dict[str, Any]]:
+    rows = session.exec(select(PatternStat).where(PatternStat.symbol == MARKET)).all()
+    stats: Dict[str, Dict[int, Any]] = {name: {} for name in PATTERN_NAMES}
+    for row in rows:
+        if row.pattern_name in stats:
+            stats[row.pattern_name][row.horizon] = summarize(row)
+    return [{"name": name, "horizons": stats[name]} for name in PATTERN_NAMES]
+
+def success_rate_table(session, horizon: Optional[int] = None) -> Dict[str, Dict[str, float]]:
+    """{symbol: {pattern: hit rate}} for every symbol with enough occurrences, plus MARKET
+    for the thin histories."""
+    horizon = horizon or settings.PATTERN_SUCCESS_HORIZON
+    table: Dict[str, Dict[str, float]] = {MARKET: {}}
+    for row in session.exec(select(PatternStat).where(PatternStat.horizon == horizon)).all():
+        if row.occurrences and (row.symbol == MARKET or row.occurrences >= settings.PATTERN_STAT_MIN_OCCURRENCES):
+            table.setdefault(row.symbol, {})[row.pattern_name] = row.hits / row.occurrences
+    return table
@@ -1,6 +1,7 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 import numpy as np
 import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
 
 PATTERN_NAMES = [
     "头肩顶",
@@ -13,25 +14,69 @@ PATTERN_NAMES = [
     "杯柄形态",
 ]
 
-def _local_extrema(series: pd.Series, window: int = 5):
-    rolling_max = series.rolling(window).max()
-    rolling_min = series.rolling(window).min()
-    peaks = series[(series == rolling_max)]
-    troughs = series[(series == rolling_min)]
+PATTERN_SCORES = {
+    "头肩顶": 0.8,
+    "头肩底": 0.8,
+    "双重顶": 0.7,
+    "双重底": 0.7,
+    "三角形整理": 0.6,
+    "旗形整理": 0.65,
+    "楔形整理": 0.6,
+    "杯柄形态": 0.5,
+}
+
+def _extrema_indices(values: np.ndarray, window: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+    """Positions of centered local maxima and minima.
+
+    A bar is a peak when it is the (first) highest of the `window // 2` bars on each side,
+    so it is only confirmed `window // 2` bars later; the last bars are never extrema.
+    """
+    half = max(1, int(window) // 2)
+    n = len(values)
+    if n < 2 * half + 1:
+        empty = np.array([], dtype=int)
+        return empty, empty
+    windows = sliding_window_view(values, 2 * half + 1)
+    centers = np.arange(half, n - half)
+    valid = ~np.isnan(values[centers])
+    peaks = centers[(np.where(np.isnan(windows), -np.inf, windows).argmax(axis=1) == half) & valid]
+    troughs = centers[(np.where(np.isnan(windows), np.inf, windows).argmin(axis=1) == half) & valid]
     return peaks, troughs
 
-def detect_patterns(df: pd.DataFrame, patterns: List[str], params: Dict[str, Any]) -> List[Dict[str, Any]]:
+# detect_patterns reads at most the last 40 bars directly and the last 5 peaks/troughs
+MIN_PATTERN_BARS = 40
+RECENT_EXTREMA = 5
+
+def tail_is_sufficient(close: np.ndarray, params: Dict[str, Any]) -> bool:
+    """Whether detect_patterns on these trailing bars matches running it on the full history.
+
+    Centered extrema only need window // 2 neighbours, so extrema found in a tail are
+    exactly those of the full series.
+    """
+    if len(close) < MIN_PATTERN_BARS:
+        return False
+    peaks, troughs = _extrema_indices(np.asarray(close, dtype=float), int(params.get("window", 5)))
+    return len(peaks) >= RECENT_EXTREMA and len(troughs) >= RECENT_EXTREMA
+
+def _local_extrema(series: pd.Series, window: int = 5):
+    peaks, troughs = _extrema_indices(series.to_numpy(dtype=float), window)
+    return series.iloc[peaks], series.iloc[troughs]
+
+def detect_patterns(df: pd.DataFrame, patterns: List[str], params: Dict[str, Any], rates: Optional[Dict[str, float]] = None) -> List[Dict[str, Any]]:
+    """Patterns completed by the latest bars. `success_rate` comes from `rates`, the
+    historical hit rate per pattern (see pattern_stats.success_rate_table), or is None."""
     results = []
     if df.empty:
         return results
     
     close = df["close"]
     window = int(params.get("window", 5))
-    peaks, troughs = _local_extrema(close, window)
+    peak_pos, trough_pos = _extrema_indices(close.to_numpy(dtype=float), window)
+    peaks, troughs = close.iloc[peak_pos], close.iloc[trough_pos]
     
     # We only check the most recent window for pattern formation
-    recent_peaks = peaks.tail(5)
-    recent_troughs = troughs.tail(5)
+    recent_peaks = peaks.tail(RECENT_EXTREMA)
+    recent_troughs = troughs.tail(RECENT_EXTREMA)
     last_date = df["trade_date"].iloc[-1]
     
     for name in patterns:
@@ -83,17 +128,124 @@ def detect_patterns(df: pd.DataFrame, patterns: List[str], params: Dict[str, Any
                      score = 0.6
 
         # 8. Cup and Handle (U-shape then small drop)
-        elif name == "杯柄形态":
-            # Simplified: check for U shape context
-            if len(recent_peaks) >= 2:
-                # Very rough heuristic
+        elif name == "杯柄形态" and len(recent_peaks) >= 2:
+            # Two rims within 5%, a cup at least 10% deep between them, then a handle
+            # trough that retraces less than half of the cup
+            values = close.to_numpy(dtype=float)
+            left, right = peak_pos[-2], peak_pos[-1]
+            handles = trough_pos[trough_pos > right]
+            cup_low = values[left:right].min()
+            rim = min(values[left], values[right])
+            if (
+                len(handles)
+                and abs(values[left] - values[right]) / values[left] < 0.05
+                and cup_low <= rim * 0.9
+                and values[handles[0]] > cup_low + (values[right] - cup_low) / 2
+            ):
                 score = 0.5
 
         if score > 0:
             results.append({
                 "pattern_name": name,
                 "detected_date": last_date.strftime("%Y-%m-%d") if hasattr(last_date, 'strftime') else str(last_date),
-                "success_rate": 0.5 + score * 0.4, # Mock success rate based on score
+                "success_rate": (rates or {}).get(name),
                 "score": score,
             })
     return results
+
+def _runs(mask: np.ndarray) -> np.ndarray:
+    """First bar of each run of True."""
+    return np.flatnonzero(mask & ~np.concatenate([[False], mask[:-1]]))
+
+def pattern_occurrence_indices(close: np.ndarray, patterns: List[str], window: int = 5) -> Dict[str, Tuple[np.ndarray, np.ndarray]]:
+    """(start, end) bar positions of every occurrence of each pattern in one close series.
+
+    `end` is the bar on which the pattern is first knowable (extrema need `window // 2`
+    later bars to confirm), so trading from `end` onwards has no look-ahead. The geometric
+    rules match detect_patterns, applied to every extrema pair/triplet at once.
+    """
+    values = np.asarray(close, dtype=float)
+    n = len(values)
+    half = max(1, int(window) // 2)
+    peaks, troughs = _extrema_indices(values, window)
+    confirm = lambda idx: np.minimum(idx + half, n - 1)
+    empty = np.array([], dtype=int)
+    out = {}
+    for name in patterns:
+        start, end = empty, empty
+        if name in ("头肩顶", "头肩底"):
+            idx = peaks if name == "头肩顶" else troughs
+            if len(idx) >= 3:
+                a, b, c = values[idx[:-2]], values[idx[1:-1]], values[idx[2:]]
+                mask = (b > a) & (b > c) if name == "头肩顶" else (b < a) & (b < c)
+                start, end = idx[:-2][mask], confirm(idx[2:][mask])
+        elif name in ("双重顶", "双重底"):
+            idx = peaks if name == "双重顶" else troughs
+            if len(idx) >= 2:
+                a, b = values[idx[:-1]], values[idx[1:]]
+                mask = np.abs(a - b) / a < 0.03
+                start, end = idx[:-1][mask], confirm(idx[1:][mask])
+        elif name == "三角形整理":
+            series = pd.Series(values)
+            with np.errstate(invalid="ignore"):
+                mask = (series.rolling(20).std() < series.rolling(40).std() * 0.5).to_numpy()
+            end = _runs(mask)
+            start = end - 39
+        elif name == "旗形整理":
+            series = pd.Series(values)
+            move = (series - series.shift(9)).abs() / series.shift(9)
+            consolidation = series.rolling(5).std() / series.rolling(5).mean()
+            end = _runs(((move > 0.05) & (consolidation < 0.02)).to_numpy())
+            start = end - 9
+        elif name == "楔形整理":
+            if len(peaks) >= 2 and len(troughs) >= 2:
+                # Re-evaluate the last two peaks and troughs whenever a new extremum confirms
+                events = np.union1d(confirm(peaks), confirm(troughs))
+                kp = np.searchsorted(confirm(peaks), events, side="right")
+                kt = np.searchsorted(confirm(troughs), events, side="right")
+                ok = (kp >= 2) & (kt >= 2)
+                events, kp, kt = events[ok], kp[ok], kt[ok]
+                p_slope = values[peaks[kp - 1]] - values[peaks[kp - 2]]
+                t_slope = values[troughs[kt - 1]] - values[troughs[kt - 2]]
+                mask = (p_slope * t_slope > 0) & (np.abs(p_slope) < np.abs(t_slope))
+                start, end = np.minimum(peaks[kp - 2], troughs[kt - 2])[mask], events[mask]
+        elif name == "杯柄形态":
+            if len(peaks) >= 2 and len(troughs):
+                # Two rims within 5%, a cup at least 10% deep between them, then a handle
+                # trough that retraces less than half of the cup
+                left, right = peaks[:-1], peaks[1:]
+                cup_low = np.minimum.reduceat(values, peaks)[:-1]
+                rim = np.minimum(values[left], values[right])
+                handle_pos = np.searchsorted(troughs, right, side="right")
+                has_handle = handle_pos < len(troughs)
+                handle = troughs[np.minimum(handle_pos, len(troughs) - 1)]
+                mask = (
+                    (np.abs(values[left] - values[right]) / values[left] < 0.05)
+                    & (cup_low <= rim * 0.9)
+                    & has_handle
+                    & (values[handle] > cup_low + (values[right] - cup_low) / 2)
+                )
+                start, end = left[mask], confirm(handle[mask])
+        out[name] = (np.maximum(start, 0).astype(int), np.asarray(end, dtype=int))
+    return out
+
+def find_pattern_occurrences(df: pd.DataFrame, patterns: Optional[List[str]] = None, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """Every occurrence of each pattern over the whole history of one symbol, oldest first."""
+    if df.empty:
+        return []
+    params = params or {}
+    dates = pd.to_datetime(df["trade_date"]).dt.strftime("%Y-%m-%d").to_numpy()
+    found = pattern_occurrence_indices(df["close"].to_numpy(dtype=float), patterns or PATTERN_NAMES, int(params.get("window", 5)))
+    results = []
+    for name, (start, end) in found.items():
+        for s, e in zip(start.tolist(), end.tolist()):
+            results.append({
+                "pattern_name": name,
+                "start_date": dates[s],
+                "end_date": dates[e],
+                "start_index": s,
+                "end_index": e,
+                "score": PATTERN_SCORES[name],
+            })
+    results.sort(key=lambda r: (r["end_index"], r["start_index"]))
+    return results
@@ -0,0 +1,40 @@
+from datetime import date
+from typing import Dict, Any, List, Optional, Sequence
+import numpy as np
+import pandas as pd
+from sqlmodel import select
+from app.models import Stock, DailyPrice
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+
+def frame_to_panel(df: pd.DataFrame, fields: Sequence[str] = PRICE_FIELDS) -> Dict[str, Any]:
+    """Pivot long (symbol, trade_date, ...) rows into dates x symbols arrays on a shared calendar.
+
+    Days a symbol did not trade (suspensions, before listing) are NaN.
+    """
+    if df.empty:
+        return {"dates": [], "symbols": [], **{f: np.empty((0, 0)) for f in fields}}
+    date_codes, dates = pd.factorize(df["trade_date"], sort=True)
+    symbol_codes, symbols = pd.factorize(df["symbol"], sort=True)
+    panel = {"dates": list(dates), "symbols": list(symbols)}
+    for field in fields:
+        values = np.full((len(dates), len(symbols)), np.nan)
+        values[date_codes, symbol_codes] = df[field].to_numpy(dtype=float)
+        panel[field] = values
+    return panel
+
+def load_price_frame(session, start: Optional[date] = None, end: Optional[date] = None, symbols: Optional[List[str]] = None, fields: Sequence[str] = PRICE_FIELDS) -> pd.DataFrame:
+    """Bulk-load daily bars for many symbols in a single query."""
+    columns = [getattr(DailyPrice, f) for f in fields]
+    query = select(Stock.symbol, DailyPrice.trade_date, *columns).join(Stock, Stock.id == DailyPrice.stock_id)
+    if symbols:
+        query = query.where(Stock.symbol.in_(symbols))
+    if start:
+        query = query.where(DailyPrice.trade_date >= start)
+    if end:
+        query = query.where(DailyPrice.trade_date <= end)
+    rows = session.exec(query).all()
+    return pd.DataFrame(rows, columns=["symbol", "trade_date", *fields])
+
+def load_price_panel(session, start: Optional[date] = None, end: Optional[date] = None, symbols: Optional[List[str]] = None, fields: Sequence[str] = PRICE_FIELDS) -> Dict[str, Any]:
+    return frame_to_panel(load_price_frame(session, start, end, symbols, fields), fields)
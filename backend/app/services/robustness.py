@@ -0,0 +1,73 @@
+"""
+Monte Carlo robustness analysis for backtest returns.
+
+Daily strategy returns are resampled many times, either with a circular block bootstrap
+(keeps short-range autocorrelation such as holding periods) or day by day with
+replacement ("shuffle", an i.i.d. bootstrap: same return distribution, random path).
+Both vary the set of days drawn, so every metric gets a real spread; a plain permutation
+would leave all but the path-dependent ones constant. Each batch of simulations is a
+(days x simulations) matrix scored with compute_metrics_matrix; batches are sized to a
+memory budget so thousands of long simulations never materialise at once.
+"""
+
+from typing import Any, Dict, Optional, Sequence
+import numpy as np
+import pandas as pd
+from app.services.backtest import compute_metrics, compute_metrics_matrix
+from app.services.curves import load_curve
+
+METHODS = ("block", "shuffle")
+CHUNK_BYTES = 64 * 1024 * 1024
+# compute_metrics_matrix holds about this many days x chunk float arrays at once
+_WORK_ARRAYS = 6
+
+def _sample_indices(rng: np.random.Generator, n: int, sims: int, method: str, block_size: int) -> np.ndarray:
+    if method == "shuffle":
+        return rng.integers(0, n, (n, sims))
+    n_blocks = -(-n // block_size)
+    starts = rng.integers(0, n, (n_blocks, sims))
+    offsets = np.arange(block_size)[None, :, None]
+    return ((starts[:, None, :] + offsets) % n).reshape(n_blocks * block_size, sims)[:n]
+
+def simulate_metrics(returns: Sequence[float], simulations: int = 2000, method: str = "block", block_size: int = 20, seed: Optional[int] = None, chunk_bytes: int = CHUNK_BYTES) -> Dict[str, np.ndarray]:
+    """Metric values for each simulated path, keyed like compute_metrics."""
+    if method not in METHODS:
+        raise ValueError(f"Unknown resampling method: {method}")
+    returns = np.nan_to_num(np.asarray(returns, dtype=float))
+    n = len(returns)
+    block_size = max(1, min(int(block_size), n))
+    rng = np.random.default_rng(seed)
+    chunk = max(1, min(simulations, chunk_bytes // max(1, n * 8 * _WORK_ARRAYS)))
+    parts = []
+    for done in range(0, simulations, chunk):
+        sims = min(chunk, simulations - done)
+        parts.append(compute_metrics_matrix(returns[_sample_indices(rng, n, sims, method, block_size)]))
+    return {key: np.concatenate([p[key] for p in parts]) for key in parts[0]}
+
+def _summarize(values: np.ndarray, confidence: float) -> Dict[str, float]:
+    tail = (1 - confidence) / 2 * 100
+    lo, p50, hi = np.nanpercentile(values, [tail, 50, 100 - tail])
+    return {"mean": float(np.nanmean(values)), "std": float(np.nanstd(values)), "median": float(p50), "ci_low": float(lo), "ci_high": float(hi)}
+
+def robustness_report(returns: Sequence[float], simulations: int = 2000, method: str = "block", block_size: int = 20, confidence: float = 0.95, seed: Optional[int] = None) -> Dict[str, Any]:
+    """Observed metrics plus their simulated distribution and confidence intervals."""
+    returns = np.asarray(returns, dtype=float)
+    if len(returns) < 2:
+        raise ValueError("At least two returns are required")
+    simulated = simulate_metrics(returns, simulations, method, block_size, seed)
+    return {
+        "method": method,
+        "simulations": simulations,
+        "block_size": block_size if method == "block" else None,
+        "confidence": confidence,
+        "observed": compute_metrics(pd.Series(returns)),
+        "metrics": {key: _summarize(values, confidence) for key, values in simulated.items()},
+        "prob_loss": float((simulated["annual_return"] < 0).mean()),
+    }
+
+def result_robustness(session, result_id: int, simulations: int = 2000, method: str = "block", block_size: int = 20, confidence: float = 0.95, seed: Optional[int] = None) -> Optional[Dict[str, Any]]:
+    """robustness_report on a stored backtest's daily returns; None when it has no curve."""
+    curve = load_curve(session, result_id)
+    if not curve:
+        return None
+    return {"result_id": result_id, **robustness_report(curve["returns"], simulations, method, block_size, confidence, seed)}
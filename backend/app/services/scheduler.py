@@ -1,38 +1,174 @@
-from apscheduler.schedulers.asyncio import AsyncIOScheduler
+"""
+Scheduled jobs (the post-close daily sync).
+
+Every API worker starts a scheduler, but each firing runs once: the workers race to insert
+the JobRun row for (job, scheduled time), which is unique, and only the winner runs the
+job. A firing is also skipped while an earlier run of the same job is still alive, i.e.
+its heartbeat is newer than three SCHEDULER_HEARTBEAT intervals. The job itself runs in a
+child process that the scheduler's thread waits on, so neither the event loop nor the
+API process's GIL is held for the length of a sync.
+"""
+
+import logging
+import os
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+from apscheduler.executors.pool import ThreadPoolExecutor
+from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.cron import CronTrigger
-from app.db import get_session
-from app.services.data_sync import sync_daily, sync_stock_list
-from app.models import Stock
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlmodel import select
-from datetime import date, timedelta
-import logging
+from app.core.config import settings
+from app.db import engine, get_session
+from app.models import JobRun, Stock
+from app.services.data_sync import sync_daily, sync_stock_list
+from app.services.metrics import JOB_DURATION, REGISTRY
 
 logger = logging.getLogger(__name__)
 
-scheduler = AsyncIOScheduler()
+# Seconds a worker may fire late; also how far back a firing is matched to its schedule
+MISFIRE_GRACE = 300
 
-def daily_sync_job():
+scheduler = BackgroundScheduler(
+    executors={"default": ThreadPoolExecutor(2)},
+    job_defaults={"coalesce": True, "max_instances": 1, "misfire_grace_time": MISFIRE_GRACE},
+)
+
+def daily_sync_job() -> str:
     logger.info("Starting scheduled daily sync...")
     with get_session() as session:
         # 1. Sync stock list first
         sync_stock_list(session)
-        
+
         # 2. Sync daily data for all stocks
         stocks = session.exec(select(Stock)).all()
         symbols = [s.symbol for s in stocks]
-        
+
         today = date.today()
         # If today is weekend, maybe skip? But akshare handles it.
         # Sync last 3 days to be safe
         start_date = today - timedelta(days=3)
-        
+
         logger.info(f"Syncing {len(symbols)} stocks from {start_date} to {today}")
         sync_daily(session, symbols, start_date, today, sync_type="scheduled")
     logger.info("Scheduled daily sync completed.")
+    return f"{len(symbols)} symbols from {start_date} to {today}"
+
+# Job name -> top-level function run in the child process; its return value is the run message
+JOBS: Dict[str, Callable[[], Optional[str]]] = {
+    "daily_sync": daily_sync_job,
+}
+
+def _init_worker():
+    # Never reuse connections inherited from the parent process
+    engine.dispose(close=False)
+
+def _run_job(func: Callable[[], Optional[str]]) -> Tuple[Optional[str], Optional[str], Dict[str, Any]]:
+    """Child-side wrapper: (message, error, metric increments), so the parent can export
+    what the job recorded (sync rows, data source latency) even when it fails."""
+    before = REGISTRY.snapshot()
+    message, error = None, None
+    try:
+        message = func()
+    except Exception as exc:
+        logger.exception("Scheduled job %s raised", getattr(func, "__name__", func))
+        error = str(exc) or repr(exc)
+    return message, error, REGISTRY.delta(before)
+
+def _finish(session, run: JobRun, status: str, message: Optional[str] = None) -> JobRun:
+    run.status = status
+    run.message = message
+    run.finished_at = datetime.utcnow()
+    run.duration_s = (run.finished_at - run.started_at).total_seconds()
+    session.add(run)
+    session.commit()
+    JOB_DURATION.observe(run.duration_s, job=run.job_name, status=status)
+    return run
+
+def claim_run(session, name: str, scheduled_for: datetime) -> Optional[JobRun]:
+    """Record a running JobRun for this firing, or return None if another worker has it."""
+    now = datetime.utcnow()
+    run = JobRun(job_name=name, scheduled_for=scheduled_for, host=socket.gethostname(), pid=os.getpid(), started_at=now, heartbeat_at=now)
+    session.add(run)
+    try:
+        session.commit()
+    except IntegrityError:
+        session.rollback()
+        return None
+    session.refresh(run)
+
+    # Runs whose process died without finishing stop blocking after their heartbeat lapses
+    alive_since = now - timedelta(seconds=3 * settings.SCHEDULER_HEARTBEAT)
+    session.execute(
+        update(JobRun)
+        .where(JobRun.job_name == name, JobRun.status == "running", JobRun.heartbeat_at < alive_since)
+        .values(status="failed", message="heartbeat lost", finished_at=now)
+    )
+    session.commit()
+    busy = session.exec(
+        select(JobRun.id).where(JobRun.job_name == name, JobRun.status == "running", JobRun.id < run.id)
+    ).first()
+    if busy is not None:
+        logger.warning("Skipping %s: run %s is still in progress", name, busy)
+        _finish(session, run, "skipped", f"run {busy} still in progress")
+        return None
+    return run
+
+def execute_run(session, run: JobRun, func: Callable[[], Optional[str]]) -> JobRun:
+    """Run the job in a child process, renewing the heartbeat while waiting on it."""
+    try:
+        with ProcessPoolExecutor(max_workers=1, initializer=_init_worker) as pool:
+            future = pool.submit(_run_job, func)
+            while True:
+                try:
+                    message, error, delta = future.result(timeout=settings.SCHEDULER_HEARTBEAT)
+                    break
+                except TimeoutError:
+                    run.heartbeat_at = datetime.utcnow()
+                    session.add(run)
+                    session.commit()
+    except Exception as exc:
+        logger.exception("Scheduled job %s failed", run.job_name)
+        session.rollback()
+        return _finish(session, run, "failed", str(exc))
+    REGISTRY.merge(delta)
+    if error is not None:
+        return _finish(session, run, "failed", error)
+    return _finish(session, run, "finished", message)
+
+def run_scheduled_job(name: str, scheduled_for: Optional[datetime] = None) -> Optional[JobRun]:
+    scheduled_for = scheduled_for or datetime.utcnow().replace(second=0, microsecond=0)
+    with get_session() as session:
+        run = claim_run(session, name, scheduled_for)
+        if run is None:
+            return None
+        started = time.perf_counter()
+        logger.info("Running scheduled job %s (run %s)", name, run.id)
+        execute_run(session, run, JOBS[name])
+        logger.info("Scheduled job %s %s in %.1fs", name, run.status, time.perf_counter() - started)
+        return run
+
+def _fire(name: str) -> None:
+    # Key the run by the schedule, not the clock, so workers firing a little apart agree
+    trigger = scheduler.get_job(name).trigger
+    now = datetime.now(trigger.timezone)
+    scheduled = trigger.get_next_fire_time(None, now - timedelta(seconds=MISFIRE_GRACE)) or now
+    run_scheduled_job(name, scheduled.astimezone(timezone.utc).replace(tzinfo=None, second=0, microsecond=0))
 
 def init_scheduler():
+    if not settings.SCHEDULER_ENABLED:
+        logger.info("Scheduler disabled.")
+        return
     # Run at 15:35 every weekday
     trigger = CronTrigger(day_of_week='mon-fri', hour=15, minute=35)
-    scheduler.add_job(daily_sync_job, trigger, id='daily_sync', replace_existing=True)
+    scheduler.add_job(_fire, trigger, args=["daily_sync"], id='daily_sync', replace_existing=True)
     scheduler.start()
     logger.info("APScheduler started. Daily sync scheduled for 15:35 Mon-Fri.")
+
+def shutdown_scheduler():
+    if scheduler.running:
+        scheduler.shutdown(wait=False)
@@ -1,9 +1,19 @@
-from datetime import date
+import json
+from datetime import date, timedelta
 from typing import Dict, Any, List
+import numpy as np
 import pandas as pd
 from sqlmodel import select
-from app.models import Stock, DailyPrice, FactorValue
-from app.services.indicators import rsi, macd, kdj
+from app.core.config import settings
+from app.models import Stock, DailyPrice, FactorValue, FinancialMetric, IndicatorSnapshot
+from app.services.panel_indicators import compute_market_indicators
+from app.services.price_panel import frame_to_panel
+from app.services.indicator_cache import indicator_cache, indicator_key, data_version
+
+# Prices/factors older than this are considered stale, same as the live screen
+STALE_DAYS = 30
+# Extra calendar days loaded before the range so indicators are warmed up
+INDICATOR_LOOKBACK_DAYS = 120
 
 def _latest_factor_map(factors: pd.DataFrame) -> pd.DataFrame:
     if factors.empty:
@@ -22,11 +32,38 @@ def _apply_range(df: pd.DataFrame, column: str, min_val, max_val):
         df = df[df[column] <= max_val]
     return df
 
-def screen_stocks(session, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+def _apply_basic_filters(df: pd.DataFrame, criteria: Dict[str, Any]) -> pd.DataFrame:
+    basic = criteria.get("basic_filters", {})
+    df = _apply_range(df, "market_cap", basic.get("market_cap_min"), basic.get("market_cap_max"))
+    df = _apply_range(df, "pe_ratio", basic.get("pe_min"), basic.get("pe_max"))
+    df = _apply_range(df, "pb_ratio", basic.get("pb_min"), basic.get("pb_max"))
+    return df
+
+def _apply_factor_filters(df: pd.DataFrame, criteria: Dict[str, Any]) -> pd.DataFrame:
+    factor = criteria.get("factor_filters", {})
+    df = _apply_range(df, "momentum", factor.get("momentum_min"), factor.get("momentum_max"))
+    df = _apply_range(df, "volatility", factor.get("volatility_min"), factor.get("volatility_max"))
+    df = _apply_range(df, "liquidity", factor.get("liquidity_min"), factor.get("liquidity_max"))
+    for custom in criteria.get("custom_filters", []):
+        field = custom.get("field")
+        if field in df.columns:
+            df = _apply_range(df, field, custom.get("min"), custom.get("max"))
+    return df
+
+def _needs_technical(tech: Dict[str, Any]) -> bool:
+    return "rsi_min" in tech or "rsi_max" in tech or bool(tech.get("macd_positive")) or bool(tech.get("kdj_positive"))
+
+def _apply_technical_filters(df: pd.DataFrame, tech: Dict[str, Any]) -> pd.DataFrame:
+    if "rsi_min" in tech or "rsi_max" in tech:
+        df = _apply_range(df, "rsi", tech.get("rsi_min"), tech.get("rsi_max"))
+    if tech.get("macd_positive"):
+        df = df[df["macd"] > df["macd_signal"]]
+    if tech.get("kdj_positive"):
+        df = df[df["kdj_k"] > df["kdj_d"]]
+    return df
+
+def _stock_frame(session) -> pd.DataFrame:
     stocks = session.exec(select(Stock)).all()
-    if not stocks:
-        return []
-    
     # Explicitly build dict to ensure 'id' is present and not relying on model_dump defaults
     stock_data = []
     for s in stocks:
@@ -40,14 +77,25 @@ def screen_stocks(session, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
             "pe_ratio": s.pe_ratio,
             "pb_ratio": s.pb_ratio
         })
-    stock_df = pd.DataFrame(stock_data)
+    return pd.DataFrame(stock_data)
 
-    # Optimization: Fetch only necessary price/factor columns to reduce memory
-    # Only fetch last 30 days of data to find the latest
-    from datetime import timedelta
-    cutoff_date = date.today() - timedelta(days=30)
+def _as_of_date(criteria: Dict[str, Any]) -> date:
+    as_of = criteria.get("as_of")
+    if isinstance(as_of, str):
+        as_of = date.fromisoformat(as_of)
+    return as_of or date.today()
 
-    prices = session.exec(select(DailyPrice).where(DailyPrice.trade_date >= cutoff_date)).all()
+def screen_stocks(session, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
+    stock_df = _stock_frame(session)
+    if stock_df.empty:
+        return []
+
+    # Only look at data known on the as-of date (defaults to today),
+    # and only the last 30 days of it to find the latest
+    as_of = _as_of_date(criteria)
+    cutoff_date = as_of - timedelta(days=STALE_DAYS)
+
+    prices = session.exec(select(DailyPrice).where(DailyPrice.trade_date >= cutoff_date, DailyPrice.trade_date <= as_of)).all()
     if prices:
         price_df = pd.DataFrame([p.dict() for p in prices])
         if "id" in price_df.columns:
@@ -57,7 +105,7 @@ def screen_stocks(session, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
         # Create empty DF with expected columns to avoid merge error
         price_latest = pd.DataFrame(columns=["stock_id", "close", "trade_date"])
 
-    factors = session.exec(select(FactorValue).where(FactorValue.factor_date >= cutoff_date)).all()
+    factors = session.exec(select(FactorValue).where(FactorValue.factor_date >= cutoff_date, FactorValue.factor_date <= as_of)).all()
     if factors:
         factor_df = pd.DataFrame([f.dict() for f in factors])
         if "id" in factor_df.columns:
@@ -79,29 +127,139 @@ def screen_stocks(session, criteria: Dict[str, Any]) -> List[Dict[str, Any]]:
 
     merged = stock_df.merge(price_latest, left_on="id", right_on="stock_id", how="left") \
                      .merge(factor_latest, left_on="id", right_on="stock_id", how="left", suffixes=("", "_factor"))
-    basic = criteria.get("basic_filters", {})
-    merged = _apply_range(merged, "market_cap", basic.get("market_cap_min"), basic.get("market_cap_max"))
-    merged = _apply_range(merged, "pe_ratio", basic.get("pe_min"), basic.get("pe_max"))
-    merged = _apply_range(merged, "pb_ratio", basic.get("pb_min"), basic.get("pb_max"))
+    merged = _apply_basic_filters(merged, criteria)
     tech = criteria.get("technical_filters", {})
-    if "rsi_min" in tech or "rsi_max" in tech:
-        merged["rsi"] = rsi(merged["close"].fillna(0))
-        merged = _apply_range(merged, "rsi", tech.get("rsi_min"), tech.get("rsi_max"))
-    if tech.get("macd_positive"):
-        macd_line, signal_line, _ = macd(merged["close"].fillna(0))
-        merged = merged[macd_line > signal_line]
-    if tech.get("kdj_positive"):
-        k, d, j = kdj(merged.fillna(0))
-        merged = merged[k > d]
-    factor = criteria.get("factor_filters", {})
-    merged = _apply_range(merged, "momentum", factor.get("momentum_min"), factor.get("momentum_max"))
-    merged = _apply_range(merged, "volatility", factor.get("volatility_min"), factor.get("volatility_max"))
-    merged = _apply_range(merged, "liquidity", factor.get("liquidity_min"), factor.get("liquidity_max"))
-    for custom in criteria.get("custom_filters", []):
-        field = custom.get("field")
-        min_val = custom.get("min")
-        max_val = custom.get("max")
-        if field in merged.columns:
-            merged = _apply_range(merged, field, min_val, max_val)
+    if _needs_technical(tech):
+        merged = merged.merge(_latest_technical(session, price_latest, as_of), on="id", how="left")
+        merged = _apply_technical_filters(merged, tech)
+    merged = _apply_factor_filters(merged, criteria)
     merged = merged.sort_values("market_cap", ascending=False)
     return merged.head(200).to_dict(orient="records")
+
+def _load_price_history(session, stock_ids: List[int], start: date, end: date) -> pd.DataFrame:
+    rows = session.exec(
+        select(DailyPrice.stock_id, DailyPrice.trade_date, DailyPrice.high, DailyPrice.low, DailyPrice.close)
+        .where(DailyPrice.stock_id.in_(stock_ids), DailyPrice.trade_date >= start, DailyPrice.trade_date <= end)
+    ).all()
+    df = pd.DataFrame(rows, columns=["stock_id", "trade_date", "high", "low", "close"])
+    df["stock_id"] = df["stock_id"].astype("int64")
+    df["trade_date"] = pd.to_datetime(df["trade_date"])
+    return df
+
+# Indicators the technical filters read, named as in the indicator snapshot values
+TECHNICAL_SPEC = {"rsi": [14], "macd": [(12, 26, 9)], "kdj": [(9, 3, 3)]}
+TECHNICAL_KEYS = {"rsi": "rsi_14", "macd": "macd_12_26_9", "macd_signal": "macd_signal_12_26_9", "kdj_k": "kdj_k_9_3_3", "kdj_d": "kdj_d_9_3_3"}
+
+def _technical_panel(prices: pd.DataFrame) -> pd.DataFrame:
+    """Per-stock technical indicators on every traded bar, in one pass over the market panel.
+
+    Like the snapshot kept by the daily sync, each stock's indicators run over its own
+    trading bars, so a suspension does not feed repeated prices into them.
+    """
+    panel = frame_to_panel(prices.rename(columns={"stock_id": "symbol"}), ("high", "low", "close"))
+    dates = pd.DatetimeIndex(panel["dates"])
+    stock_ids = np.asarray(panel["symbols"], dtype="int64")
+
+    def compute():
+        values = compute_market_indicators(panel, TECHNICAL_SPEC)
+        return [values[key] for key in TECHNICAL_KEYS.values()]
+
+    # Repeated history screens over the same range share one indicator pass
+    version = data_version(dates.asi8, stock_ids, panel["high"], panel["low"], panel["close"])
+    arrays = indicator_cache.get_or_compute(indicator_key("market", "screening_technical", TECHNICAL_SPEC, version), compute)
+    rows, cols = np.nonzero(~np.isnan(panel["close"]))
+    technical = pd.DataFrame({"trade_date": dates[rows], "stock_id": stock_ids[cols], **{name: values[rows, cols] for name, values in zip(TECHNICAL_KEYS, arrays)}})
+    return prices.merge(technical, on=["trade_date", "stock_id"], how="left")
+
+def _latest_technical(session, price_latest: pd.DataFrame, as_of: date) -> pd.DataFrame:
+    """Indicators on each stock's latest bar, keyed by stock id.
+
+    The snapshot maintained by the daily sync is used when it is for that bar; other stocks
+    (past as-of dates, snapshots not built yet) are computed from the preceding history.
+    """
+    latest = {int(stock_id): trade_date for stock_id, trade_date in zip(price_latest["stock_id"], price_latest["trade_date"])}
+    rows = []
+    if latest:
+        snapshots = session.exec(
+            select(IndicatorSnapshot.stock_id, IndicatorSnapshot.last_date, IndicatorSnapshot.values_json)
+            .where(IndicatorSnapshot.stock_id.in_(list(latest)))
+        ).all()
+        for stock_id, last_date, values_json in snapshots:
+            if last_date == latest[stock_id]:
+                values = json.loads(values_json)
+                rows.append({"id": stock_id, **{name: values.get(name) for name in TECHNICAL_KEYS}})
+    covered = {row["id"] for row in rows}
+    missing = [stock_id for stock_id in latest if stock_id not in covered]
+    if missing:
+        prices = _load_price_history(session, missing, as_of - timedelta(days=INDICATOR_LOOKBACK_DAYS), as_of)
+        if not prices.empty:
+            tail = _technical_panel(prices).sort_values("trade_date").groupby("stock_id").tail(1)
+            rows.extend(tail.rename(columns={"stock_id": "id"})[["id", *TECHNICAL_KEYS]].to_dict(orient="records"))
+    return pd.DataFrame(rows, columns=["id", *TECHNICAL_KEYS]).astype({"id": "int64", **{name: "float64" for name in TECHNICAL_KEYS}})
+
+def screen_stocks_history(session, criteria: Dict[str, Any], start: date, end: date) -> List[Dict[str, Any]]:
+    """Evaluate the screen on every trading day in [start, end] using only data known on that day.
+
+    The whole range is computed in one pass: prices, factors and financial reports are
+    aligned to each (day, stock) with as-of joins instead of re-running the screen per day.
+    """
+    stock_df = _stock_frame(session)
+    if stock_df.empty:
+        return []
+    stock_ids = stock_df["id"].astype(int).tolist()
+
+    prices = _load_price_history(session, stock_ids, start - timedelta(days=INDICATOR_LOOKBACK_DAYS), end)
+    if prices.empty:
+        return []
+    calendar = prices.loc[prices["trade_date"] >= pd.Timestamp(start), "trade_date"].drop_duplicates().sort_values()
+    if calendar.empty:
+        return []
+
+    tech = criteria.get("technical_filters", {})
+    if _needs_technical(tech):
+        prices = _technical_panel(prices)
+    prices = prices.drop(columns=["high", "low"]).rename(columns={"trade_date": "price_date"}).sort_values("price_date")
+
+    grid = pd.MultiIndex.from_product([calendar, stock_ids], names=["trade_date", "stock_id"]).to_frame(index=False)
+    stale = pd.Timedelta(days=STALE_DAYS)
+    merged = pd.merge_asof(grid, prices, left_on="trade_date", right_on="price_date", by="stock_id", tolerance=stale)
+
+    factors = session.exec(
+        select(FactorValue.stock_id, FactorValue.factor_date, FactorValue.momentum, FactorValue.volatility, FactorValue.liquidity)
+        .where(FactorValue.factor_date >= start - stale, FactorValue.factor_date <= end)
+    ).all()
+    factor_df = pd.DataFrame(factors, columns=["stock_id", "factor_date", "momentum", "volatility", "liquidity"])
+    factor_df = factor_df.astype({"stock_id": "int64"})
+    factor_df["factor_date"] = pd.to_datetime(factor_df["factor_date"])
+    merged = pd.merge_asof(merged, factor_df.sort_values("factor_date"), left_on="trade_date", right_on="factor_date", by="stock_id", tolerance=stale)
+
+    # Latest financial report published on or before each day, however old. Only the period
+    # end is stored, so a report counts from FINANCIAL_REPORT_LAG_DAYS after it
+    lag = timedelta(days=settings.FINANCIAL_REPORT_LAG_DAYS)
+    financials = session.exec(
+        select(FinancialMetric.stock_id, FinancialMetric.report_date, FinancialMetric.revenue, FinancialMetric.net_profit, FinancialMetric.roe, FinancialMetric.debt_ratio)
+        .where(FinancialMetric.report_date <= end - lag)
+    ).all()
+    financial_df = pd.DataFrame(financials, columns=["stock_id", "report_date", "revenue", "net_profit", "roe", "debt_ratio"])
+    financial_df = financial_df.astype({"stock_id": "int64"})
+    financial_df["report_date"] = pd.to_datetime(financial_df["report_date"])
+    financial_df["published_date"] = financial_df["report_date"] + lag
+    merged = pd.merge_asof(merged, financial_df.sort_values("published_date"), left_on="trade_date", right_on="published_date", by="stock_id").drop(columns=["published_date"])
+
+    merged = merged.merge(stock_df, left_on="stock_id", right_on="id", how="left")
+    merged = _apply_basic_filters(merged, criteria)
+    merged = _apply_technical_filters(merged, tech)
+    merged = _apply_factor_filters(merged, criteria)
+
+    merged = merged.sort_values(["trade_date", "market_cap"], ascending=[True, False])
+    totals = merged.groupby("trade_date", sort=True).size()
+    top = merged.groupby("trade_date", sort=True).head(200).copy()
+    for col in ("price_date", "factor_date", "report_date"):
+        top[col] = top[col].dt.date
+    groups = dict(tuple(top.groupby("trade_date", sort=True)))
+    results = []
+    for trade_date in calendar:
+        items = groups.get(trade_date, top.iloc[0:0]).drop(columns=["trade_date"])
+        # `total` counts every match that day; `items` holds the 200 largest by market cap
+        results.append({"trade_date": trade_date.date(), "total": int(totals.get(trade_date, 0)), "items": items.to_dict(orient="records")})
+    return results
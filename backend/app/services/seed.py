@@ -4,6 +4,7 @@ from sqlmodel import select
 from app.models import Stock, StrategyDefinition, DailyPrice, FactorValue, User
 from app.services.auth import hash_password
 from app.services.strategies import get_strategy_map
+from app.services.http_cache import bump_data_version
 
 def seed_basic_data(session):
     if not session.exec(select(User)).first():
@@ -20,3 +21,4 @@ def seed_basic_data(session):
         for name, func in get_strategy_map().items():
             session.add(StrategyDefinition(name=name, description=f"{name}策略", parameters_json=json.dumps({}, ensure_ascii=False)))
         session.commit()
+        bump_data_version("strategies")
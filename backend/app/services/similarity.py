@@ -0,0 +1,252 @@
+"""
+Shape similarity search over every stock's price history.
+
+Windows are compared by z-normalized Euclidean distance, which ignores price level and
+scale. For one symbol the distance to every window is a sliding dot product, computed for
+all offsets at once with an FFT (MASS):
+
+    d(i)^2 = 2m * (1 - QT(i) / (m * sigma(i)))
+
+where QT is the query (z-normalized, length m) convolved with the series and sigma(i) the
+window's standard deviation. SeriesCache keeps, per symbol, the closes, their real FFT
+(padded to a power of two >= n, which is enough for any m <= n) and cumulative sums for
+the window statistics, so a search only transforms the query and does one multiply and
+inverse FFT per symbol. Entries are versioned by the price sync sequence that sync_daily
+records in Redis: while it has not moved a refresh costs one Redis read, and afterwards
+only the symbols synced since are reloaded (in-place revisions included). Symbols are
+split across forked worker processes that read the parent's cache.
+
+The API runs `find_similar` in the compute pool, so the cache lives in each compute worker
+(one copy per COMPUTE_WORKERS), the API process never loads it, and the search runs
+serially inside the worker.
+"""
+
+import heapq
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import func
+from sqlmodel import select
+from app.core.config import settings
+from app.models import DailyPrice, Stock
+from app.services.backtest_cache import price_sequence, symbol_price_versions
+from app.services.executor import in_compute_worker
+from app.services.price_panel import load_price_frame
+
+MIN_QUERY = 5
+# Windows flatter than this (relative to the symbol's price level) have no shape
+FLAT_STD = 1e-8
+
+@dataclass
+class SymbolSeries:
+    version: str
+    dates: np.ndarray
+    close: np.ndarray
+    nfft: int
+    fft: np.ndarray
+    csum: np.ndarray
+    csum2: np.ndarray
+    scale: float
+
+def prepare_series(dates: Sequence, close: Sequence[float], version: str = "") -> SymbolSeries:
+    close = np.asarray(close, dtype=float)
+    # Centering is invisible to z-normalized distances but keeps the cumulative sums exact
+    centered = close - close.mean() if len(close) else close
+    nfft = 1 << max(0, int(len(close) - 1).bit_length())
+    csum = np.concatenate([[0.0], np.cumsum(centered)])
+    csum2 = np.concatenate([[0.0], np.cumsum(centered ** 2)])
+    scale = float(np.abs(close).mean()) if len(close) else 0.0
+    return SymbolSeries(version, np.asarray(dates), close, nfft, np.fft.rfft(centered, nfft), csum, csum2, scale)
+
+class SeriesCache:
+    def __init__(self):
+        self._entries: Dict[str, SymbolSeries] = {}
+        # Price sync sequence the entries are current with; None until loaded via Redis
+        self._sequence: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def __contains__(self, symbol: str) -> bool:
+        return symbol in self._entries
+
+    def get(self, symbol: str) -> Optional[SymbolSeries]:
+        return self._entries.get(symbol)
+
+    def symbols(self) -> List[str]:
+        return list(self._entries)
+
+    def put(self, symbol: str, dates: Sequence, close: Sequence[float], version: str = "") -> None:
+        self._entries[symbol] = prepare_series(dates, close, version)
+
+    def _load(self, session, symbols: Optional[List[str]], versions: Dict[str, str], default: str) -> None:
+        prices = load_price_frame(session, symbols=symbols, fields=("close",)).sort_values(["symbol", "trade_date"])
+        for symbol, df in prices.groupby("symbol", sort=False):
+            self.put(symbol, pd.to_datetime(df["trade_date"]).to_numpy(), df["close"].to_numpy(dtype=float), versions.get(symbol, default))
+
+    def _refresh_from_db(self, session) -> None:
+        # Without Redis: compare bar counts and last dates, which scans the price table and
+        # misses bars revised in place
+        query = select(Stock.symbol, func.count(DailyPrice.id), func.max(DailyPrice.trade_date)).join(Stock, Stock.id == DailyPrice.stock_id).group_by(Stock.symbol)
+        versions = {symbol: f"db:{count}:{last}" for symbol, count, last in session.exec(query).all()}
+        stale = [s for s, v in versions.items() if s not in self._entries or self._entries[s].version != v]
+        if stale:
+            self._load(session, stale, versions, "")
+        for symbol in set(self._entries) - set(versions):
+            del self._entries[symbol]
+        self._sequence = None
+
+    def refresh(self, session, symbols: Optional[List[str]] = None) -> List[str]:
+        """Load symbols synced since they were cached; returns the cached symbols in scope."""
+        sequence = price_sequence()
+        with self._lock:
+            if sequence is None:
+                self._refresh_from_db(session)
+            elif sequence != self._sequence:
+                versions = {symbol: str(seq) for symbol, seq in (symbol_price_versions() or {}).items()}
+                if self._sequence is None:
+                    self._entries.clear()
+                    self._load(session, None, versions, "0")
+                else:
+                    stale = [s for s, v in versions.items() if s not in self._entries or self._entries[s].version != v]
+                    if stale:
+                        self._load(session, stale, versions, "0")
+                self._sequence = sequence
+            cached = self._entries.keys()
+            return sorted(s for s in symbols if s in cached) if symbols else sorted(cached)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._sequence = None
+
+series_cache = SeriesCache()
+
+def znormalize(values: Sequence[float]) -> np.ndarray:
+    values = np.asarray(values, dtype=float)
+    std = values.std()
+    if len(values) < MIN_QUERY or not np.isfinite(values).all() or std <= FLAT_STD * max(np.abs(values).mean(), 1.0):
+        raise ValueError(f"Query needs at least {MIN_QUERY} finite, non-constant values")
+    return (values - values.mean()) / std
+
+def distance_profile(series: SymbolSeries, query: np.ndarray, query_fft: Optional[np.ndarray] = None) -> np.ndarray:
+    """z-normalized distance from `query` (already z-normalized) to every window of the series."""
+    m, n = len(query), len(series.close)
+    if m > n:
+        return np.empty(0)
+    if query_fft is None:
+        query_fft = np.fft.rfft(query[::-1], series.nfft)
+    qt = np.fft.irfft(series.fft * query_fft, series.nfft)[m - 1:n]
+    mean = (series.csum[m:] - series.csum[:-m]) / m
+    var = (series.csum2[m:] - series.csum2[:-m]) / m - mean ** 2
+    std = np.sqrt(np.maximum(var, 0.0))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        corr = qt / (m * std)
+    dist = np.sqrt(np.maximum(2 * m * (1 - corr), 0.0))
+    dist[std <= FLAT_STD * max(series.scale, 1.0)] = np.inf
+    return dist
+
+def _best_windows(dist: np.ndarray, m: int, k: int, threshold: float) -> List[int]:
+    """Up to k non-overlapping window offsets with distance below `threshold`, best first."""
+    candidates = np.flatnonzero(dist < threshold)
+    taken: List[int] = []
+    for i in candidates[np.argsort(dist[candidates], kind="stable")]:
+        if all(abs(i - j) >= m for j in taken):
+            taken.append(int(i))
+            if len(taken) == k:
+                break
+    return taken
+
+def _search_chunk(symbols: List[str], query: np.ndarray, top_k: int, exclude: Optional[Tuple[str, Any, Any]]) -> List[Tuple[float, str, int]]:
+    m = len(query)
+    heap: List[Tuple[float, str, int]] = []
+    query_ffts: Dict[int, np.ndarray] = {}
+    for symbol in symbols:
+        series = series_cache.get(symbol)
+        if series is None or len(series.close) < m:
+            continue
+        if series.nfft not in query_ffts:
+            query_ffts[series.nfft] = np.fft.rfft(query[::-1], series.nfft)
+        dist = distance_profile(series, query, query_ffts[series.nfft])
+        if exclude is not None and exclude[0] == symbol:
+            # Windows overlapping the query's own range would trivially match it
+            starts, ends = series.dates[:len(dist)], series.dates[m - 1:]
+            dist[(ends >= np.datetime64(exclude[1])) & (starts <= np.datetime64(exclude[2]))] = np.inf
+        threshold = -heap[0][0] if len(heap) == top_k else np.inf
+        for i in _best_windows(dist, m, top_k, threshold):
+            item = (-float(dist[i]), symbol, i)
+            if len(heap) < top_k:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+    return [(-d, symbol, i) for d, symbol, i in heap]
+
+def _chunks(items: List[str], workers: int) -> List[List[str]]:
+    size = max(1, -(-len(items) // (workers * 4)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+def search_similar(query: Sequence[float], top_k: int = 20, symbols: Optional[List[str]] = None, exclude: Optional[Tuple[str, Any, Any]] = None, max_workers: Optional[int] = None) -> List[Dict[str, Any]]:
+    """Top-k windows in the cached series closest in shape to `query`.
+
+    `exclude` is (symbol, start, end): that symbol's windows overlapping the range are
+    skipped, for queries cut from the same history. Raises ValueError on a bad query.
+    """
+    q = znormalize(query)
+    symbols = [s for s in (symbols if symbols is not None else series_cache.symbols()) if s in series_cache]
+    workers = 1 if in_compute_worker() else max_workers or os.cpu_count() or 1
+    chunks = _chunks(symbols, workers)
+    # Forked workers inherit the cache; without fork the search stays in-process
+    if workers <= 1 or len(chunks) <= 1 or "fork" not in multiprocessing.get_all_start_methods():
+        found = _search_chunk(symbols, q, top_k, exclude)
+    else:
+        found = []
+        context = multiprocessing.get_context("fork")
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context) as pool:
+            futures = [pool.submit(_search_chunk, chunk, q, top_k, exclude) for chunk in chunks]
+            for future in as_completed(futures):
+                found.extend(future.result())
+    m = len(q)
+    results = []
+    for dist, symbol, i in sorted(found)[:top_k]:
+        series = series_cache.get(symbol)
+        results.append({
+            "symbol": symbol,
+            "start_date": pd.Timestamp(series.dates[i]).date(),
+            "end_date": pd.Timestamp(series.dates[i + m - 1]).date(),
+            "distance": dist,
+            # Pearson correlation of the two windows
+            "correlation": 1 - dist ** 2 / (2 * m),
+            "closes": series.close[i:i + m].tolist(),
+        })
+    return results
+
+def query_window(session, symbol: str, start: date, end: date) -> np.ndarray:
+    prices = load_price_frame(session, start, end, [symbol], ("close",)).sort_values("trade_date")
+    return prices["close"].to_numpy(dtype=float)
+
+def find_similar(session, values: Optional[List[float]], symbol: Optional[str], start: Optional[date], end: Optional[date], top_k: int, symbols: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """Search for `values`, or for `symbol`'s closes in [start, end] excluding that window.
+
+    Raises ValueError with the message to show when the query is unusable.
+    """
+    exclude = None
+    if values is not None:
+        query = values
+    else:
+        query = query_window(session, symbol, start, end)
+        exclude = (symbol, start, end)
+    if len(query) > settings.SIMILARITY_MAX_QUERY:
+        raise ValueError(f"查询窗口不能超过 {settings.SIMILARITY_MAX_QUERY} 根K线")
+    scope = series_cache.refresh(session, symbols)
+    try:
+        results = search_similar(query, top_k, scope, exclude, settings.SIMILARITY_WORKERS or None)
+    except ValueError:
+        raise ValueError(f"查询窗口至少需要 {MIN_QUERY} 个有效且有波动的价格")
+    names = dict(session.exec(select(Stock.symbol, Stock.name)).all())
+    for item in results:
+        item["name"] = names.get(item["symbol"])
+    return results
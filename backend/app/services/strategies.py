@@ -2,10 +2,13 @@
 from abc import ABC, abstractmethod
 import pandas as pd
 from app.services.indicators import moving_average, rsi, macd, kdj
+from app.services.indicator_cache import cached_indicator
 
 class BaseStrategy(ABC):
     def __init__(self, **kwargs):
         self.params = kwargs
+        # Per-run results shared with sibling strategies (see strategy_dsl.CompositeStrategy)
+        self.shared_indicators = None
 
     @abstractmethod
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
@@ -14,12 +17,21 @@ class BaseStrategy(ABC):
     def run(self, df: pd.DataFrame) -> pd.Series:
         return self.generate_signals(df)
 
+    def indicator(self, df: pd.DataFrame, func, column: str | None = None, **params):
+        # Shared, memoized indicator computation (see app.services.indicator_cache)
+        if self.shared_indicators is None:
+            return cached_indicator(df, func, column, **params)
+        key = (func.__name__, column, tuple(sorted(params.items())))
+        if key not in self.shared_indicators:
+            self.shared_indicators[key] = cached_indicator(df, func, column, **params)
+        return self.shared_indicators[key]
+
 class MACrossStrategy(BaseStrategy):
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
         short_window = int(self.params.get("short_window", 5))
         long_window = int(self.params.get("long_window", 20))
-        short_ma = moving_average(df["close"], short_window)
-        long_ma = moving_average(df["close"], long_window)
+        short_ma = self.indicator(df, moving_average, "close", window=short_window)
+        long_ma = self.indicator(df, moving_average, "close", window=long_window)
         return (short_ma > long_ma).astype(int)
 
 class MomentumStrategy(BaseStrategy):
@@ -39,17 +51,17 @@ class RSIStrategy(BaseStrategy):
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
         window = int(self.params.get("window", 14))
         oversold = float(self.params.get("oversold", 30))
-        r = rsi(df["close"], window)
+        r = self.indicator(df, rsi, "close", window=window)
         return (r < oversold).astype(int)
 
 class MACDStrategy(BaseStrategy):
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
-        macd_line, signal_line, _ = macd(df["close"])
+        macd_line, signal_line, _ = self.indicator(df, macd, "close")
         return (macd_line > signal_line).astype(int)
 
 class KDJStrategy(BaseStrategy):
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
-        k, d, j = kdj(df)
+        k, d, j = self.indicator(df, kdj)
         return ((k > d) & (j > 0)).astype(int)
 
 class VolatilityBreakoutStrategy(BaseStrategy):
@@ -68,20 +80,24 @@ class VolumeSpikeStrategy(BaseStrategy):
 class TrendFollowingStrategy(BaseStrategy):
     def generate_signals(self, df: pd.DataFrame) -> pd.Series:
         window = int(self.params.get("window", 50))
-        ma = moving_average(df["close"], window)
+        ma = self.indicator(df, moving_average, "close", window=window)
         return (df["close"] > ma).astype(int)
 
+STRATEGY_CLASSES = {
+    "均线交叉": MACrossStrategy,
+    "动量策略": MomentumStrategy,
+    "均值回归": MeanReversionStrategy,
+    "RSI 反转": RSIStrategy,
+    "MACD 金叉": MACDStrategy,
+    "KDJ 反转": KDJStrategy,
+    "波动突破": VolatilityBreakoutStrategy,
+    "量能放大": VolumeSpikeStrategy,
+    "趋势跟随": TrendFollowingStrategy,
+}
+
+def get_strategy_classes():
+    return dict(STRATEGY_CLASSES)
+
 # Wrappers for compatibility
 def get_strategy_map():
-    return {
-        "均线交叉": lambda df, **k: MACrossStrategy(**k).run(df),
-        "动量策略": lambda df, **k: MomentumStrategy(**k).run(df),
-        "均值回归": lambda df, **k: MeanReversionStrategy(**k).run(df),
-        "RSI 反转": lambda df, **k: RSIStrategy(**k).run(df),
-        "MACD 金叉": lambda df, **k: MACDStrategy(**k).run(df),
-        "KDJ 反转": lambda df, **k: KDJStrategy(**k).run(df),
-        "波动突破": lambda df, **k: VolatilityBreakoutStrategy(**k).run(df),
-        "量能放大": lambda df, **k: VolumeSpikeStrategy(**k).run(df),
-        "趋势跟随": lambda df, **k: TrendFollowingStrategy(**k).run(df),
-    }
-
+    return {name: (lambda df, _cls=cls, **k: _cls(**k).run(df)) for name, cls in STRATEGY_CLASSES.items()}
@@ -0,0 +1,183 @@
+"""
+Declarative strategy composition.
+
+A composition is a JSON tree combining existing strategies and indicator conditions:
+
+    {"all": [
+        {"strategy": "均线交叉", "params": {"short_window": 5, "long_window": 20}},
+        {"left": {"indicator": "rsi", "params": {"window": 14}}, "op": "<", "right": 30},
+        {"left": {"field": "volume"}, "op": ">", "right": {"indicator": "volume_ma", "params": {"window": 20}, "scale": 1.5}}
+    ]}
+
+Nodes: `all` / `any` (lists), `not` (node), `strategy` (+ `params`), conditions
+(`left` `op` `right`) and `weighted` ([{"weight", "node"}] with optional `threshold`).
+Operands are numbers, `{"field": ...}` or `{"indicator": ..., "params": ...}`, each
+optionally multiplied by `scale`.
+
+compile_strategy validates the tree once and returns a CompositeStrategy. Each run
+computes every distinct indicator once, shared by conditions and by the embedded
+strategies, then combines the leaves with vectorized boolean/weighted operations.
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+import numpy as np
+import pandas as pd
+from app.services.indicators import moving_average, rsi, macd, kdj
+from app.services.indicator_cache import cached_indicator
+from app.services.strategies import BaseStrategy, get_strategy_classes
+
+# name -> (function, input column or None for the whole frame, output index)
+INDICATORS: Dict[str, Tuple[Callable, Any, int]] = {
+    "ma": (moving_average, "close", 0),
+    "volume_ma": (moving_average, "volume", 0),
+    "rsi": (rsi, "close", 0),
+    "macd": (macd, "close", 0),
+    "macd_signal": (macd, "close", 1),
+    "macd_hist": (macd, "close", 2),
+    "kdj_k": (kdj, None, 0),
+    "kdj_d": (kdj, None, 1),
+    "kdj_j": (kdj, None, 2),
+}
+FIELDS = ("open", "high", "low", "close", "volume", "amount")
+OPERATORS = ("<", "<=", ">", ">=", "crosses_above", "crosses_below")
+
+def _normalize(params: Dict[str, Any]) -> Dict[str, Any]:
+    # 20.0 from JSON must share a result with a strategy's int(20)
+    return {k: int(v) if isinstance(v, float) and v.is_integer() else v for k, v in (params or {}).items()}
+
+class _Run:
+    """Evaluation state for one frame: indicator results shared by every leaf."""
+    def __init__(self, df: pd.DataFrame, shared: Dict):
+        self.df = df
+        self.shared = shared
+        # (dates,) for one symbol, (dates, symbols) for a panel frame (see backtest.panel_signals)
+        self.shape = np.shape(df["close"])
+
+    def indicator(self, name: str, params: Dict[str, Any]) -> np.ndarray:
+        func, column, output = INDICATORS[name]
+        key = (func.__name__, column, tuple(sorted(params.items())))
+        if key not in self.shared:
+            # Same keys as BaseStrategy.indicator, so strategies reuse these results
+            self.shared[key] = cached_indicator(self.df, func, column, **params)
+        result = self.shared[key]
+        return np.asarray(result[output] if isinstance(result, tuple) else result, dtype=float)
+
+def _compile_operand(spec) -> Callable[[_Run], Any]:
+    if isinstance(spec, bool) or not isinstance(spec, (int, float, dict)):
+        raise ValueError(f"Invalid operand: {spec!r}")
+    if not isinstance(spec, dict):
+        value = float(spec)
+        return lambda run: value
+    scale = float(spec.get("scale", 1.0))
+    if "field" in spec:
+        field = spec["field"]
+        if field not in FIELDS:
+            raise ValueError(f"Unknown field: {field}")
+        return lambda run: run.df[field].to_numpy(dtype=float) * scale
+    if "indicator" in spec:
+        name = spec["indicator"]
+        if name not in INDICATORS:
+            raise ValueError(f"Unknown indicator: {name}")
+        params = _normalize(spec.get("params"))
+        return lambda run: run.indicator(name, params) * scale
+    raise ValueError(f"Invalid operand: {spec!r}")
+
+def _shift(values) -> Any:
+    if np.ndim(values) == 0:
+        return values
+    shifted = np.empty_like(values)
+    shifted[0] = np.nan
+    shifted[1:] = values[:-1]
+    return shifted
+
+def _compile_condition(spec: Dict[str, Any]) -> Callable[[_Run], np.ndarray]:
+    op = spec.get("op")
+    if op not in OPERATORS:
+        raise ValueError(f"Unknown operator: {op}")
+    left, right = _compile_operand(spec.get("left")), _compile_operand(spec.get("right"))
+
+    def evaluate(run: _Run) -> np.ndarray:
+        l, r = left(run), right(run)
+        with np.errstate(invalid="ignore"):
+            if op == "<":
+                out = l < r
+            elif op == "<=":
+                out = l <= r
+            elif op == ">":
+                out = l > r
+            elif op == ">=":
+                out = l >= r
+            elif op == "crosses_above":
+                out = (l > r) & (_shift(l) <= _shift(r))
+            else:
+                out = (l < r) & (_shift(l) >= _shift(r))
+        return np.broadcast_to(out, run.shape).astype(float)
+    return evaluate
+
+def _compile_node(spec, strategies: List[BaseStrategy]) -> Callable[[_Run], np.ndarray]:
+    if not isinstance(spec, dict):
+        raise ValueError(f"Invalid node: {spec!r}")
+    if "all" in spec or "any" in spec:
+        combine = np.logical_and if "all" in spec else np.logical_or
+        children = [_compile_node(child, strategies) for child in spec.get("all", spec.get("any"))]
+        if not children:
+            raise ValueError("Empty all/any node")
+
+        def evaluate(run: _Run) -> np.ndarray:
+            out = children[0](run) > 0
+            for child in children[1:]:
+                out = combine(out, child(run) > 0)
+            return out.astype(float)
+        return evaluate
+    if "not" in spec:
+        child = _compile_node(spec["not"], strategies)
+        return lambda run: (child(run) <= 0).astype(float)
+    if "weighted" in spec:
+        items = [(float(item["weight"]), _compile_node(item["node"], strategies)) for item in spec["weighted"]]
+        total = sum(abs(w) for w, _ in items)
+        if not items or total == 0:
+            raise ValueError("Weighted node needs non-zero weights")
+        threshold = spec.get("threshold")
+
+        def evaluate(run: _Run) -> np.ndarray:
+            score = sum(w * child(run) for w, child in items) / total
+            # Without a threshold the normalized score is a fractional position
+            return (score >= threshold).astype(float) if threshold is not None else np.clip(score, 0, 1)
+        return evaluate
+    if "strategy" in spec:
+        classes = get_strategy_classes()
+        if spec["strategy"] not in classes:
+            raise ValueError(f"Unknown strategy: {spec['strategy']}")
+        strategy = classes[spec["strategy"]](**_normalize(spec.get("params")))
+        strategies.append(strategy)
+        return lambda run: np.asarray(strategy.run(run.df), dtype=float)
+    if "op" in spec:
+        return _compile_condition(spec)
+    raise ValueError(f"Invalid node: {spec!r}")
+
+class CompositeStrategy(BaseStrategy):
+    """A compiled composition; build it with compile_strategy."""
+    def __init__(self, spec: Dict[str, Any]):
+        super().__init__(composition=spec)
+        self.strategies: List[BaseStrategy] = []
+        self.evaluate = _compile_node(spec, self.strategies)
+
+    def generate_signals(self, df: pd.DataFrame) -> pd.Series:
+        shared: Dict = {}
+        for strategy in self.strategies:
+            strategy.shared_indicators = shared
+        try:
+            values = self.evaluate(_Run(df, shared))
+        finally:
+            for strategy in self.strategies:
+                strategy.shared_indicators = None
+        if values.ndim == 2:
+            return pd.DataFrame(values, index=df.index)
+        return pd.Series(values, index=df.index)
+
+def compile_strategy(spec: Dict[str, Any]) -> CompositeStrategy:
+    """Validate a composition and build its evaluation plan; raises ValueError when invalid."""
+    try:
+        return CompositeStrategy(spec)
+    except (KeyError, TypeError) as exc:
+        raise ValueError(f"Invalid composition: {exc}") from exc
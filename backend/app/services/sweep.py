@@ -0,0 +1,156 @@
+"""
+Parameter sweep (grid search) for BaseStrategy subclasses.
+
+Every parameter combination is evaluated on every symbol. Price arrays are copied once
+into a shared memory block that worker processes attach to, so only parameter dicts and
+metric rows cross process boundaries.
+"""
+
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.core.config import settings
+from app.services.backtest import compute_metrics, compute_metrics_matrix, strategy_returns
+from app.services.executor import in_compute_worker
+from app.services.price_panel import load_price_frame
+from app.services.strategies import get_strategy_classes
+
+SWEEP_FIELDS = ("open", "high", "low", "close", "volume")
+METRIC_KEYS = ("annual_return", "max_drawdown", "sharpe", "win_rate", "profit_factor")
+
+# Per-process state set up by _init_worker
+_WORKER: Dict[str, Any] = {}
+
+def expand_grid(grid: Dict[str, List[Any]]) -> List[Dict[str, Any]]:
+    keys = sorted(grid)
+    values = [v if isinstance(v, (list, tuple)) else [v] for v in (grid[k] for k in keys)]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*values)]
+
+def _pack(frames: Dict[str, pd.DataFrame]):
+    """Copy all frames into one (fields + calendar position) x bars block."""
+    calendar = np.array(sorted(set().union(*(df["trade_date"] for df in frames.values()))), dtype=object)
+    layout = []
+    offset = 0
+    for symbol, df in frames.items():
+        layout.append((symbol, offset, len(df)))
+        offset += len(df)
+    block = np.empty((len(SWEEP_FIELDS) + 1, offset))
+    for (symbol, start, length) in layout:
+        df = frames[symbol]
+        for row, field in enumerate(SWEEP_FIELDS):
+            block[row, start:start + length] = df[field].to_numpy(dtype=float) if field in df.columns else np.nan
+        block[-1, start:start + length] = np.searchsorted(calendar, df["trade_date"].to_numpy())
+    return block, layout, calendar
+
+def _frames_from_block(block: np.ndarray, layout) -> Dict[str, pd.DataFrame]:
+    frames = {}
+    for symbol, start, length in layout:
+        df = pd.DataFrame({field: block[row, start:start + length] for row, field in enumerate(SWEEP_FIELDS)})
+        # Calendar positions stand in for dates and let the indicator cache key on the symbol
+        df["trade_date"] = block[-1, start:start + length].astype(int)
+        df.attrs["symbol"] = symbol
+        frames[symbol] = df
+    return frames
+
+def _init_worker(shm_name: str, shape, layout, strategy_name: str, context: Dict[str, Any]):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    block = np.ndarray(shape, dtype=float, buffer=shm.buf)
+    _WORKER.update({"shm": shm, "frames": _frames_from_block(block, layout), "strategy": get_strategy_classes()[strategy_name], **context})
+
+def _evaluate(params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    strategy = _WORKER["strategy"](**params)
+    rows = []
+    for symbol, df in _WORKER["frames"].items():
+        metrics = compute_metrics(strategy_returns(df["close"], strategy.run(df)))
+        rows.append({"symbol": symbol, **metrics})
+    return rows
+
+def returns_matrix(params: Dict[str, Any]) -> np.ndarray:
+    """Strategy returns for one parameter set as a calendar x symbols matrix (0 when not trading)."""
+    strategy = _WORKER["strategy"](**params)
+    frames = _WORKER["frames"]
+    matrix = np.zeros((_WORKER["calendar_size"], len(frames)))
+    for col, df in enumerate(frames.values()):
+        matrix[df["trade_date"].to_numpy(), col] = strategy_returns(df["close"], strategy.run(df)).to_numpy()
+    return matrix
+
+def score_windows(params: Dict[str, Any], windows: List[tuple], rank_by: str) -> Dict[str, Any]:
+    """One parameter set over (train_start, train_end, test_start, test_end) calendar slices:
+    the training score (cross-symbol mean of `rank_by`) and the equal-weight test returns
+    of each window. Runs in a map_combos worker."""
+    matrix = returns_matrix(params)
+    scores, tests = [], []
+    for train_start, train_end, test_start, test_end in windows:
+        train_metric = compute_metrics_matrix(matrix[train_start:train_end])[rank_by]
+        scores.append(float(np.nanmean(train_metric)) if not np.isnan(train_metric).all() else float("-inf"))
+        tests.append(matrix[test_start:test_end].mean(axis=1))
+    return {"scores": scores, "tests": tests}
+
+def map_combos(frames: Dict[str, pd.DataFrame], strategy_name: str, func, combos: List[Dict[str, Any]], max_workers: Optional[int] = None, context: Optional[Dict[str, Any]] = None):
+    """Run a module-level `func(params)` for each combination against shared price data.
+
+    `frames` must be non-empty and sorted by trade_date. Returns (results, calendar).
+    """
+    block, layout, calendar = _pack(frames)
+    context = {"calendar_size": len(calendar), **(context or {})}
+    shm = shared_memory.SharedMemory(create=True, size=max(block.nbytes, 1))
+    try:
+        np.ndarray(block.shape, dtype=float, buffer=shm.buf)[:] = block
+        init_args = (shm.name, block.shape, layout, strategy_name, context)
+        workers = 1 if in_compute_worker() else max_workers or os.cpu_count() or 1
+        if workers <= 1:
+            _init_worker(*init_args)
+            try:
+                results = [func(params) for params in combos]
+            finally:
+                _WORKER.pop("shm").close()
+                _WORKER.clear()
+        else:
+            chunksize = max(1, len(combos) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+                results = list(pool.map(func, combos, chunksize=chunksize))
+    finally:
+        shm.close()
+        shm.unlink()
+    return results, list(calendar)
+
+def _summarize(params: Dict[str, Any], rows: List[Dict[str, Any]], include_symbols: bool) -> Dict[str, Any]:
+    summary = {"params": params, "symbols": len(rows)}
+    for key in METRIC_KEYS:
+        values = np.array([r[key] for r in rows], dtype=float)
+        summary[key] = float(np.nanmean(values)) if len(values) and not np.isnan(values).all() else 0.0
+    if include_symbols:
+        summary["per_symbol"] = rows
+    return summary
+
+def run_parameter_sweep(frames: Dict[str, pd.DataFrame], strategy_name: str, grid: Dict[str, List[Any]], rank_by: str = "sharpe", max_workers: Optional[int] = None, limit: Optional[int] = None, include_symbols: bool = False) -> Dict[str, Any]:
+    """Evaluate all combinations of `grid` x symbols and return them ranked by `rank_by` (higher is better)."""
+    if strategy_name not in get_strategy_classes():
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+    if rank_by not in METRIC_KEYS:
+        raise ValueError(f"Unknown metric: {rank_by}")
+    combos = expand_grid(grid)
+    frames = {s: df.sort_values("trade_date").reset_index(drop=True) for s, df in frames.items() if not df.empty}
+    if not combos or not frames:
+        return {"strategy_name": strategy_name, "total": 0, "results": []}
+
+    all_rows, _ = map_combos(frames, strategy_name, _evaluate, combos, max_workers)
+
+    results = [_summarize(params, rows, include_symbols) for params, rows in zip(combos, all_rows)]
+    results.sort(key=lambda r: r[rank_by], reverse=True)
+    for rank, item in enumerate(results, start=1):
+        item["rank"] = rank
+    return {"strategy_name": strategy_name, "total": len(results), "results": results[:limit] if limit else results}
+
+def load_sweep_frames(session, symbols: List[str], start, end) -> Dict[str, pd.DataFrame]:
+    prices = load_price_frame(session, start, end, symbols)
+    return {symbol: df for symbol, df in prices.groupby("symbol")}
+
+def run_sweep_request(session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Compute-pool entry point for /backtest/sweep."""
+    frames = load_sweep_frames(session, payload["symbols"], payload["start_date"], payload["end_date"])
+    return run_parameter_sweep(frames, payload["strategy_name"], payload["grid"], payload["rank_by"], settings.SWEEP_WORKERS or None, payload.get("limit"), payload.get("include_symbols", False))
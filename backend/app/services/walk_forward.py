@@ -0,0 +1,84 @@
+"""
+Walk-forward optimization: pick parameters on each training window, apply them to the
+following test window, and stitch the out-of-sample results together.
+
+Signals are causal, so each parameter set is computed once over the whole loaded history
+and every (overlapping) window just slices those returns. Parameter sets are evaluated in
+parallel by the sweep worker pool; each worker scores all windows for its parameter set.
+"""
+
+from functools import partial
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from app.services.backtest import compute_metrics
+from app.core.config import settings
+from app.services.sweep import METRIC_KEYS, expand_grid, load_sweep_frames, map_combos, score_windows
+from app.services.strategies import get_strategy_classes
+
+def build_windows(n_dates: int, train_size: int, test_size: int, step: Optional[int] = None) -> List[tuple]:
+    """(train_start, train_end, test_start, test_end) calendar positions, ends exclusive."""
+    step = step or test_size
+    windows = []
+    start = 0
+    while start + train_size < n_dates:
+        test_end = min(start + train_size + test_size, n_dates)
+        windows.append((start, start + train_size, start + train_size, test_end))
+        start += step
+    return windows
+
+def run_walk_forward(frames: Dict[str, pd.DataFrame], strategy_name: str, grid: Dict[str, List[Any]], train_size: int, test_size: int, step: Optional[int] = None, rank_by: str = "sharpe", max_workers: Optional[int] = None) -> Dict[str, Any]:
+    if strategy_name not in get_strategy_classes():
+        raise ValueError(f"Unknown strategy: {strategy_name}")
+    if rank_by not in METRIC_KEYS:
+        raise ValueError(f"Unknown metric: {rank_by}")
+    if train_size < 2 or test_size < 1:
+        raise ValueError("train_size must be >= 2 and test_size >= 1")
+    combos = expand_grid(grid)
+    frames = {s: df.sort_values("trade_date").reset_index(drop=True) for s, df in frames.items() if not df.empty}
+    if not combos or not frames:
+        return {"strategy_name": strategy_name, "windows": [], "metrics": compute_metrics(pd.Series(dtype=float)), "equity_curve": [], "dates": []}
+
+    calendar = sorted(set().union(*(df["trade_date"] for df in frames.values())))
+    windows = build_windows(len(calendar), train_size, test_size, step)
+    if not windows:
+        raise ValueError("Not enough history for one train/test window")
+    results, calendar = map_combos(frames, strategy_name, partial(score_windows, windows=windows, rank_by=rank_by), combos, max_workers)
+
+    scores = np.array([r["scores"] for r in results])
+    chosen = scores.argmax(axis=0)
+    window_rows = []
+    oos_returns, oos_dates = [], []
+    last_end = 0
+    for i, (train_start, train_end, test_start, test_end) in enumerate(windows):
+        best = results[chosen[i]]
+        test_returns = best["tests"][i]
+        window_rows.append({
+            "train_start": str(calendar[train_start]),
+            "train_end": str(calendar[train_end - 1]),
+            "test_start": str(calendar[test_start]),
+            "test_end": str(calendar[test_end - 1]),
+            "params": combos[chosen[i]],
+            "train_score": float(scores[chosen[i], i]),
+            "test_metrics": compute_metrics(pd.Series(test_returns)),
+        })
+        # With step < test_size test windows overlap; the newest parameters take over
+        keep = slice(max(last_end, test_start) - test_start, None)
+        oos_returns.extend(test_returns[keep].tolist())
+        oos_dates.extend(str(d) for d in calendar[max(last_end, test_start):test_end])
+        last_end = test_end
+
+    oos = pd.Series(oos_returns, dtype=float)
+    return {
+        "strategy_name": strategy_name,
+        "windows": window_rows,
+        "metrics": compute_metrics(oos),
+        "equity_curve": (1 + oos).cumprod().tolist(),
+        "returns": oos_returns,
+        "dates": oos_dates,
+    }
+
+def run_walk_forward_request(session, payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Compute-pool entry point for /backtest/walk_forward."""
+    frames = load_sweep_frames(session, payload["symbols"], payload["start_date"], payload["end_date"])
+    return run_walk_forward(frames, payload["strategy_name"], payload["grid"], payload["train_size"], payload["test_size"], payload.get("step"), payload["rank_by"], settings.SWEEP_WORKERS or None)
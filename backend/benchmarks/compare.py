@@ -0,0 +1,53 @@
+"""
+Compare two benchmark reports written by benchmarks.run.
+
+    python -m benchmarks.compare base.json new.json [--threshold 0.15] [--stat min_s] [--fail]
+
+Cases are compared on their fastest run by default, which is the least noisy statistic
+on a shared machine. Cases whose time grew by more than the threshold are flagged as regressions;
+with --fail the exit status is 1 when any are found.
+"""
+
+import argparse
+import json
+import sys
+
+def compare(base: dict, new: dict, threshold: float, stat: str = "min_s"):
+    rows = []
+    for name in sorted(set(base["results"]) | set(new["results"])):
+        before = base["results"].get(name, {}).get(stat)
+        after = new["results"].get(name, {}).get(stat)
+        if before is None or after is None:
+            rows.append((name, before, after, None, "added" if before is None else "removed"))
+            continue
+        ratio = after / before if before else float("inf")
+        status = "REGRESSION" if ratio > 1 + threshold else "faster" if ratio < 1 - threshold else ""
+        rows.append((name, before, after, ratio, status))
+    return rows
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Compare benchmark reports")
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=0.15, help="relative change treated as noise")
+    parser.add_argument("--stat", default="min_s", choices=["min_s", "median_s"])
+    parser.add_argument("--fail", action="store_true", help="exit 1 on regressions")
+    args = parser.parse_args(argv)
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.new, encoding="utf-8") as f:
+        new = json.load(f)
+
+    if base["meta"].get("config") != new["meta"].get("config"):
+        print("warning: reports were produced with different configurations")
+    print(f"base {base['meta'].get('commit')}  ->  new {new['meta'].get('commit')}")
+    rows = compare(base, new, args.threshold, args.stat)
+    fmt = lambda v, spec: format(v, spec) if v is not None else "-"
+    for name, before, after, ratio, status in rows:
+        print(f"{name:<24} {fmt(before, '9.3f')}s {fmt(after, '9.3f')}s  x{fmt(ratio, '5.2f')}  {status}")
+    regressions = [r for r in rows if r[4] == "REGRESSION"]
+    print(f"{len(regressions)} regression(s)")
+    return 1 if regressions and args.fail else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,307 @@
+"""
+Benchmark suite over synthetic market data.
+
+    python -m benchmarks.run --output bench.json              # full: 5000 symbols x 10 years
+    python -m benchmarks.run --quick --output bench.json      # a few seconds per case
+    python -m benchmarks.run --only strategy --only backtest  # substring match on case names
+    python -m benchmarks.run --skip sync
+    python -m benchmarks.compare base.json bench.json
+
+Database cases (screen_stocks, sync_daily) run on a temporary SQLite file unless
+--database-url points elsewhere. Tables are created and dropped, so a non-SQLite URL must
+name a scratch database containing "bench".
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from sqlalchemy import insert
+from sqlmodel import SQLModel, Session, create_engine
+
+from benchmarks.synthetic import iter_market, trading_calendar, symbol_code, generate_symbol
+
+CASES: List[Tuple[str, Callable]] = []
+
+def case(name: str):
+    """Register `func(ctx)`; it returns (run, units) or a list of (name, run, units).
+
+    `run()` is what gets timed. Work before returning it is untimed setup.
+    """
+    def register(func):
+        CASES.append((name, func))
+        return func
+    return register
+
+class Context:
+    def __init__(self, args):
+        self.args = args
+        self._frames: Optional[List[pd.DataFrame]] = None
+        self._engine = None
+
+    @property
+    def frames(self) -> List[pd.DataFrame]:
+        if self._frames is None:
+            self._frames = [df for _, df in iter_market(self.args.symbols, self.args.years, self.args.seed)]
+        return self._frames
+
+    @property
+    def bars(self) -> int:
+        return sum(len(df) for df in self.frames)
+
+    @property
+    def engine(self):
+        if self._engine is None:
+            self._engine = create_engine(self.args.database_url)
+            SQLModel.metadata.drop_all(self._engine)
+            SQLModel.metadata.create_all(self._engine)
+            _load_database(self._engine, self.args)
+        return self._engine
+
+    def close(self):
+        if self._engine is not None:
+            SQLModel.metadata.drop_all(self._engine)
+            self._engine.dispose()
+
+def _load_database(engine, args) -> None:
+    """Bulk-load db_symbols x db_years of bars and derived factors."""
+    from app.models import Stock, DailyPrice, FactorValue
+
+    calendar = trading_calendar(args.db_years)
+    with Session(engine) as session:
+        for index in range(args.db_symbols):
+            df = generate_symbol(index, calendar, args.seed)
+            stock = Stock(symbol=symbol_code(index), name=f"BENCH{index}", market="SH" if index % 2 == 0 else "SZ", market_cap=float(df["close"].iloc[-1] * 1e8), pe_ratio=float(10 + index % 40))
+            session.add(stock)
+            session.flush()
+            bars = df.assign(stock_id=stock.id)
+            session.execute(insert(DailyPrice), bars.to_dict(orient="records"))
+            factors = pd.DataFrame({
+                "stock_id": stock.id,
+                "factor_date": df["trade_date"],
+                "momentum": df["close"].pct_change(20),
+                "volatility": df["close"].pct_change().rolling(20).std(),
+                "liquidity": df["volume"].rolling(20).mean(),
+            }).fillna(0)
+            session.execute(insert(FactorValue), factors.to_dict(orient="records"))
+        session.commit()
+
+def _clear_caches():
+    from app.services.indicator_cache import indicator_cache
+    indicator_cache.clear()
+
+@case("indicators")
+def bench_indicators(ctx):
+    from app.services.indicators import moving_average, rsi, macd, kdj
+
+    def run():
+        for df in ctx.frames:
+            moving_average(df["close"], 20)
+            rsi(df["close"])
+            macd(df["close"])
+            kdj(df)
+    return run, ctx.bars
+
+@case("strategy")
+def bench_strategies(ctx):
+    from app.services.strategies import get_strategy_map
+
+    cases = []
+    for name, func in get_strategy_map().items():
+        def run(func=func):
+            # Cold indicator cache: measure the computation, not the lookup
+            _clear_caches()
+            for df in ctx.frames:
+                func(df)
+        cases.append((f"strategy:{name}", run, ctx.bars))
+    return cases
+
+@case("backtest")
+def bench_backtest(ctx):
+    from app.services.backtest import run_backtest
+    from app.services.strategies import get_strategy_map
+
+    strategy = get_strategy_map()["均线交叉"]
+    signals = [strategy(df) for df in ctx.frames]
+
+    def run():
+        for df, signal in zip(ctx.frames, signals):
+            run_backtest(df, signal)
+    return run, ctx.bars
+
+@case("patterns")
+def bench_patterns(ctx):
+    from app.services.patterns import detect_patterns, PATTERN_NAMES
+
+    def run():
+        for df in ctx.frames:
+            detect_patterns(df, PATTERN_NAMES, {})
+    return run, ctx.bars
+
+@case("similarity")
+def bench_similarity(ctx):
+    from app.services.similarity import series_cache, search_similar
+
+    series_cache.clear()
+    for index, df in enumerate(ctx.frames):
+        series_cache.put(symbol_code(index), df["trade_date"].to_numpy(), df["close"].to_numpy(dtype=float))
+    query = ctx.frames[0]["close"].to_numpy()[-60:]
+
+    def run():
+        search_similar(query, top_k=20)
+    return run, ctx.bars
+
+@case("screen")
+def bench_screen(ctx):
+    from app.services.screening import screen_stocks
+
+    engine = ctx.engine
+    as_of = trading_calendar(ctx.args.db_years)[-1].date()
+    criteria = {
+        "as_of": as_of,
+        "basic_filters": {"market_cap_min": 1e8},
+        "technical_filters": {"rsi_min": 20, "rsi_max": 80, "macd_positive": True},
+        "factor_filters": {"momentum_min": -1},
+    }
+
+    def run():
+        _clear_caches()
+        with Session(engine) as session:
+            screen_stocks(session, criteria)
+    return run, ctx.args.db_symbols
+
+@case("sync")
+def bench_sync(ctx):
+    from app.services import data_sync
+
+    engine = ctx.engine
+    calendar = trading_calendar(ctx.args.db_years)
+    end = calendar[-1].date()
+    start = end - timedelta(days=ctx.args.sync_days)
+    symbols = [symbol_code(i) for i in range(min(ctx.args.sync_symbols, ctx.args.db_symbols))]
+    bars = {}
+    for i, symbol in enumerate(symbols):
+        df = generate_symbol(i, calendar, ctx.args.seed)
+        bars[symbol] = df[(df["trade_date"] >= start) & (df["trade_date"] <= end)]
+
+    def fetch_daily(symbol, fetch_start, fetch_end):
+        return bars[symbol]
+
+    # Time the write path only: the fetcher serves pre-generated synthetic bars
+    data_sync.get_data_sources = lambda: {"synthetic": {"name": "synthetic", "priority": 1, "daily": fetch_daily}}
+
+    def run():
+        with Session(engine) as session:
+            data_sync.sync_daily(session, symbols, start, end)
+    return run, len(symbols)
+
+@case("startup")
+def bench_startup(ctx):
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    def run():
+        # Cold interpreter each time: what every API worker and test run pays
+        subprocess.run([sys.executable, "-c", "import app.main"], cwd=backend, check=True)
+    return run, 1
+
+def _time(run: Callable, repeats: int) -> List[float]:
+    timings = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - t0)
+    return timings
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+def _check_database_url(url: str) -> None:
+    if not url.startswith("sqlite") and "bench" not in url.rsplit("/", 1)[-1]:
+        raise SystemExit("--database-url must name a scratch database containing 'bench' (its tables are dropped)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Momentum benchmark suite")
+    parser.add_argument("--symbols", type=int, default=5000)
+    parser.add_argument("--years", type=float, default=10)
+    parser.add_argument("--db-symbols", type=int, default=500)
+    parser.add_argument("--db-years", type=float, default=2)
+    parser.add_argument("--sync-symbols", type=int, default=100)
+    parser.add_argument("--sync-days", type=int, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--quick", action="store_true", help="200 symbols x 3 years, 50 symbols in the database")
+    parser.add_argument("--only", action="append", default=[], help="run cases whose name contains this (repeatable)")
+    parser.add_argument("--skip", action="append", default=[], help="skip cases whose name contains this (repeatable)")
+    parser.add_argument("--database-url", default=None)
+    parser.add_argument("--output", default="benchmark.json")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.symbols, args.years, args.db_symbols, args.sync_symbols = 200, 3, 50, 20
+    return args
+
+def main(argv=None) -> Dict:
+    args = parse_args(argv)
+    tmpdir = None
+    if args.database_url is None:
+        tmpdir = tempfile.TemporaryDirectory()
+        args.database_url = f"sqlite:///{os.path.join(tmpdir.name, 'bench.db')}"
+    _check_database_url(args.database_url)
+
+    ctx = Context(args)
+    results = {}
+    try:
+        for group, factory in CASES:
+            if args.only and not any(o in group for o in args.only) or any(s in group for s in args.skip):
+                continue
+            built = factory(ctx)
+            for name, run, units in (built if isinstance(built, list) else [(group, *built)]):
+                if args.only and not any(o in name for o in args.only) or any(s in name for s in args.skip):
+                    continue
+                timings = _time(run, args.repeats)
+                median = statistics.median(timings)
+                results[name] = {
+                    "median_s": median,
+                    "min_s": min(timings),
+                    "timings_s": timings,
+                    "units": units,
+                    "units_per_s": units / median if median else None,
+                }
+                print(f"{name:<24} median {median:8.3f}s  min {min(timings):8.3f}s  ({units} units)", flush=True)
+    finally:
+        ctx.close()
+        if tmpdir is not None:
+            tmpdir.cleanup()
+
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "database": args.database_url.split("://", 1)[0],
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "database_url")},
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"Report written to {args.output}")
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+import threading
+import pytest
+
+class MemoryRedis:
+    """The string commands the response and HTTP caches use, kept in a dict."""
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    def set(self, key, value, ex=None, px=None, nx=False):
+        with self.lock:
+            if nx and key in self.data:
+                return None
+            self.data[key] = value
+            return True
+
+    def incr(self, key):
+        with self.lock:
+            self.data[key] = str(int(self.data.get(key, 0)) + 1)
+            return int(self.data[key])
+
+    def eval(self, script, numkeys, key, token):
+        # Only the compare-and-delete lock release script is used
+        with self.lock:
+            if self.data.get(key) == token:
+                del self.data[key]
+
+class DownRedis:
+    """Every command fails as if the server were unreachable."""
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise ConnectionError
+        return fail
+
+@pytest.fixture
+def memory_redis():
+    return MemoryRedis()
+
+@pytest.fixture
+def down_redis():
+    return DownRedis()
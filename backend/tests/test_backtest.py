@@ -0,0 +1,185 @@
+from datetime import date
+import numpy as np
+import pytest
+import pandas as pd
+from app.services.backtest import run_backtest, run_portfolio_backtest, panel_signals
+from app.services.strategies import get_strategy_map
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.models import BacktestResult, BacktestDateIndex
+from app.services.curves import _date_index_id, store_curve, load_curve, downsample
+from app.services import backtest_cache
+from app.services.backtest_cache import normalize_params, range_version, record_price_sync, symbol_range_version
+from app.services.robustness import robustness_report, simulate_metrics
+
+def _panel(n_dates=120, n_symbols=3, seed=1):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, (n_dates, n_symbols)), axis=0)
+    return {
+        "close": close,
+        "open": close,
+        "high": close * 1.01,
+        "low": close * 0.99,
+        "volume": rng.uniform(1e5, 1e6, close.shape),
+    }
+
+def test_portfolio_per_symbol_metrics_match_single_backtest():
+    panel = _panel()
+    signal = (np.arange(panel["close"].size).reshape(panel["close"].shape) % 3 == 0).astype(float)
+    result = run_portfolio_backtest(panel["close"], signal, symbols=["a", "b", "c"])
+    for col, item in enumerate(result["symbols"]):
+        df = pd.DataFrame({"trade_date": range(len(signal)), "close": panel["close"][:, col]})
+        single = run_backtest(df, pd.Series(signal[:, col]))["metrics"]
+        for key, value in single.items():
+            assert np.isclose(item[key], value), (col, key)
+
+def test_portfolio_equal_weight_returns_and_turnover():
+    close = np.array([[10.0, 20.0], [11.0, 20.0], [11.0, 22.0], [12.1, 22.0]])
+    signal = np.array([[1.0, 1.0], [1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+    result = run_portfolio_backtest(close, signal)
+    # Day 1 holds both (half each), day 2 only the first, day 3 only the second
+    np.testing.assert_allclose(result["returns"], [0.0, 0.05, 0.0, 0.0])
+    np.testing.assert_allclose(result["turnover"], [0.0, 1.0, 1.0, 2.0])
+
+def test_panel_signals_match_per_symbol_strategy():
+    panel = _panel()
+    strategy = get_strategy_map()["均线交叉"]
+    signals = panel_signals(strategy, panel)
+    for col in range(panel["close"].shape[1]):
+        df = pd.DataFrame({f: panel[f][:, col] for f in ("open", "high", "low", "close", "volume")})
+        np.testing.assert_array_equal(signals[:, col], strategy(df).to_numpy())
+
+def test_parameter_sweep_ranks_all_combinations():
+    from app.services.sweep import run_parameter_sweep
+    panel = _panel(n_dates=200)
+    frames = {
+        f"s{col}": pd.DataFrame({"trade_date": range(200), **{f: panel[f][:, col] for f in ("open", "high", "low", "close", "volume")}})
+        for col in range(3)
+    }
+    result = run_parameter_sweep(frames, "均线交叉", {"short_window": [3, 5], "long_window": [20, 40]}, max_workers=1, include_symbols=True)
+    assert result["total"] == 4
+    sharpes = [r["sharpe"] for r in result["results"]]
+    assert sharpes == sorted(sharpes, reverse=True)
+    best = result["results"][0]
+    strategy = get_strategy_map()["均线交叉"]
+    expected = run_backtest(frames["s0"], strategy(frames["s0"], **best["params"]))["metrics"]
+    assert np.isclose(best["per_symbol"][0]["sharpe"], expected["sharpe"])
+
+def test_walk_forward_windows_and_stitched_curve():
+    from app.services.walk_forward import build_windows, run_walk_forward
+    assert build_windows(10, 4, 3) == [(0, 4, 4, 7), (3, 7, 7, 10)]
+    panel = _panel(n_dates=300)
+    frames = {
+        f"s{col}": pd.DataFrame({"trade_date": range(300), **{f: panel[f][:, col] for f in ("open", "high", "low", "close", "volume")}})
+        for col in range(3)
+    }
+    result = run_walk_forward(frames, "均线交叉", {"short_window": [3, 5], "long_window": [20, 40]}, train_size=120, test_size=60, max_workers=1)
+    assert len(result["windows"]) == 3
+    assert len(result["returns"]) == len(result["dates"]) == 180
+    assert result["dates"][0] == "120"
+    # Worker processes score the same windows
+    parallel = run_walk_forward(frames, "均线交叉", {"short_window": [3, 5], "long_window": [20, 40]}, train_size=120, test_size=60, max_workers=2)
+    assert parallel["returns"] == result["returns"]
+
+def test_curve_storage_round_trip_and_downsampling():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    dates = [d.date().isoformat() for d in pd.bdate_range("2020-01-01", periods=1500)]
+    equity = np.cumprod(1 + np.random.default_rng(3).normal(0, 0.01, len(dates)))
+    for _ in range(2):
+        record = BacktestResult(strategy_name="ma", symbol="000001", start_date=pd.Timestamp(dates[0]).date(), end_date=pd.Timestamp(dates[-1]).date(), annual_return=0, max_drawdown=0, sharpe=0, win_rate=0, profit_factor=0)
+        session.add(record)
+        session.flush()
+        store_curve(session, record.id, dates, equity, np.diff(equity, prepend=1.0))
+        session.commit()
+    # Both curves share one date index
+    assert len(session.exec(select(BacktestDateIndex)).all()) == 1
+    curve = load_curve(session, record.id)
+    assert curve["dates"] == dates
+    assert np.allclose(curve["equity_curve"], equity, rtol=1e-6)
+
+    for method in ("lttb", "minmax"):
+        reduced = downsample(dates, equity, 200, method)
+        assert len(reduced["values"]) <= 200
+        assert reduced["dates"][0] == dates[0] and reduced["dates"][-1] == dates[-1]
+        assert reduced["dates"] == sorted(reduced["dates"])
+    extremes = downsample(dates, equity, 200, "minmax")["values"]
+    assert max(extremes) == equity.max() and min(extremes) == equity.min()
+    assert downsample(dates, equity, None)["values"] == equity.tolist()
+    assert len(downsample(dates, equity, 4, "minmax")["values"]) <= 4
+    with pytest.raises(ValueError):
+        downsample(dates, equity, 3, "minmax")
+    # A calendar stored again (e.g. by a worker that lost the insert race) reuses the row
+    assert _date_index_id(session, dates) == session.exec(select(BacktestDateIndex.id)).one()
+
+def test_backtest_cache_key_parts():
+    assert normalize_params({"window": 20, "oversold": "30"}) == normalize_params({"oversold": 30.0, "window": "20"})
+    touches = ["2020-01-01:2020-12-31:1", "2024-06-01:2024-06-30:5", "2024-07-01:2024-07-01:9"]
+    assert range_version(touches, date(2019, 1, 1), date(2021, 1, 1)) == 1
+    assert range_version(touches, date(2024, 1, 1), date(2024, 6, 15)) == 5
+    assert range_version(touches, date(2022, 1, 1), date(2023, 1, 1)) == 0
+
+class ZsetRedis:
+    """The sorted-set commands record_price_sync and symbol_range_version use."""
+    def __init__(self):
+        self.values, self.zsets, self.hashes = {}, {}, {}
+
+    def incr(self, key):
+        self.values[key] = self.values.get(key, 0) + 1
+        return self.values[key]
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = value
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def _sorted(self, key):
+        return sorted(self.zsets.get(key, {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, key, start, stop):
+        members = [m for m, _ in self._sorted(key)]
+        return members[start:stop + 1 if stop >= 0 else None]
+
+    def zrangebyscore(self, key, low, high):
+        return [m for m, score in self._sorted(key) if score >= low]
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets[key].pop(member, None)
+
+def test_price_touches_are_merged_without_lowering_versions(monkeypatch):
+    monkeypatch.setattr(backtest_cache, "redis_client", ZsetRedis())
+    days = pd.bdate_range("2023-01-02", periods=300).date
+    versions = []
+    for i in range(0, 290, 3):
+        record_price_sync("600000", days[i], days[i + 2])
+        versions.append(symbol_range_version("600000", days[0], days[i + 2]))
+    assert backtest_cache.redis_client.zcard("prices:touches:600000") <= backtest_cache.MAX_TOUCHES
+    # Every sync moves the version of ranges it overlaps, and never lowers it
+    assert versions == sorted(set(versions))
+    last = days[288]
+    assert symbol_range_version("600000", last, last) == len(versions)
+    # Recent ranges untouched since keep their version
+    assert symbol_range_version("600000", days[285], days[287]) == len(versions) - 1
+
+def test_robustness_distributions():
+    returns = np.random.default_rng(5).normal(0.001, 0.02, 750)
+    report = robustness_report(returns, simulations=500, block_size=10, seed=1)
+    sharpe = report["metrics"]["sharpe"]
+    assert sharpe["ci_low"] < report["observed"]["sharpe"] < sharpe["ci_high"]
+    assert 0 <= report["prob_loss"] <= 1
+    # Small chunks give the same number of paths as one large batch
+    chunked = simulate_metrics(returns, 300, "block", 10, seed=2, chunk_bytes=1)
+    assert len(chunked["max_drawdown"]) == 300 and (chunked["max_drawdown"] <= 0).all()
+    # Days are drawn with replacement, so every metric varies around the observed value
+    shuffled = simulate_metrics(returns, 500, "shuffle", seed=3)
+    for key in ("annual_return", "sharpe", "win_rate", "profit_factor", "max_drawdown"):
+        assert shuffled[key].std() > 0
+    assert shuffled["annual_return"].min() < report["observed"]["annual_return"] < shuffled["annual_return"].max()
+    iid = robustness_report(returns, simulations=500, method="shuffle", seed=4)
+    assert iid["metrics"]["sharpe"]["ci_low"] < iid["metrics"]["sharpe"]["ci_high"]
+    assert 0 < iid["prob_loss"] < 1
@@ -0,0 +1,114 @@
+import time
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import HTTPException
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.models import BacktestCurve, BacktestJob, BacktestResult, DailyPrice, Stock, User
+from app.routers import _get_job
+from app.services import backtest_jobs
+from app.services.backtest_jobs import cancel_backtest_job, job_summary, recover_jobs, submit_backtest_job
+
+PAYLOAD = {"strategy_name": "均线交叉", "symbols": ["000001", "000002"], "start_date": "2024-01-01", "end_date": "2024-06-28", "parameters": {}}
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.db'}")
+    SQLModel.metadata.create_all(engine)
+    # Workers open their own sessions; forked pool processes inherit the patch
+    monkeypatch.setattr(backtest_jobs, "get_session", lambda: Session(engine))
+    rng = np.random.default_rng(0)
+    days = pd.bdate_range("2024-01-01", "2024-06-28")
+    with Session(engine) as session:
+        for symbol in PAYLOAD["symbols"]:
+            stock = Stock(symbol=symbol, name=symbol, market="SZ")
+            session.add(stock)
+            session.commit()
+            close = 10 * np.cumprod(1 + rng.normal(0, 0.02, len(days)))
+            for day, price in zip(days, close):
+                session.add(DailyPrice(stock_id=stock.id, trade_date=day.date(), open=price, high=price, low=price, close=price, volume=1.0))
+        session.commit()
+    yield engine
+    backtest_jobs.shutdown_executor()
+
+def _wait(engine, job_id, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        with Session(engine) as session:
+            job = session.get(BacktestJob, job_id)
+            if job.status in ("finished", "failed", "cancelled"):
+                return job
+        time.sleep(0.1)
+    raise AssertionError("job did not finish")
+
+def test_submitted_job_runs_and_persists_results_with_curves(engine):
+    with Session(engine) as session:
+        job = submit_backtest_job(session, dict(PAYLOAD), "alice")
+        assert job.status == "queued"
+    job = _wait(engine, job.id)
+    assert job.status == "finished" and job.progress == 2 and job.started_at and job.heartbeat_at
+    with Session(engine) as session:
+        summary = job_summary(session, job)
+        assert [r["symbol"] for r in summary["results"]] == PAYLOAD["symbols"]
+        result_ids = [r["result_id"] for r in summary["results"]]
+        curves = session.exec(select(BacktestCurve).where(BacktestCurve.result_id.in_(result_ids))).all()
+        assert len(curves) == 2
+        # Claiming makes a re-dispatched job a no-op
+        assert backtest_jobs._execute_job(job.id) == "finished"
+        assert len(session.exec(select(BacktestResult)).all()) == 2
+
+def test_cancellation_of_queued_and_running_jobs(engine, monkeypatch):
+    with Session(engine) as session:
+        queued = BacktestJob(strategy_name=PAYLOAD["strategy_name"], payload_json=backtest_jobs.json.dumps(PAYLOAD), total=2)
+        session.add(queued)
+        session.commit()
+        assert cancel_backtest_job(session, queued).status == "cancelled"
+        assert backtest_jobs._execute_job(queued.id) == "cancelled"
+
+        running = BacktestJob(strategy_name=PAYLOAD["strategy_name"], payload_json=queued.payload_json, total=2)
+        session.add(running)
+        session.commit()
+        running_id = running.id
+
+    original = backtest_jobs._backtest_symbol
+
+    def cancel_after_first(session, payload, symbol, job_id, signal_func):
+        item = original(session, payload, symbol, job_id, signal_func)
+        with Session(engine) as other:
+            assert cancel_backtest_job(other, other.get(BacktestJob, job_id)).status == "cancelling"
+        return item
+
+    monkeypatch.setattr(backtest_jobs, "_backtest_symbol", cancel_after_first)
+    assert backtest_jobs._execute_job(running_id) == "cancelled"
+    with Session(engine) as session:
+        assert len(session.exec(select(BacktestResult).where(BacktestResult.job_id == running_id)).all()) == 1
+
+def test_recover_closes_jobs_with_a_lapsed_heartbeat(engine, monkeypatch):
+    dispatched = []
+    monkeypatch.setattr(backtest_jobs, "_dispatch", dispatched.append)
+    old = datetime.utcnow() - timedelta(hours=1)
+    with Session(engine) as session:
+        jobs = {
+            "queued": BacktestJob(strategy_name="x", payload_json="{}", status="queued"),
+            "lost": BacktestJob(strategy_name="x", payload_json="{}", status="running", heartbeat_at=old),
+            "lost_cancelling": BacktestJob(strategy_name="x", payload_json="{}", status="cancelling", heartbeat_at=old),
+            "alive": BacktestJob(strategy_name="x", payload_json="{}", status="running", heartbeat_at=datetime.utcnow()),
+        }
+        session.add_all(jobs.values())
+        session.commit()
+        recover_jobs(session)
+        status = {name: session.get(BacktestJob, job.id).status for name, job in jobs.items()}
+    assert status == {"queued": "queued", "lost": "failed", "lost_cancelling": "cancelled", "alive": "running"}
+    assert dispatched == [jobs["queued"].id]
+
+def test_jobs_are_visible_to_their_owner_and_admins(engine):
+    with Session(engine) as session:
+        job = BacktestJob(strategy_name="x", payload_json="{}", username="alice")
+        session.add(job)
+        session.commit()
+        assert _get_job(session, job.id, User(username="alice", password_hash="", role="analyst")).id == job.id
+        assert _get_job(session, job.id, User(username="root", password_hash="", role="admin")).id == job.id
+        with pytest.raises(HTTPException) as exc:
+            _get_job(session, job.id, User(username="bob", password_hash="", role="analyst"))
+        assert exc.value.status_code == 404
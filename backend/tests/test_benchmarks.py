@@ -0,0 +1,13 @@
+import pandas as pd
+from benchmarks.synthetic import generate_symbol, trading_calendar
+
+def test_synthetic_market_is_deterministic_with_suspensions():
+    calendar = trading_calendar(4)
+    frames = [generate_symbol(i, calendar, seed=7) for i in range(20)]
+    again = generate_symbol(3, calendar, seed=7)
+    pd.testing.assert_frame_equal(frames[3], again)
+    assert any(len(df) < len(calendar) for df in frames)
+    for df in frames:
+        assert (df["high"] >= df[["open", "close"]].max(axis=1)).all()
+        assert (df["low"] <= df[["open", "close"]].min(axis=1)).all()
+        assert (df["close"].pct_change().abs().dropna() < 0.5).all()
@@ -0,0 +1,47 @@
+import threading
+import time
+from datetime import date
+import numpy as np
+from app.core.config import settings
+from app.services.cache import ResponseCache, decode_value, encode_value
+
+def test_codec_round_trip_and_compression():
+    payload = {"items": [{"trade_date": date(2024, 1, 2), "close": np.float64(1.5)}] * 200, "total": 200}
+    raw = encode_value(payload, 123.0)
+    decoded, fresh_until = decode_value(raw)
+    assert fresh_until == 123.0 and decoded["items"][0] == {"trade_date": "2024-01-02", "close": 1.5}
+    assert len(raw) < settings.CACHE_COMPRESS_MIN_BYTES
+
+def test_concurrent_misses_compute_once(memory_redis):
+    cache = ResponseCache(memory_redis)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.2)
+        return {"value": 42}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_compute("k", compute, ttl=60))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1 and results == [{"value": 42}] * 5
+
+def test_stale_value_served_while_one_worker_recomputes(memory_redis):
+    client = memory_redis
+    cache = ResponseCache(client)
+    cache.set("k", "old", ttl=-1, stale_ttl=60)
+    assert cache.get("k") is None
+    # Another worker holds the recompute lock: the stale value comes back immediately
+    client.set("lock:k", "other")
+    assert cache.get_or_compute("k", lambda: "new") == "old"
+    client.eval(None, 1, "lock:k", "other")
+    assert cache.get_or_compute("k", lambda: "new") == "new"
+    assert cache.get("k") == "new" and "lock:k" not in client.data
+
+def test_redis_errors_are_misses(down_redis):
+    cache = ResponseCache(down_redis)
+    assert cache.get("k") is None
+    assert cache.get_or_compute("k", lambda: 7) == 7
@@ -0,0 +1,70 @@
+import asyncio
+import time
+import pytest
+from app.services.executor import ComputeBusy, ComputeExecutor, ComputeTimeout, in_compute_worker
+
+def square(x):
+    return x * x
+
+def busy_loop(seconds):
+    end = time.time() + seconds
+    while time.time() < end:
+        pass
+    return "done"
+
+def test_runs_tasks_in_worker_processes():
+    executor = ComputeExecutor(workers=1, max_pending=4, timeout=30)
+    try:
+        assert asyncio.run(executor.run(square, 7)) == 49
+        assert executor.call(square, 3) == 9
+        assert executor.pending == 0
+    finally:
+        executor.shutdown()
+
+def test_queue_is_bounded_and_timeouts_stop_the_task():
+    executor = ComputeExecutor(workers=1, max_pending=1, timeout=0.5)
+    try:
+        future = executor.submit(busy_loop, 5)
+        with pytest.raises(ComputeBusy):
+            executor.submit(square, 2)
+        started = time.time()
+        with pytest.raises(ComputeTimeout):
+            future.result(10)
+        # The worker interrupted itself instead of running the full five seconds
+        assert time.time() - started < 3
+        time.sleep(0.05)
+        assert executor.pending == 0 and executor.call(square, 2) == 4
+    finally:
+        executor.shutdown()
+
+def test_pool_users_run_serially_inside_compute_workers():
+    executor = ComputeExecutor(workers=1, max_pending=4, timeout=30)
+    try:
+        assert not in_compute_worker()
+        assert executor.call(in_compute_worker) is True
+    finally:
+        executor.shutdown()
+
+def test_pattern_scan_batches_are_bounded_by_the_workers(monkeypatch):
+    from app import routers
+    from app.schemas import PatternScanRequest
+
+    running, peak = [], []
+
+    async def fake_compute(func, *args):
+        running.append(args[-1])
+        peak.append(len(running))
+        await asyncio.sleep(0.01)
+        running.remove(args[-1])
+        return [{"symbol": symbol} for symbol in args[-1]]
+
+    monkeypatch.setattr(routers, "_compute", fake_compute)
+    monkeypatch.setattr(routers.compute_executor, "workers", 2)
+    payload = PatternScanRequest(patterns=["双重底"], start_date="2024-01-01", end_date="2024-06-30")
+    symbols = [f"{i:06d}" for i in range(40)]
+
+    async def collect():
+        return [item["symbol"] async for batch in routers._scan_batches(payload, symbols) for item in batch]
+
+    assert sorted(asyncio.run(collect())) == symbols
+    assert max(peak) == 2
@@ -0,0 +1,30 @@
+from datetime import date
+import numpy as np
+import orjson
+import pandas as pd
+import pytest
+from app.services.formats import ARROW, COLUMNS, ROWS, format_frame, negotiate_format
+
+def _frame():
+    return pd.DataFrame({"trade_date": [date(2024, 1, 2), date(2024, 1, 3)], "close": [10.5, np.nan], "volume": np.array([100, 200], dtype="int64"), "name": ["a", None]})
+
+def test_negotiation():
+    assert negotiate_format(None, None) == ROWS
+    assert negotiate_format(None, "application/vnd.apache.arrow.stream, */*") == ARROW
+    assert negotiate_format(COLUMNS, "application/vnd.apache.arrow.stream") == COLUMNS
+    with pytest.raises(ValueError):
+        negotiate_format("xml", None)
+
+def test_rows_and_columns_carry_the_same_values():
+    rows = orjson.loads(format_frame(_frame(), ROWS).body)
+    columns = orjson.loads(format_frame(_frame(), COLUMNS).body)
+    assert rows == [{"trade_date": "2024-01-02", "close": 10.5, "volume": 100, "name": "a"}, {"trade_date": "2024-01-03", "close": None, "volume": 200, "name": None}]
+    assert columns == {key: [row[key] for row in rows] for key in rows[0]}
+    assert orjson.loads(format_frame(_frame().iloc[:0], ROWS).body) == []
+
+def test_arrow_stream_round_trip():
+    pa = pytest.importorskip("pyarrow")
+    response = format_frame(_frame(), ARROW, {"ETag": '"x"'})
+    assert response.media_type == "application/vnd.apache.arrow.stream" and response.headers["etag"] == '"x"'
+    table = pa.ipc.open_stream(response.body).read_all()
+    assert table.column("volume").to_pylist() == [100, 200]
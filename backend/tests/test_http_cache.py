@@ -0,0 +1,33 @@
+from fastapi import Request, Response
+from app.services import http_cache
+from app.services.http_cache import etag_matches, make_etag
+
+def test_etag_matching():
+    tag = make_etag("stocks", "1:2")
+    assert etag_matches(tag, tag) and etag_matches(f'"x", W/{tag}', tag) and etag_matches("*", tag)
+    assert not etag_matches(None, tag) and not etag_matches('"other"', tag)
+
+def _request(if_none_match=None):
+    headers = [(b"if-none-match", if_none_match.encode())] if if_none_match else []
+    return Request({"type": "http", "method": "GET", "path": "/items", "headers": headers})
+
+def test_not_modified_until_the_data_version_changes(monkeypatch, memory_redis):
+    monkeypatch.setattr(http_cache, "redis_client", memory_redis)
+    first = Response()
+    assert http_cache.check_not_modified(_request(), first, ["stocks"], "items") is None
+    etag = first.headers["etag"]
+    assert "must-revalidate" in first.headers["cache-control"]
+
+    not_modified = http_cache.check_not_modified(_request(etag), Response(), ["stocks"], "items")
+    assert not_modified.status_code == 304 and not_modified.headers["etag"] == etag
+
+    http_cache.bump_data_version("stocks")
+    changed = Response()
+    assert http_cache.check_not_modified(_request(etag), changed, ["stocks"], "items") is None
+    assert changed.headers["etag"] != etag
+
+def test_no_etag_without_redis(monkeypatch, down_redis):
+    monkeypatch.setattr(http_cache, "redis_client", down_redis)
+    response = Response()
+    assert http_cache.check_not_modified(_request('"x"'), response, ["stocks"], "items") is None
+    assert "etag" not in response.headers
@@ -0,0 +1,79 @@
+import json
+import numpy as np
+import pandas as pd
+from sqlmodel import SQLModel, Session, create_engine, delete, select
+from app.models import DailyPrice, IndicatorSnapshot
+from app.services.indicators import moving_average, rsi, macd, kdj
+from app.services.indicator_state import IndicatorState, advance_indicator_state
+
+def _bars(n=300, seed=7):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, n))
+    high = close * (1 + rng.uniform(0, 0.02, n))
+    low = close * (1 - rng.uniform(0, 0.02, n))
+    # A flat stretch exercises zero loss and zero high-low range
+    close[100:115] = high[100:115] = low[100:115] = close[99]
+    return pd.DataFrame({"high": high, "low": low, "close": close})
+
+def _batch(df):
+    macd_line, signal_line, hist = macd(df["close"])
+    k, d, j = kdj(df)
+    expected = {f"ma_{w}": moving_average(df["close"], w) for w in (5, 10, 20, 60)}
+    expected.update({"rsi": rsi(df["close"]), "macd": macd_line, "macd_signal": signal_line, "macd_hist": hist, "kdj_k": k, "kdj_d": d, "kdj_j": j})
+    return pd.DataFrame(expected)
+
+def test_incremental_matches_batch():
+    df = _bars()
+    result = IndicatorState().update_frame(df)
+    expected = _batch(df)
+    for column in expected.columns:
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-8, atol=1e-8, equal_nan=True, err_msg=column)
+
+def test_state_round_trip_resumes_exactly():
+    df = _bars(seed=11)
+    full = IndicatorState().update_frame(df)
+    state = IndicatorState()
+    state.update_frame(df.iloc[:150])
+    restored = IndicatorState.loads(state.dumps())
+    tail = restored.update_frame(df.iloc[150:])
+    pd.testing.assert_frame_equal(tail, full.iloc[150:])
+
+def test_missing_bars_follow_batch_nan_handling():
+    df = _bars(n=120, seed=3)
+    df.loc[40:42, ["high", "low", "close"]] = np.nan
+    result = IndicatorState().update_frame(df)
+    expected = _batch(df)
+    for column in expected.columns:
+        np.testing.assert_allclose(result[column], expected[column], rtol=1e-8, atol=1e-8, equal_nan=True, err_msg=column)
+
+def _store(session, stock_id, df, days):
+    for day, (_, row) in zip(days, df.iterrows()):
+        session.add(DailyPrice(stock_id=stock_id, trade_date=day.date(), open=row["close"], high=row["high"], low=row["low"], close=row["close"], volume=1.0))
+    session.commit()
+
+def _snapshot_matches_batch(session, stock_id, df):
+    snapshot = session.exec(select(IndicatorSnapshot).where(IndicatorSnapshot.stock_id == stock_id)).one()
+    values = json.loads(snapshot.values_json)
+    expected = _batch(df).iloc[-1]
+    for column, value in expected.items():
+        np.testing.assert_allclose(values[column], value, rtol=1e-8, err_msg=column)
+
+def test_resynced_bars_are_replayed_into_the_snapshot():
+    session = Session(create_engine("sqlite://"))
+    SQLModel.metadata.create_all(session.get_bind())
+    df = _bars(n=200, seed=5)
+    days = pd.bdate_range("2023-01-02", periods=len(df))
+    _store(session, 1, df.iloc[:180], days[:180])
+    advance_indicator_state(session, 1)
+    _store(session, 1, df.iloc[180:], days[180:])
+    advance_indicator_state(session, 1, since=days[180].date())
+    _snapshot_matches_batch(session, 1, df)
+
+    # A sync rewrites the last three bars with revised prices, as the scheduled job does
+    for revised_at in (len(df) - 3, 20):
+        start = days[revised_at].date()
+        session.exec(delete(DailyPrice).where(DailyPrice.stock_id == 1, DailyPrice.trade_date >= start))
+        df.loc[revised_at:, ["high", "low", "close"]] *= 1.05
+        _store(session, 1, df.iloc[revised_at:], days[revised_at:])
+        advance_indicator_state(session, 1, since=start)
+        _snapshot_matches_batch(session, 1, df)
@@ -0,0 +1,68 @@
+import asyncio
+import pytest
+from sqlalchemy import text
+from sqlmodel import create_engine
+from app.services.metrics import REGISTRY, Registry, Counter, Histogram, DB_QUERIES, HTTP_LATENCY, HTTP_REQUESTS, SOURCE_ERRORS, instrument_engine, timed_fetch
+
+def test_exposition_format():
+    registry = Registry()
+    requests = registry.register(Counter("requests_total", "Requests.", ("route",)))
+    latency = registry.register(Histogram("latency_seconds", "Latency.", ("route",), buckets=(0.1, 1.0)))
+    requests.inc(route='/a"b')
+    latency.observe(0.05, route="/a")
+    latency.observe(0.5, route="/a")
+    latency.observe(5, route="/a")
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines and 'requests_total{route="/a\\"b"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines and 'latency_seconds_sum{route="/a"} 5.55' in lines
+
+def test_engine_statements_are_counted():
+    engine = create_engine("sqlite://")
+    instrument_engine(engine)
+    before = DB_QUERIES.value(operation="SELECT")
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+        conn.execute(text("select 2"))
+    assert DB_QUERIES.value(operation="SELECT") == before + 2
+
+def test_failed_fetches_are_counted():
+    def broken():
+        raise ConnectionError("down")
+
+    before = SOURCE_ERRORS.value(source="test", kind="daily")
+    with pytest.raises(ConnectionError):
+        timed_fetch("test", "daily", broken)
+    assert SOURCE_ERRORS.value(source="test", kind="daily") == before + 1
+
+def _get(app, path):
+    """Drive the ASGI app directly for one GET; returns the response status."""
+    messages = []
+    incoming = [{"type": "http.request", "body": b"", "more_body": False}]
+
+    async def receive():
+        return incoming.pop(0) if incoming else {"type": "http.disconnect"}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET", "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "", "query_string": b"", "headers": [], "client": ("test", 1), "server": ("test", 80)}
+    asyncio.run(app(scope, receive, send))
+    return next(m["status"] for m in messages if m["type"] == "http.response.start")
+
+def test_requests_are_labelled_by_route_template():
+    from app.main import app
+
+    template = "/api/v1/backtest/jobs/{job_id}"
+    before = HTTP_REQUESTS.value(method="GET", route=template, status="401")
+    assert _get(app, "/api/v1/backtest/jobs/123") == 401
+    assert _get(app, "/api/v1/backtest/jobs/456") == 401
+    assert HTTP_REQUESTS.value(method="GET", route=template, status="401") == before + 2
+    assert HTTP_LATENCY.count(method="GET", route=template) >= 2
+    assert 'route="/api/v1/backtest/jobs/123"' not in REGISTRY.render()
+
+    unmatched = HTTP_REQUESTS.value(method="GET", route="unmatched", status="404")
+    assert _get(app, "/no/such/path/789") == 404
+    assert HTTP_REQUESTS.value(method="GET", route="unmatched", status="404") == unmatched + 1
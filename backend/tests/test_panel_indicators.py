@@ -0,0 +1,57 @@
+import numpy as np
+import pandas as pd
+from app.services.indicators import moving_average, rsi, macd, kdj
+from app.services.panel_indicators import compute_panel_indicators
+from app.services.price_panel import frame_to_panel
+
+def _panel(n_dates=200, n_symbols=4, seed=5):
+    rng = np.random.default_rng(seed)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, (n_dates, n_symbols)), axis=0)
+    high = close * (1 + rng.uniform(0, 0.02, close.shape))
+    low = close * (1 - rng.uniform(0, 0.02, close.shape))
+    volume = rng.uniform(1e5, 1e6, close.shape)
+    # Symbol 1 is suspended for a stretch, symbol 2 lists late
+    for arr in (close, high, low, volume):
+        arr[60:75, 1] = np.nan
+        arr[:30, 2] = np.nan
+    return close, high, low, volume
+
+def _check_column(result, close, high, low, col):
+    valid = ~np.isnan(close[:, col])
+    df = pd.DataFrame({"close": close[valid, col], "high": high[valid, col], "low": low[valid, col]})
+    macd_line, signal_line, hist = macd(df["close"])
+    k, d, j = kdj(df)
+    expected = {
+        "ma_5": moving_average(df["close"], 5),
+        "ma_20": moving_average(df["close"], 20),
+        "rsi_14": rsi(df["close"]),
+        "macd_12_26_9": macd_line,
+        "macd_signal_12_26_9": signal_line,
+        "macd_hist_12_26_9": hist,
+        "kdj_k_9_3_3": k,
+        "kdj_d_9_3_3": d,
+        "kdj_j_9_3_3": j,
+        "highest_20": df["high"].rolling(20).max(),
+        "boll_upper_20_2": moving_average(df["close"], 20) + 2 * df["close"].rolling(20).std(),
+    }
+    for name, series in expected.items():
+        np.testing.assert_allclose(result[name][valid, col], series.to_numpy(), rtol=1e-8, atol=1e-8, equal_nan=True, err_msg=f"{name}[{col}]")
+        assert np.isnan(result[name][~valid, col]).all()
+
+def test_panel_matches_single_series_indicators():
+    close, high, low, volume = _panel()
+    result = compute_panel_indicators(close, high, low, volume)
+    for col in range(close.shape[1]):
+        _check_column(result, close, high, low, col)
+    assert set(result) >= {"atr_14", "obv", "lowest_20", "boll_lower_20_2"}
+    assert result["obv"].shape == close.shape
+
+def test_frame_to_panel_aligns_calendar():
+    df = pd.DataFrame({
+        "symbol": ["a", "a", "b"],
+        "trade_date": pd.to_datetime(["2024-01-02", "2024-01-03", "2024-01-03"]),
+        "close": [1.0, 2.0, 3.0],
+    })
+    panel = frame_to_panel(df, fields=("close",))
+    assert panel["symbols"] == ["a", "b"]
+    np.testing.assert_array_equal(panel["close"], [[1.0, np.nan], [2.0, 3.0]])
@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from sqlmodel import SQLModel, Session, create_engine, select
+from sqlalchemy.pool import StaticPool
+from app.models import Stock, DailyPrice, PatternStat, PatternResult
+from app.services.pattern_scan import incremental_pattern_scan, iter_pattern_scan
+from app.services.pattern_stats import update_symbol_pattern_stats, refresh_market_pattern_stats, rebuild_pattern_stats, pattern_library
+from benchmarks.synthetic import generate_symbol, trading_calendar
+from app.services.patterns import PATTERN_NAMES, _local_extrema, detect_patterns, find_pattern_occurrences, pattern_occurrence_indices
+
+def _frame(close):
+    return pd.DataFrame({"trade_date": pd.bdate_range("2024-01-01", periods=len(close)).date, "close": np.asarray(close, dtype=float)})
+
+def test_extrema_are_centered():
+    # A rising series has trailing-window maxima everywhere but no centered peaks
+    peaks, troughs = _local_extrema(pd.Series(np.arange(30.0)), 5)
+    assert peaks.empty and troughs.empty
+    peaks, troughs = _local_extrema(pd.Series([1, 2, 5, 2, 1, 0, 1, 2, 1, 0, 1.0]), 5)
+    assert list(peaks.index) == [2, 7] and list(troughs.index) == [5]
+
+def test_head_and_shoulders_occurrences():
+    shape = [10, 12, 14, 12, 10, 13, 17, 13, 10, 12, 14, 12, 10, 9, 8, 9, 10]
+    close = np.concatenate([shape, np.array(shape) * 1.2])
+    found = pattern_occurrence_indices(close, ["头肩顶"], window=5)
+    start, end = found["头肩顶"]
+    # Left shoulder, and the right shoulder plus the bars needed to confirm it
+    assert list(start) == [2, 19] and list(end) == [12, 29]
+
+    df = _frame(close)
+    occurrences = find_pattern_occurrences(df, ["头肩顶", "双重底"])
+    tops = [o for o in occurrences if o["pattern_name"] == "头肩顶"]
+    assert [o["start_date"] for o in tops] == [str(df["trade_date"][2]), str(df["trade_date"][19])]
+    assert [o["end_date"] for o in tops] == [str(df["trade_date"][12]), str(df["trade_date"][29])]
+    assert all(o["start_index"] <= o["end_index"] for o in occurrences)
+
+def test_latest_occurrence_agrees_with_detect_patterns():
+    rng = np.random.default_rng(2)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, 400))
+    df = _frame(close)
+    latest = {p["pattern_name"] for p in detect_patterns(df, ["双重顶", "双重底", "头肩顶", "头肩底"], {})}
+    peaks, troughs = _local_extrema(df["close"], 5)
+    for name, idx in (("双重顶", peaks.index), ("头肩顶", peaks.index), ("双重底", troughs.index), ("头肩底", troughs.index)):
+        start, _ = pattern_occurrence_indices(close, [name])[name]
+        # The detector scores the most recent extrema, i.e. an occurrence starting there
+        first = idx[-2] if name.startswith("双重") else idx[-3]
+        assert (name in latest) == (first in set(start))
+
+def test_cup_and_handle_uses_the_occurrence_rule():
+    x = np.arange(53)
+    cup = np.interp(x, [0, 10, 25, 40, 45, 52], [9, 10, 8.5, 10.1, 9.7, 9.9])
+    # Same cup, but the handle gives back more than half of it
+    deep = np.interp(x, [0, 10, 25, 40, 45, 52], [9, 10, 8.5, 10.1, 9.0, 9.5])
+    for close, expected in ((cup, True), (deep, False)):
+        detected = bool(detect_patterns(_frame(close), ["杯柄形态"], {}))
+        start, _ = pattern_occurrence_indices(close, ["杯柄形态"])["杯柄形态"]
+        assert detected == expected == (10 in set(start))
+
+def test_incremental_pattern_stats_match_rebuild():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    stock = Stock(symbol="600000", name="S", market="SH")
+    session.add(stock)
+    session.commit()
+    df = generate_symbol(0, trading_calendar(3), seed=3)
+    for part in (df.iloc[:400], df.iloc[400:600], df.iloc[600:]):
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=r.trade_date, open=r.open, high=r.high, low=r.low, close=r.close, volume=r.volume) for r in part.itertuples()])
+        session.commit()
+        update_symbol_pattern_stats(session, "600000")
+    refresh_market_pattern_stats(session)
+    incremental = {(r.symbol, r.pattern_name, r.horizon): (r.occurrences, r.hits, round(r.return_sum, 9)) for r in session.exec(select(PatternStat)).all()}
+
+    rebuild_pattern_stats(session)
+    rebuilt = {(r.symbol, r.pattern_name, r.horizon): (r.occurrences, r.hits, round(r.return_sum, 9)) for r in session.exec(select(PatternStat)).all()}
+    assert incremental == rebuilt
+    assert sum(v[0] for k, v in rebuilt.items() if k[0] == "*") > 0
+
+    library = {p["name"]: p["horizons"] for p in pattern_library(session)}
+    stats = library["双重底"][20]
+    assert 0 <= stats["success_rate"] <= 1 and stats["occurrences"] == rebuilt[("*", "双重底", 20)][0]
+
+def test_revised_bars_rebuild_the_symbol_pattern_stats():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    stock = Stock(symbol="600000", name="S", market="SH")
+    session.add(stock)
+    session.commit()
+    df = generate_symbol(0, trading_calendar(2), seed=5)
+    session.add_all([DailyPrice(stock_id=stock.id, trade_date=r.trade_date, open=r.open, high=r.high, low=r.low, close=r.close, volume=r.volume) for r in df.itertuples()])
+    session.commit()
+    update_symbol_pattern_stats(session, "600000")
+
+    # Re-sync a range well inside what was already counted with different closes
+    since = df["trade_date"].iloc[200]
+    for bar in session.exec(select(DailyPrice).where(DailyPrice.trade_date >= since, DailyPrice.trade_date < df["trade_date"].iloc[300])).all():
+        bar.close *= 0.8
+        session.add(bar)
+    session.commit()
+    update_symbol_pattern_stats(session, "600000", since=since)
+    resynced = {(r.pattern_name, r.horizon): (r.occurrences, r.hits, round(r.return_sum, 9)) for r in session.exec(select(PatternStat)).all()}
+
+    rebuild_pattern_stats(session, ["600000"], refresh_market=False)
+    rebuilt = {(r.pattern_name, r.horizon): (r.occurrences, r.hits, round(r.return_sum, 9)) for r in session.exec(select(PatternStat)).all()}
+    assert resynced == rebuilt
+
+def test_parallel_scan_upserts_without_duplicates():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    calendar = trading_calendar(1)
+    for i in range(6):
+        stock = Stock(symbol=f"60000{i}", name=f"S{i}", market="SH")
+        session.add(stock)
+        session.commit()
+        df = generate_symbol(i, calendar, seed=5)
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=r.trade_date, open=r.open, high=r.high, low=r.low, close=r.close, volume=r.volume) for r in df.itertuples()])
+    session.commit()
+    start, end = calendar[0].date(), calendar[-1].date()
+
+    serial = [item for batch in iter_pattern_scan(session, ["双重顶", "双重底", "杯柄形态"], start, end, max_workers=1) for item in batch]
+    parallel = [item for batch in iter_pattern_scan(session, ["双重顶", "双重底", "杯柄形态"], start, end, max_workers=2) for item in batch]
+    assert serial and sorted(serial, key=lambda r: r["symbol"]) == sorted(parallel, key=lambda r: r["symbol"])
+    stored = session.exec(select(PatternResult)).all()
+    assert len(stored) == sum(len(item["patterns"]) for item in serial)
+    assert all(item["name"] for item in serial)
+    # No PatternStat rows yet, so no hit rate is known
+    assert all(p["success_rate"] is None for item in serial for p in item["patterns"])
+    assert all(r.success_rate is None for r in stored)
+
+def test_detected_patterns_take_their_rate_from_the_stats():
+    rng = np.random.default_rng(2)
+    df = _frame(10 * np.cumprod(1 + rng.normal(0, 0.02, 400)))
+    found = detect_patterns(df, PATTERN_NAMES, {})
+    assert found and all(p["success_rate"] is None for p in found)
+    rates = {p["pattern_name"]: 0.42 for p in found}
+    assert all(p["success_rate"] == 0.42 for p in detect_patterns(df, PATTERN_NAMES, {}, rates))
+
+def test_incremental_scan_only_revisits_symbols_with_new_bars():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    calendar = trading_calendar(2)
+    frames = {}
+    for i in range(4):
+        stock = Stock(symbol=f"60000{i}", name=f"S{i}", market="SH")
+        session.add(stock)
+        session.commit()
+        frames[stock.id] = generate_symbol(i, calendar, seed=7)
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=r.trade_date, open=r.open, high=r.high, low=r.low, close=r.close, volume=r.volume) for r in frames[stock.id].iloc[:-20].itertuples()])
+    session.commit()
+    patterns = ["双重顶", "双重底", "头肩顶", "头肩底"]
+
+    assert incremental_pattern_scan(session, patterns, max_workers=1)["scanned"] == 4
+    assert incremental_pattern_scan(session, patterns, max_workers=1)["scanned"] == 0
+    stock_id = next(iter(frames))
+    session.add_all([DailyPrice(stock_id=stock_id, trade_date=r.trade_date, open=r.open, high=r.high, low=r.low, close=r.close, volume=r.volume) for r in frames[stock_id].iloc[-20:].itertuples()])
+    session.commit()
+    assert incremental_pattern_scan(session, patterns, max_workers=1)["scanned"] == 1
+
+    # Scanning the tails found exactly what a full-history scan finds
+    stored = len(session.exec(select(PatternResult)).all())
+    list(iter_pattern_scan(session, patterns, calendar[0].date(), calendar[-1].date(), max_workers=1))
+    assert stored and len(session.exec(select(PatternResult)).all()) == stored
+
+def test_tail_is_measured_from_each_symbols_own_latest_bar():
+    from app.services.pattern_scan import _tail_groups
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    calendar = trading_calendar(3)
+    latest = {}
+    for i, bars in enumerate((len(calendar), len(calendar) // 2)):
+        stock = Stock(symbol=f"60000{i}", name=f"S{i}", market="SH")
+        session.add(stock)
+        session.commit()
+        df = generate_symbol(i, calendar, seed=9).iloc[:bars]
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=r.trade_date, open=r.open, high=r.high, low=r.low, close=r.close, volume=r.volume) for r in df.itertuples()])
+        latest[stock.symbol] = df["trade_date"].iloc[-1]
+    session.commit()
+    loaded = {symbol: dates for symbol, dates, _ in _tail_groups(session, latest, {})}
+    # A suspended symbol does not drag the other one's window back
+    for symbol, dates in loaded.items():
+        assert pd.Timestamp(dates[-1]).date() == latest[symbol]
+        assert len(dates) < len(calendar) // 3
@@ -0,0 +1,69 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy.pool import StaticPool
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.models import JobRun
+from app.services.metrics import SYNC_DURATION, SYNC_ROWS
+from app.services.scheduler import claim_run, execute_run
+
+def child_pid():
+    return str(os.getpid())
+
+def failing_job():
+    raise RuntimeError("source down")
+
+def syncing_job():
+    SYNC_ROWS.inc(7, kind="daily")
+    SYNC_DURATION.observe(2.0, kind="daily")
+    return "synced"
+
+def _session():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    return Session(engine)
+
+def test_each_firing_is_claimed_once_and_runs_in_a_child_process():
+    session = _session()
+    fired = datetime(2024, 6, 3, 7, 35)
+    run = claim_run(session, "daily_sync", fired)
+    # A second worker firing the same schedule loses the claim
+    assert run is not None and claim_run(session, "daily_sync", fired) is None
+
+    # The next firing is skipped while this run is still alive
+    later = claim_run(session, "daily_sync", fired + timedelta(days=1))
+    assert later is None
+    skipped = session.exec(select(JobRun).where(JobRun.status == "skipped")).one()
+    assert skipped.message == f"run {run.id} still in progress"
+
+    execute_run(session, run, child_pid)
+    assert run.status == "finished" and run.message != str(os.getpid())
+    assert run.duration_s is not None and run.finished_at is not None
+
+    failed = claim_run(session, "daily_sync", fired + timedelta(days=2))
+    execute_run(session, failed, failing_job)
+    assert failed.status == "failed" and "source down" in failed.message
+
+def test_runs_with_a_lapsed_heartbeat_stop_blocking():
+    session = _session()
+    stale = JobRun(job_name="daily_sync", scheduled_for=datetime(2024, 6, 3, 7, 35), heartbeat_at=datetime.utcnow() - timedelta(hours=1))
+    session.add(stale)
+    session.commit()
+    run = claim_run(session, "daily_sync", datetime(2024, 6, 4, 7, 35))
+    assert run is not None
+    session.refresh(stale)
+    assert stale.status == "failed" and stale.message == "heartbeat lost"
+
+def test_metrics_recorded_by_the_child_process_are_merged():
+    session = _session()
+    rows, syncs = SYNC_ROWS.value(kind="daily"), SYNC_DURATION.count(kind="daily")
+    run = claim_run(session, "daily_sync", datetime(2024, 6, 3, 7, 35))
+    execute_run(session, run, syncing_job)
+    assert run.status == "finished" and run.message == "synced"
+    assert SYNC_ROWS.value(kind="daily") == rows + 7
+    assert SYNC_DURATION.count(kind="daily") == syncs + 1
+
+def test_job_runs_are_admin_only():
+    from app.routers import admin_dep, router
+
+    route = next(r for r in router.routes if r.path == "/api/v1/system/jobs")
+    assert admin_dep in [d.call for d in route.dependant.dependencies]
@@ -0,0 +1,91 @@
+import json
+from datetime import date
+import pandas as pd
+from sqlmodel import SQLModel, Session, create_engine, select
+from app.core.config import settings
+from app.models import Stock, DailyPrice, FactorValue, FinancialMetric, IndicatorSnapshot
+from app.services.indicators import macd
+from app.services.screening import screen_stocks, screen_stocks_history
+
+def _session():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    days = pd.bdate_range("2024-01-01", "2024-04-05")
+    for i, cap in enumerate([100.0, 200.0]):
+        stock = Stock(symbol=f"00000{i}", name=f"S{i}", market="SZ", market_cap=cap)
+        session.add(stock)
+        session.commit()
+        for n, day in enumerate(days):
+            # The second stock is suspended from March onwards
+            if i == 1 and day.month >= 3:
+                continue
+            close = 10 + n * (1 if i == 0 else -0.05)
+            session.add(DailyPrice(stock_id=stock.id, trade_date=day.date(), open=close, high=close, low=close, close=close, volume=1.0))
+            session.add(FactorValue(stock_id=stock.id, factor_date=day.date(), momentum=float(n), volatility=0.1, liquidity=1.0))
+    session.commit()
+    return session
+
+def test_screen_as_of_uses_only_known_prices():
+    session = _session()
+    items = screen_stocks(session, {"as_of": date(2024, 1, 31)})
+    closes = {item["symbol"]: item["close"] for item in items}
+    assert closes["000000"] == 10 + 22
+
+def test_screen_history_matches_each_day():
+    session = _session()
+    results = screen_stocks_history(session, {"factor_filters": {"momentum_min": 30}}, date(2024, 2, 12), date(2024, 4, 5))
+    assert [r["trade_date"] for r in results] == [d.date() for d in pd.bdate_range("2024-02-12", "2024-04-05")]
+    first = results[0]
+    assert {item["symbol"] for item in first["items"]} == {"000000", "000001"}
+    assert all(item["momentum"] >= 30 for r in results for item in r["items"])
+    # Once the suspension is older than the staleness window the stock drops out
+    assert {item["symbol"] for item in results[-1]["items"]} == {"000000"}
+
+def test_technical_filters_use_the_latest_bar_snapshot():
+    session = _session()
+    criteria = {"as_of": date(2024, 3, 15), "technical_filters": {"macd_positive": True}}
+    # No snapshots yet: computed from history, the rising stock passes and the falling one does not
+    assert [item["symbol"] for item in screen_stocks(session, criteria)] == ["000000"]
+
+    rising = session.exec(select(Stock).where(Stock.symbol == "000000")).one()
+    values = {"rsi": 20.0, "macd": 0.5, "macd_signal": 1.0, "kdj_k": 50.0, "kdj_d": 50.0}
+    session.add(IndicatorSnapshot(stock_id=rising.id, last_date=date(2024, 3, 15), values_json=json.dumps(values)))
+    session.commit()
+    assert screen_stocks(session, criteria) == []
+    # A snapshot for a later bar does not describe the as-of date and is ignored
+    assert [item["symbol"] for item in screen_stocks(session, {**criteria, "as_of": date(2024, 3, 14)})] == ["000000"]
+
+def test_history_technicals_come_from_the_market_panel():
+    session = _session()
+    results = screen_stocks_history(session, {"technical_filters": {"macd_positive": True}}, date(2024, 3, 1), date(2024, 3, 5))
+    assert [[item["symbol"] for item in r["items"]] for r in results] == [["000000"]] * 3
+    # Same values as the single-series indicator over the stock's own bars
+    closes = pd.Series([10.0 + n for n in range(len(pd.bdate_range("2024-01-01", "2024-03-05")))])
+    macd_line, signal_line, _ = macd(closes)
+    item = results[-1]["items"][0]
+    assert abs(item["macd"] - macd_line.iloc[-1]) < 1e-9 and abs(item["macd_signal"] - signal_line.iloc[-1]) < 1e-9
+
+def test_history_uses_reports_only_once_published(monkeypatch):
+    monkeypatch.setattr(settings, "FINANCIAL_REPORT_LAG_DAYS", 30)
+    session = _session()
+    stock = session.exec(select(Stock).where(Stock.symbol == "000000")).one()
+    session.add(FinancialMetric(stock_id=stock.id, report_date=date(2023, 12, 31), roe=0.1))
+    session.add(FinancialMetric(stock_id=stock.id, report_date=date(2024, 3, 31), roe=0.2))
+    session.commit()
+    results = screen_stocks_history(session, {}, date(2024, 1, 29), date(2024, 4, 5))
+    roe = {r["trade_date"]: next(i["roe"] for i in r["items"] if i["symbol"] == "000000") for r in results}
+    assert pd.isna(roe[date(2024, 1, 29)])
+    assert roe[date(2024, 1, 30)] == 0.1 and roe[date(2024, 4, 5)] == 0.1
+
+def test_history_total_counts_matches_beyond_the_page():
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    stocks = [Stock(symbol=f"{i:06d}", name=f"S{i}", market="SZ", market_cap=float(i)) for i in range(205)]
+    session.add_all(stocks)
+    session.commit()
+    session.add_all([DailyPrice(stock_id=s.id, trade_date=date(2024, 1, 2), open=10, high=10, low=10, close=10, volume=1.0) for s in stocks])
+    session.commit()
+    (day,) = screen_stocks_history(session, {}, date(2024, 1, 2), date(2024, 1, 2))
+    assert day["total"] == 205 and len(day["items"]) == 200
@@ -0,0 +1,146 @@
+import numpy as np
+import pandas as pd
+from app.services.similarity import SeriesCache, distance_profile, prepare_series, search_similar, series_cache
+
+def _brute_force(close, query):
+    m = len(query)
+    q = (query - query.mean()) / query.std()
+    out = []
+    for i in range(len(close) - m + 1):
+        w = close[i:i + m]
+        out.append(np.linalg.norm((w - w.mean()) / w.std() - q))
+    return np.array(out)
+
+def test_distance_profile_matches_brute_force():
+    rng = np.random.default_rng(0)
+    close = 50 * np.cumprod(1 + rng.normal(0, 0.02, 300))
+    query = close[100:130] * 1.7 + 3
+    dist = distance_profile(prepare_series(np.arange(300), close), (query - query.mean()) / query.std())
+    assert np.allclose(dist, _brute_force(close, query), atol=1e-6)
+    assert np.argmin(dist) == 100 and dist[100] < 1e-5
+
+def test_search_finds_planted_shape_across_symbols():
+    rng = np.random.default_rng(1)
+    dates = pd.bdate_range("2020-01-01", periods=400).to_numpy()
+    shape = np.sin(np.linspace(0, 3 * np.pi, 40)) + np.linspace(0, 1, 40)
+    series_cache.clear()
+    for i in range(8):
+        close = 20 * np.cumprod(1 + rng.normal(0, 0.02, 400))
+        if i == 5:
+            close[250:290] = 30 + 4 * shape
+        series_cache.put(f"60000{i}", dates, close)
+    try:
+        serial = search_similar(shape, top_k=5, max_workers=1)
+        parallel = search_similar(shape, top_k=5, max_workers=2)
+        assert serial[0]["symbol"] == "600005" and serial[0]["start_date"] == pd.Timestamp(dates[250]).date()
+        assert serial[0]["correlation"] > 0.999
+        assert [(r["symbol"], r["start_date"]) for r in serial] == [(r["symbol"], r["start_date"]) for r in parallel]
+        # A query cut from the history does not match itself
+        start, end = pd.Timestamp(dates[250]).date(), pd.Timestamp(dates[289]).date()
+        others = search_similar(shape, top_k=5, exclude=("600005", start, end), max_workers=1)
+        assert all(not (r["symbol"] == "600005" and r["end_date"] >= start and r["start_date"] <= end) for r in others)
+    finally:
+        series_cache.clear()
+
+def test_cache_refresh_reloads_only_changed_symbols():
+    from sqlmodel import SQLModel, Session, create_engine
+    from app.models import Stock, DailyPrice
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    dates = pd.bdate_range("2024-01-01", periods=60).date
+    for i in range(2):
+        stock = Stock(symbol=f"00000{i}", name=f"S{i}", market="SZ")
+        session.add(stock)
+        session.commit()
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=d, open=1, high=1, low=1, close=10 + np.sin(j / 5 + i), volume=1) for j, d in enumerate(dates[:50])])
+    session.commit()
+    cache = SeriesCache()
+    assert cache.refresh(session) == ["000000", "000001"]
+    before = cache.get("000001")
+    session.add_all([DailyPrice(stock_id=1, trade_date=d, open=1, high=1, low=1, close=11, volume=1) for d in dates[50:]])
+    session.commit()
+    cache.refresh(session)
+    assert len(cache.get("000000").close) == 60 and cache.get("000001") is before
+
+class SequenceRedis:
+    """The Redis commands record_price_sync and the price versions use."""
+    def __init__(self):
+        self.values, self.hashes = {}, {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1)
+        return int(self.values[key])
+
+    def zadd(self, key, mapping):
+        pass
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field] = str(value)
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+def test_cache_follows_price_sync_sequence(monkeypatch):
+    from sqlmodel import SQLModel, Session, create_engine, delete
+    from app.models import Stock, DailyPrice
+    from app.services import backtest_cache
+
+    client = SequenceRedis()
+    monkeypatch.setattr(backtest_cache, "redis_client", client)
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    dates = pd.bdate_range("2024-01-01", periods=40).date
+    for i in range(2):
+        stock = Stock(symbol=f"00000{i}", name=f"S{i}", market="SZ")
+        session.add(stock)
+        session.commit()
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=d, open=1, high=1, low=1, close=10 + np.sin(j / 5 + i), volume=1) for j, d in enumerate(dates)])
+    session.commit()
+    cache = SeriesCache()
+    assert cache.refresh(session) == ["000000", "000001"]
+    untouched = cache.get("000001")
+
+    # Nothing synced: no database work at all
+    session.close()
+    assert cache.refresh(None, ["000001"]) == ["000001"]
+
+    # A sync rewrites the last bar in place: same bar count and last date, new close
+    session = Session(engine)
+    session.exec(delete(DailyPrice).where(DailyPrice.stock_id == 1, DailyPrice.trade_date == dates[-1]))
+    session.add(DailyPrice(stock_id=1, trade_date=dates[-1], open=1, high=1, low=1, close=99, volume=1))
+    session.commit()
+    backtest_cache.record_price_sync("000000", dates[-1], dates[-1])
+    cache.refresh(session)
+    assert cache.get("000000").close[-1] == 99 and cache.get("000001") is untouched
+
+def test_find_similar_queries_by_symbol_window():
+    import pytest
+    from sqlmodel import SQLModel, Session, create_engine
+    from app.models import Stock, DailyPrice
+    from app.services.similarity import find_similar
+
+    engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(engine)
+    session = Session(engine)
+    dates = pd.bdate_range("2024-01-01", periods=120).date
+    for i in range(2):
+        stock = Stock(symbol=f"00000{i}", name=f"S{i}", market="SZ")
+        session.add(stock)
+        session.commit()
+        session.add_all([DailyPrice(stock_id=stock.id, trade_date=d, open=1, high=1, low=1, close=10 + np.sin(j / 7 + i), volume=1) for j, d in enumerate(dates)])
+    session.commit()
+    series_cache.clear()
+    try:
+        results = find_similar(session, None, "000000", dates[20], dates[49], top_k=3)
+        assert results and all(r["name"] == f"S{r['symbol'][-1]}" for r in results)
+        assert all(not (r["symbol"] == "000000" and r["end_date"] >= dates[20] and r["start_date"] <= dates[49]) for r in results)
+        with pytest.raises(ValueError, match="5"):
+            find_similar(session, [1.0, 1.0, 1.0], None, None, None, top_k=3)
+    finally:
+        series_cache.clear()
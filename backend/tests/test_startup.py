@@ -0,0 +1,16 @@
+import subprocess
+import sys
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1]
+
+def test_app_import_does_not_load_akshare():
+    code = "import sys, app.main; assert 'akshare' not in sys.modules, 'akshare imported at startup'; assert 'app.services.data_sources' not in sys.modules"
+    subprocess.run([sys.executable, "-c", code], cwd=BACKEND, check=True)
+
+def test_lazy_module_imports_on_first_use():
+    from app.services.data_sources import LazyModule
+
+    module = LazyModule("json")
+    assert module._module is None
+    assert module.dumps([1]) == "[1]" and module._module is not None
@@ -1,6 +1,10 @@
 import pytest
+import numpy as np
 import pandas as pd
-from app.services.strategies import MACrossStrategy, RSIStrategy
+from app.services.strategies import MACrossStrategy, RSIStrategy, TrendFollowingStrategy
+from app.services.indicators import moving_average, rsi
+from app.services.strategy_dsl import compile_strategy
+from app.services.indicator_cache import IndicatorCache, cached_indicator, indicator_cache, encode_arrays, decode_arrays
 
 def test_ma_cross_strategy():
     data = {"close": [10, 11, 12, 13, 14, 15, 14, 13, 12, 11, 10]} # Simple trend reversal
@@ -18,8 +22,89 @@ def test_rsi_strategy():
     signals = strategy.run(df)
     assert len(signals) == len(df)
 
+def test_indicator_cache_shared_between_runs():
+    df = pd.DataFrame({"trade_date": pd.date_range("2024-01-01", periods=60), "close": [10 + i % 7 for i in range(60)]})
+    df.attrs["symbol"] = "000001"
+    indicator_cache.clear()
+    first = MACrossStrategy(short_window=5, long_window=20).run(df)
+    hits = indicator_cache.hits
+    # TrendFollowing with window=20 needs the same MA20 series
+    TrendFollowingStrategy(window=20).run(df)
+    assert indicator_cache.hits == hits + 1
+    again = MACrossStrategy(short_window=5, long_window=20).run(df)
+    pd.testing.assert_series_equal(first, again)
+    revised = df.copy()
+    revised.loc[59, "close"] = 100
+    misses = indicator_cache.misses
+    MACrossStrategy(short_window=5, long_window=20).run(revised)
+    assert indicator_cache.misses == misses + 2
+
+def test_cached_indicator_results_are_writable_copies():
+    df = pd.DataFrame({"trade_date": pd.date_range("2024-01-01", periods=30), "close": np.arange(30, dtype=float)})
+    df.attrs["symbol"] = "000002"
+    indicator_cache.clear()
+    first = cached_indicator(df, moving_average, "close", window=5)
+    first.iloc[-1] = -1.0
+    first.to_numpy()[0] = -1.0
+    again = cached_indicator(df, moving_average, "close", window=5)
+    assert again.iloc[-1] == 27.0 and np.isnan(again.iloc[0])
+    # The entry itself is shared, so it stays frozen
+    (cached,) = indicator_cache.get_or_compute(next(iter(indicator_cache._entries)), lambda: [])
+    with pytest.raises(ValueError):
+        cached[0] = 0.0
+
+def test_indicator_cache_lru_and_codec():
+    cache = IndicatorCache(max_bytes=3 * 8 * 10)
+    for i in range(4):
+        cache.set(f"k{i}", [pd.Series(range(10), dtype=float).to_numpy()])
+    assert cache.get("k0") is None and cache.get("k3") is not None
+    arrays = [pd.Series([1.0, float("nan")]).to_numpy(), pd.DataFrame([[1.0, 2.0]]).to_numpy()]
+    decoded = decode_arrays(encode_arrays(arrays))
+    assert decoded[1].shape == (1, 2) and decoded[0][0] == 1.0
+
 if __name__ == "__main__":
     # Manually run if needed
     test_ma_cross_strategy()
     test_rsi_strategy()
     print("Basic strategy tests passed.")
+
+def test_composition_matches_hand_combined_signals():
+    rng = np.random.default_rng(4)
+    close = 10 * np.cumprod(1 + rng.normal(0, 0.02, 300))
+    df = pd.DataFrame({"close": close, "high": close * 1.01, "low": close * 0.99, "volume": rng.uniform(1e5, 1e6, 300)})
+    spec = {"all": [
+        {"strategy": "均线交叉", "params": {"short_window": 5, "long_window": 20}},
+        {"left": {"indicator": "rsi", "params": {"window": 14}}, "op": "<", "right": 70},
+        {"not": {"left": {"field": "volume"}, "op": ">", "right": {"indicator": "volume_ma", "params": {"window": 20}, "scale": 1.5}}},
+    ]}
+    signal = compile_strategy(spec).run(df)
+    expected = (
+        (MACrossStrategy(short_window=5, long_window=20).run(df) == 1)
+        & (rsi(df["close"], 14) < 70)
+        & ~(df["volume"] > moving_average(df["volume"], 20) * 1.5)
+    ).astype(float)
+    pd.testing.assert_series_equal(signal, expected, check_names=False)
+
+    weighted = compile_strategy({"weighted": [
+        {"weight": 2, "node": {"strategy": "趋势跟随", "params": {"window": 20.0}}},
+        {"weight": 1, "node": {"left": {"indicator": "ma", "params": {"window": 20}}, "op": "crosses_above", "right": {"indicator": "ma", "params": {"window": 60}}}},
+    ]})
+    assert set(np.unique(weighted.run(df))) <= {0, 1 / 3, 2 / 3, 1}
+    with pytest.raises(ValueError):
+        compile_strategy({"all": [{"strategy": "不存在"}]})
+
+def test_composition_shares_indicators_and_runs_on_panels():
+    df = pd.DataFrame({"close": np.linspace(10, 20, 100)})
+    composite = compile_strategy({"any": [{"strategy": "均线交叉", "params": {"short_window": 5, "long_window": 20}}, {"strategy": "趋势跟随", "params": {"window": 20}}]})
+    composite.run(df)
+    shared = {}
+    for strategy in composite.strategies:
+        strategy.shared_indicators = shared
+        strategy.run(df)
+    # MA(20) computed once for both strategies
+    assert len(shared) == 2
+
+    wide = pd.concat({"close": pd.DataFrame(np.column_stack([np.linspace(10, 20, 100), np.linspace(20, 10, 100)]))}, axis=1)
+    panel_signal = compile_strategy({"left": {"field": "close"}, "op": ">", "right": {"indicator": "ma", "params": {"window": 10}}}).run(wide)
+    assert panel_signal.shape == (100, 2)
+    assert panel_signal.iloc[50:, 0].all() and not panel_signal.iloc[50:, 1].any()
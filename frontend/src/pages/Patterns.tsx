@@ -11,6 +11,17 @@ interface PatternResult {
     patterns: { pattern_name: string; detected_date: string; success_rate: number }[]
 }
 
+interface PatternStats {
+    occurrences: number
+    success_rate: number | null
+    avg_return: number | null
+}
+
+interface PatternInfo {
+    name: string
+    horizons: Record<string, PatternStats>
+}
+
 interface DateRange {
     start: string
     end: string
@@ -18,7 +29,7 @@ interface DateRange {
 
 export default function Patterns() {
     const { pushToast } = useToast()
-    const [patterns, setPatterns] = useState<string[]>([])
+    const [patterns, setPatterns] = useState<PatternInfo[]>([])
     const [selected, setSelected] = useState<string[]>([])
     const [results, setResults] = useState<PatternResult[]>([])
     const [loading, setLoading] = useState(false)
@@ -26,8 +37,8 @@ export default function Patterns() {
     const [windowSize, setWindowSize] = useState(5)
 
     useEffect(() => {
-        api.get<string[]>('/patterns/library')
-            .then((res: AxiosResponse<string[]>) => setPatterns(res.data))
+        api.get<PatternInfo[]>('/patterns/library')
+            .then((res: AxiosResponse<PatternInfo[]>) => setPatterns(res.data))
             .catch(() => pushToast('形态库加载失败', 'error'))
     }, [])
 
@@ -75,7 +86,7 @@ export default function Patterns() {
             </div>
             <div className="rounded-2xl border border-border bg-card p-4 text-sm text-muted-foreground">
                 <p>提示：系统会在所选区间内，使用“识别窗口”长度判断近期是否形成指定形态。</p>
-                <p className="mt-2">结果按股票展示，胜率为基于形态得分的估计值，用于对比排序，并非收益承诺。</p>
+                <p className="mt-2">结果按股票展示，胜率为该形态历史出现后 20 个交易日的方向命中率（样本不足时采用全市场统计），仅供参考，并非收益承诺。</p>
             </div>
             <div className="grid grid-cols-4 gap-4">
                 <div className="rounded-2xl border border-border bg-card p-4 shadow-sm">
@@ -110,16 +121,21 @@ export default function Patterns() {
             <div className="rounded-2xl border border-border bg-card p-6 shadow-sm">
                 <h3 className="text-lg font-semibold">形态库</h3>
                 <div className="mt-4 flex flex-wrap gap-2">
-                    {patterns.map((name) => (
-                        <button
-                            key={name}
-                            onClick={() => togglePattern(name)}
-                            className={`rounded-full border px-4 py-2 text-xs ${selected.includes(name) ? 'border-primary bg-primary text-primary-foreground' : 'border-border text-muted-foreground hover:bg-muted'
-                                }`}
-                        >
-                            {name}
-                        </button>
-                    ))}
+                    {patterns.map(({ name, horizons }) => {
+                        const stats = horizons['20']
+                        return (
+                            <button
+                                key={name}
+                                onClick={() => togglePattern(name)}
+                                title={stats ? `历史 ${stats.occurrences} 次，20 日平均收益 ${((stats.avg_return ?? 0) * 100).toFixed(2)}%` : '暂无历史统计'}
+                                className={`rounded-full border px-4 py-2 text-xs ${selected.includes(name) ? 'border-primary bg-primary text-primary-foreground' : 'border-border text-muted-foreground hover:bg-muted'
+                                    }`}
+                            >
+                                {name}
+                                {stats?.success_rate != null && <span className="ml-1 opacity-70">{Math.round(stats.success_rate * 100)}%</span>}
+                            </button>
+                        )
+                    })}
                 </div>
             </div>
             <div className="rounded-2xl border border-border bg-card p-6 shadow-sm">
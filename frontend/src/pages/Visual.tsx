@@ -58,11 +58,9 @@ export default function Visual() {
             return
         }
         setLoading(true)
-        api.post('/data/price_range', {
-            symbol,
-            start_date: range.start,
-            end_date: range.end,
-            frequency: freq
+        // GET so the browser revalidates with the ETag and reuses unchanged bars
+        api.get('/data/price_range', {
+            params: { symbol, start_date: range.start, end_date: range.end, frequency: freq }
         })
             .then((res: AxiosResponse<PriceItem[]>) => setPrices(res.data))
             .catch(() => pushToast('K线数据加载失败', 'error'))